@@ -0,0 +1,686 @@
+# Import the standard libraries
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+# Import the numpy library
+import numpy as np
+
+# Import the OR-Tools library
+from ortools.sat.python import cp_model
+
+# Import the scheduling code
+import ScheduleShifts
+
+def GenerateSyntheticVolunteers(NumberOfVolunteers, Shifts, Seed=0):
+    # This function generates a list of synthetic volunteers with random preference lists
+    # Inputs:
+    #   NumberOfVolunteers = the number of volunteers to generate
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   Seed = the seed of the random number generator, so that runs are repeatable
+    # Outputs:
+    #   Volunteers = a list of volunteer objects, with their shift preference points already calculated
+
+    # Instantiate the random number generator
+    Generator = random.Random(Seed)
+
+    # Get the list of shift names
+    ShiftNames = list(Shifts)
+
+    # Instantiate the list of volunteers
+    Volunteers = []
+
+    # Create each volunteer
+    for ID_Number in range(NumberOfVolunteers):
+
+        # Instantiate a new volunteer
+        v = ScheduleShifts.Volunteer()
+
+        # Populate the volunteer's properties
+        v.ID_Number = ID_Number
+        v.FirstName = 'Volunteer'
+        v.LastName = str(ID_Number)
+        v.IsPreferredVolunteer = Generator.random() < 0.25
+
+        # Rank between one and six shifts, leaving the remaining cells blank like the sign-up sheet does
+        RankedShifts = Generator.sample(ShiftNames, Generator.randint(1, 6))
+        v.PreferredShifts = RankedShifts + [''] * (6 - len(RankedShifts))
+
+        # Calculate the volunteer's shift preference points
+        v.CalculateShiftPreferencePoints(Shifts)
+
+        # Add the volunteer to the growing list
+        Volunteers.append(v)
+
+    # Return the list of volunteers
+    return Volunteers
+
+def WriteSyntheticPreferenceFile(CSV_Name, NumberOfRows, Shifts, Seed=0):
+    # This function writes a synthetic individual preference file in the format of "Individual Preferences.csv"
+
+    # Import the csv library
+    import csv
+
+    # Instantiate the random number generator
+    Generator = random.Random(Seed)
+
+    # Get the list of shift names
+    ShiftNames = list(Shifts)
+
+    # Create the file
+    with open(CSV_Name, mode='w', newline='') as f:
+
+        # Instantiate the csv writer
+        Writer = csv.writer(f)
+
+        # Write the header line
+        Writer.writerow(['Preferred Applicants', 'First Name', 'Last Name'] + ScheduleShifts.PreferenceColumns)
+
+        # Write the line for each volunteer
+        for RowNumber in range(NumberOfRows):
+            RankedShifts = Generator.sample(ShiftNames, Generator.randint(1, 6))
+            Writer.writerow(
+                ['TRUE' if Generator.random() < 0.25 else '', 'Volunteer', str(RowNumber)] +
+                RankedShifts + [''] * (6 - len(RankedShifts))
+            )
+
+def BuildSyntheticShiftConfig(Sites=1, PeriodsPerDay=4):
+    # This function builds the shift table of a synthetic workload
+    # Inputs:
+    #   Sites = the number of sites, each with its own copy of the weekly shifts
+    #   PeriodsPerDay = the number of shifts per day at each site; the first four are the standard periods
+    # Outputs:
+    #   Config = a shift table in the layout of ScheduleShifts.DefaultShiftConfig
+
+    # Start from the standard periods, and add more with the same requirements in turn
+    StandardPeriods = ScheduleShifts.DefaultShiftConfig['Periods']
+    Periods = []
+    for i in range(PeriodsPerDay):
+        if i < len(StandardPeriods):
+            Periods.append(dict(StandardPeriods[i]))
+        else:
+            Periods.append({'Name' : 'Period %d' % (i + 1), 'RequiredVolunteers' : StandardPeriods[i % len(StandardPeriods)]['RequiredVolunteers']})
+
+    # Build the table, naming the sites only if there is more than one
+    Config = {'Weekdays' : list(ScheduleShifts.DefaultShiftConfig['Weekdays']), 'Periods' : Periods}
+    if Sites > 1:
+        Config['Sites'] = [{'Name' : 'Site %d' % (k + 1)} for k in range(Sites)]
+
+    # Return the table
+    return Config
+
+def WriteSyntheticWorkload(Directory, NumberOfVolunteers, Seed=0, Sites=1, PeriodsPerDay=4, PreferenceLength=6, Skew=1.0, PreferredRatio=0.25, NumberOfGroups=4, GroupSizes=(3, 5)):
+    # This function writes a synthetic workload: a shift table and sign-up sheets in the format of the sample files
+    # Inputs:
+    #   Directory = the directory to write "Shifts.json", "Individual Preferences.csv" and "Group Volunteers.csv" to
+    #   NumberOfVolunteers = the number of rows of the individual preference file
+    #   Seed = the seed of the random number generator, so that workloads are repeatable
+    #   Sites = the number of sites; each volunteer only signs up for the shifts of one site
+    #   PeriodsPerDay = the number of shifts per day at each site
+    #   PreferenceLength = the largest number of shifts a volunteer ranks (at most 6, the number of preference columns);
+    #                      each volunteer ranks between one and this many
+    #   Skew = how strongly the sign-ups favour popular shifts: the k-th most popular shift of a site is picked with
+    #          weight 1 / k**Skew, so 0 means every shift is equally popular
+    #   PreferredRatio = the fraction of preferred applicants
+    #   NumberOfGroups = the number of rows of the group file
+    #   GroupSizes = the smallest and largest number of volunteers in a group
+    # Outputs:
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+
+    # Import the csv and json libraries
+    import csv
+    import json
+
+    # Check the preference list length
+    if PreferenceLength < 1 or PreferenceLength > len(ScheduleShifts.PreferenceColumns):
+        raise ValueError('The preference list length must be between 1 and %d.' % len(ScheduleShifts.PreferenceColumns))
+
+    # Instantiate the random number generator
+    Generator = np.random.default_rng(Seed)
+
+    # Write and build the shift table
+    Config = BuildSyntheticShiftConfig(Sites, PeriodsPerDay)
+    with open(os.path.join(Directory, 'Shifts.json'), 'w') as f:
+        json.dump(Config, f, indent=4)
+    Shifts = ScheduleShifts.BuildShiftDictionary(Config)
+
+    # The shifts are numbered site by site, so the shifts of site k are k * ShiftsPerSite, ... onwards
+    ShiftNames = ScheduleShifts.ListShiftNames(Shifts)
+    ShiftsPerSite = len(ShiftNames) // Sites
+
+    # Rank the shifts of each site by popularity at random, and weight them accordingly
+    Popularity = np.argsort(Generator.random((Sites, ShiftsPerSite)), axis=1).argsort(axis=1) + 1
+    LogWeights = -Skew * np.log(Popularity)
+
+    # Draw the sites and list lengths of the volunteers
+    HomeSites = Generator.integers(0, Sites, NumberOfVolunteers)
+    Lengths = Generator.integers(1, PreferenceLength + 1, NumberOfVolunteers)
+
+    # Rank the shifts of each volunteer by sampling without replacement in proportion to the weights, all at once:
+    # the shifts with the largest log weight plus Gumbel noise are a weighted sample without replacement
+    Keys = LogWeights[HomeSites] + Generator.gumbel(size=(NumberOfVolunteers, ShiftsPerSite))
+    Ranked = np.argsort(-Keys, axis=1)[:, :PreferenceLength] + (HomeSites * ShiftsPerSite)[:, None]
+
+    # Draw the preferred applicants
+    IsPreferredVolunteer = Generator.random(NumberOfVolunteers) < PreferredRatio
+
+    # Write the individual preference file
+    with open(os.path.join(Directory, 'Individual Preferences.csv'), mode='w', newline='') as f:
+
+        # Instantiate the csv writer
+        Writer = csv.writer(f)
+
+        # Write the header line
+        Writer.writerow(['Preferred Applicants', 'First Name', 'Last Name'] + ScheduleShifts.PreferenceColumns)
+
+        # Write the line for each volunteer, leaving the cells past the end of their list blank
+        Blank = [''] * len(ScheduleShifts.PreferenceColumns)
+        for (RowNumber, (Row, Length, IsPreferred)) in enumerate(zip(Ranked.tolist(), Lengths.tolist(), IsPreferredVolunteer.tolist())):
+            Writer.writerow(
+                ['TRUE' if IsPreferred else '', 'Volunteer', str(RowNumber)] +
+                [ShiftNames[i] for i in Row[:Length]] + Blank[Length:]
+            )
+
+    # Write the group file, with the groups also favouring popular shifts
+    with open(os.path.join(Directory, 'Group Volunteers.csv'), mode='w', newline='') as f:
+
+        # Instantiate the csv writer
+        Writer = csv.writer(f)
+
+        # Write the header line
+        Writer.writerow(['Shift', 'Group', 'Volunteers'])
+
+        # Write the line for each group
+        for GroupNumber in range(NumberOfGroups):
+            Site = Generator.integers(0, Sites)
+            Index = np.argmax(LogWeights[Site] + Generator.gumbel(size=ShiftsPerSite)) + Site * ShiftsPerSite
+            Writer.writerow([ShiftNames[Index], 'Group %d' % (GroupNumber + 1), Generator.integers(GroupSizes[0], GroupSizes[1] + 1)])
+
+    # Return the shifts
+    return Shifts
+
+def TimeStages(Directory, Shifts, Backend='cpsat', MaxTime=600.0):
+    # This function times each stage of a scheduling run on a workload written by WriteSyntheticWorkload, running the
+    # stages as the program does (see Scheduler.Load and Scheduler.Solve)
+    # Inputs:
+    #   Directory = the directory of the workload
+    #   Shifts = the dictionary of shifts of the workload
+    #   Backend = the solver backend
+    #   MaxTime = the time limit of the solve, in seconds
+    # Outputs:
+    #   Results = a dictionary of the time taken by each stage, in seconds, and of the solve's outcome. The preference
+    #             scoring is part of the ingestion, and the model construction and presolve reduction are part of the
+    #             solve, so their times are included in those of the enclosing stages.
+
+    # Time the scoring of the individual preferences where the ingestion does it in bulk, by wrapping the function it calls
+    ScoringTime = [0.0]
+    CalculatePreferencePointsMatrix = ScheduleShifts.CalculatePreferencePointsMatrix
+    def TimedCalculatePreferencePointsMatrix(*Arguments):
+        Start = time.perf_counter()
+        try:
+            return CalculatePreferencePointsMatrix(*Arguments)
+        finally:
+            ScoringTime[0] += time.perf_counter() - Start
+
+    # Time the ingestion of the sign-up sheets, which also scores the individual preferences in bulk and the groups one
+    # by one
+    ScheduleShifts.CalculatePreferencePointsMatrix = TimedCalculatePreferencePointsMatrix
+    try:
+        Start = time.perf_counter()
+        IndividualVolunteers = ScheduleShifts.ReadInIndividualVolunteerData(Shifts, os.path.join(Directory, 'Individual Preferences.csv'))
+        VolunteerGroups = ScheduleShifts.ReadInGroupVolunteerData(os.path.join(Directory, 'Group Volunteers.csv'))
+        ScheduleShifts.CapVolunteerGroups(VolunteerGroups, Shifts)
+        GroupStart = time.perf_counter()
+        for g in VolunteerGroups:
+            g.CalculateShiftPreferencePoints(Shifts)
+        ScoringTime[0] += time.perf_counter() - GroupStart
+        IngestionTime = time.perf_counter() - Start
+    finally:
+        ScheduleShifts.CalculatePreferencePointsMatrix = CalculatePreferencePointsMatrix
+
+    # Time the solve, as the program does it (with symmetry reduction and decomposition)
+    Options = ScheduleShifts.SolverOptions()
+    Options.MaxTime = MaxTime
+    Start = time.perf_counter()
+    Store = ScheduleShifts.Solve(IndividualVolunteers, Shifts, VolunteerGroups, Backend, Processes=1, Options=Options)
+    SolveTime = time.perf_counter() - Start
+
+    # Add up the presolve reductions and the construction of the models which were solved (over the classes of each
+    # component, after the presolve reduction), as recorded by the solves; no model is built when the presolve already
+    # proves its greedy solution optimal, and the flow backend has no presolve and builds and solves its network in one step
+    if Backend == 'cpsat':
+        ReductionTime = sum((Statistics['Reduction [s]'] for Statistics in Store.Statistics if 'Reduction [s]' in Statistics), 0.0)
+        BuildTime = sum((Statistics['Build [s]'] for Statistics in Store.Statistics if 'Build [s]' in Statistics), 0.0)
+    else:
+        (ReductionTime, BuildTime) = (None, None)
+
+    # Time the extraction and export of the schedules
+    with tempfile.TemporaryDirectory() as ExportDirectory:
+        Start = time.perf_counter()
+        ScheduleShifts.ExportSchedules(ScheduleShifts.ExtractSchedule(Store, Shifts), ExportDirectory)
+        ExportTime = time.perf_counter() - Start
+
+    # Collect the results
+    Results = {
+        'Volunteers' : len(IndividualVolunteers),
+        'Groups' : len(VolunteerGroups),
+        'Shifts' : len(Shifts),
+        'Components' : len(Store.Statistics),
+        'Ingestion [s]' : IngestionTime,
+        'Preference points, within ingestion [s]' : ScoringTime[0],
+        'Solve [s]' : SolveTime,
+        'Presolve reduction, within solve [s]' : ReductionTime,
+        'Build model, within solve [s]' : BuildTime,
+        'Export [s]' : ExportTime,
+        'Status' : Store.Status,
+        'Objective' : int(Store.Objective),
+    }
+
+    # Return the results
+    return Results
+
+def RunStageBenchmark(Sizes, Backend='cpsat', MaxTime=600.0, **WorkloadParameters):
+    # This function times each stage of a scheduling run across a sweep of workload sizes
+    # Inputs:
+    #   Sizes = the numbers of volunteers of the workloads
+    #   WorkloadParameters = the other parameters of WriteSyntheticWorkload
+    # Outputs:
+    #   Report = a dictionary of the software versions, the workload parameters and the results of each size, which can
+    #            be saved as JSON and compared between versions of the code
+
+    # Import the platform library and the library versions
+    import platform
+    import pandas
+    import ortools
+
+    # Describe the run
+    Report = {
+        'Python' : platform.python_version(),
+        'pandas' : pandas.__version__,
+        'ortools' : ortools.__version__,
+        'Backend' : Backend,
+        'Workload' : WorkloadParameters,
+        'Results' : [],
+    }
+
+    # Loop over the sizes
+    for NumberOfVolunteers in Sizes:
+
+        # Write the workload to a temporary directory and time its stages
+        with tempfile.TemporaryDirectory() as Directory:
+            Shifts = WriteSyntheticWorkload(Directory, NumberOfVolunteers, **WorkloadParameters)
+            Report['Results'].append(TimeStages(Directory, Shifts, Backend, MaxTime))
+
+    # Return the report
+    return Report
+
+def TimeIngestion(NumberOfRows, Shifts, Seed=0):
+    # This function times the ingestion and scoring of a synthetic individual preference file
+    # Outputs:
+    #   IngestionTime = the time taken to read the file and calculate the shift preference points, in seconds
+
+    # Write the synthetic file to a temporary directory
+    with tempfile.TemporaryDirectory() as Directory:
+        CSV_Name = os.path.join(Directory, 'Individual Preferences.csv')
+        WriteSyntheticPreferenceFile(CSV_Name, NumberOfRows, Shifts, Seed)
+
+        # Time the ingestion
+        Start = time.perf_counter()
+        ScheduleShifts.ReadInIndividualVolunteerData(Shifts, CSV_Name)
+        IngestionTime = time.perf_counter() - Start
+
+    # Return the time
+    return IngestionTime
+
+def BuildDenseModel(IndividualVolunteers, Shifts):
+    # This function builds the original, dense formulation of the model, with one variable per volunteer-shift pair.
+    # It is kept here only as the "before" reference for the benchmark.
+
+    # Instantiate the CP model
+    model = cp_model.CpModel()
+
+    # Create a decision variable for every volunteer-shift pair
+    Assignment = {}
+    for v in IndividualVolunteers:
+        for s in Shifts:
+            Assignment[(v,s)] = model.NewBoolVar('Volunteer %s assigned to %s shift' % (v.ID_Number,s))
+
+    # Each shift has a maximum number of volunteers assigned to it
+    for s in Shifts:
+        model.Add(
+            sum(Assignment[(v,s)] for v in IndividualVolunteers) <= Shifts[s].RequiredVolunteers
+        )
+
+    # Each volunteer is assigned to at most one shift
+    for v in IndividualVolunteers:
+        model.Add(
+            sum(Assignment[(v,s)] for s in Shifts) <= 1
+        )
+
+    # Each volunteer can only be assigned to one of the shifts they indicated in their preference list
+    for v in IndividualVolunteers:
+        for s in Shifts:
+            if not s in v.PreferredShifts:
+                model.Add(
+                    Assignment[(v,s)] == 0
+                )
+
+    # Look up the preference points of each volunteer by shift name
+    ShiftNames = ScheduleShifts.ListShiftNames(Shifts)
+    ShiftPreferencePoints = {v: {ShiftNames[i]: p for (i, p) in zip(v.ShiftIDs, v.Points)} for v in IndividualVolunteers}
+
+    # Define the objective, using the same weights as the production model
+    Scalar = ScheduleShifts.CalcObjectiveScalar(Shifts)
+    model.Maximize(
+        10 *
+        sum(
+            ((2 * Scalar + Shifts[s].RequiredVolunteers) // (2 * Shifts[s].RequiredVolunteers)) *
+            sum(Assignment[(v,s)] for v in IndividualVolunteers)
+            for s in Shifts
+        )
+        +
+        Scalar *
+        sum(
+            sum(Assignment[(v,s)] * ShiftPreferencePoints[v].get(s, 0) for v in IndividualVolunteers)
+            for s in Shifts
+        )
+    )
+
+    # Return the model
+    return (model, Assignment)
+
+def TimeBuildAndSolve(BuildFunction, IndividualVolunteers, Shifts, MaxTime):
+    # This function times the construction and solution of a CP model
+    # Outputs:
+    #   Results = a dictionary of timings, model sizes and the objective value
+
+    # Time the model construction
+    Start = time.perf_counter()
+    (model, Assignment) = BuildFunction(IndividualVolunteers, Shifts)
+    BuildTime = time.perf_counter() - Start
+
+    # Time the solve
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = MaxTime
+    Start = time.perf_counter()
+    Status = solver.Solve(model)
+    SolveTime = time.perf_counter() - Start
+
+    # Collect the results
+    Proto = model.Proto()
+    Results = {
+        'Variables' : len(Proto.variables),
+        'Constraints' : len(Proto.constraints),
+        'Build [s]' : BuildTime,
+        'Solve [s]' : SolveTime,
+        'Status' : solver.StatusName(Status),
+        'Objective' : solver.ObjectiveValue(),
+    }
+
+    # Return the results
+    return Results
+
+def TimeMinCostFlow(IndividualVolunteers, Shifts, MaxTime):
+    # This function times the min-cost flow backend, whose network construction is included in the solve time
+    # Outputs:
+    #   Results = a dictionary of timings, network sizes and the objective value
+
+    # Time the whole solve
+    Start = time.perf_counter()
+    Store = ScheduleShifts.SolveMinCostFlow(IndividualVolunteers, Shifts)
+    SolveTime = time.perf_counter() - Start
+
+    # Collect the results
+    Results = {
+        'Variables' : len(Store.Variables),
+        'Constraints' : 0,
+        'Build [s]' : 0.0,
+        'Solve [s]' : SolveTime,
+        'Status' : 'OPTIMAL',
+        'Objective' : Store.Objective,
+    }
+
+    # Return the results
+    return Results
+
+def BuildScalingShifts(DistinctRequirements):
+    # This function builds a week of 28 shifts whose requirements take the given number of distinct values
+    # Inputs:
+    #   DistinctRequirements = the number of distinct "Required Volunteers" values, i.e. 4, 5, 6, ... in turn
+    # Outputs:
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+
+    # Number the shifts of the standard week, and cycle their requirements through the distinct values
+    Config = {'Weekdays' : [], 'Shifts' : []}
+    for (i, ShiftName) in enumerate(ScheduleShifts.BuildShiftDictionary()):
+        Config['Shifts'].append({'Name' : ShiftName, 'RequiredVolunteers' : 4 + i % DistinctRequirements})
+
+    # Build the dictionary of shifts
+    return ScheduleShifts.BuildShiftDictionary(Config)
+
+def TimeObjectiveScaling(NumberOfVolunteers, DistinctRequirements, Seed=0, MaxTime=600.0):
+    # This function compares the old objective scalar (the product of the distinct requirements) with the current one
+    # (their least common multiple, capped) as the number of distinct requirements grows
+    # Outputs:
+    #   Results = a dictionary mapping each scaling to its largest objective coefficient and its benchmark results
+
+    # Build the shifts and the synthetic volunteers
+    Shifts = BuildScalingShifts(DistinctRequirements)
+    Volunteers = GenerateSyntheticVolunteers(NumberOfVolunteers, Shifts, Seed)
+
+    # Calculate both scalars
+    UniqueList = ScheduleShifts.GetUniqueListElements([Shifts[s].RequiredVolunteers for s in Shifts])
+    Scalars = {
+        'product' : ScheduleShifts.ListProd(UniqueList),
+        'lcm' : ScheduleShifts.CalcObjectiveScalar(Shifts),
+    }
+
+    # Loop over the scalings
+    Results = {}
+    for Name in Scalars:
+
+        # Calculate the largest objective coefficient, i.e. the coverage and preference terms of a first choice
+        Scalar = Scalars[Name]
+        MaxCoefficient = 10 * ((2 * Scalar + 4) // (2 * 4)) + Scalar * 6
+        Results[Name] = {'Scalar' : Scalar, 'Max coefficient' : MaxCoefficient}
+
+        # The solver only accepts 64-bit coefficients, and its objective must also fit once summed over the volunteers
+        if MaxCoefficient * NumberOfVolunteers >= 2**63:
+            Results[Name]['Status'] = 'OVERFLOW'
+            continue
+
+        # Build and solve the model
+        Results[Name].update(TimeBuildAndSolve(
+            lambda Volunteers, Shifts: ScheduleShifts.BuildModel(Volunteers, Shifts, Scalar=Scalar),
+            Volunteers,
+            Shifts,
+            MaxTime,
+        ))
+
+    # Return the results
+    return Results
+
+def MeasureMemory(NumberOfRows, Shifts, Seed=0):
+    # This function measures the memory used per volunteer by the volunteer records and by the solution of the problem
+    # Outputs:
+    #   Results = a dictionary of memory usage figures, in bytes per volunteer
+
+    # Write the synthetic file to a temporary directory
+    with tempfile.TemporaryDirectory() as Directory:
+        CSV_Name = os.path.join(Directory, 'Individual Preferences.csv')
+        WriteSyntheticPreferenceFile(CSV_Name, NumberOfRows, Shifts, Seed)
+
+        # Measure the memory held by the volunteer records once they are read in
+        gc.collect()
+        tracemalloc.start()
+        Volunteers = ScheduleShifts.ReadInIndividualVolunteerData(Shifts, CSV_Name)
+        gc.collect()
+        RecordsMemory = tracemalloc.get_traced_memory()[0]
+
+        # Measure the memory held by the solution of the flow backend, without classes or components
+        Store = ScheduleShifts.Solve(Volunteers, Shifts, Backend='flow', ReduceSymmetry=False, Decompose=False)
+        gc.collect()
+        (SolutionMemory, PeakMemory) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    # Collect the results
+    Results = {
+        'Records [B/volunteer]' : RecordsMemory / NumberOfRows,
+        'Solution [B/volunteer]' : (SolutionMemory - RecordsMemory) / NumberOfRows,
+        'Peak [B/volunteer]' : PeakMemory / NumberOfRows,
+    }
+
+    # Return the results
+    return Results
+
+def CrossCheckObjectives(ResultsByFormulation):
+    # This function checks that every formulation that was solved to optimality reached the same objective value
+    # Inputs:
+    #   ResultsByFormulation = a dictionary mapping formulation names to their benchmark results
+
+    # Collect the optimal objective values
+    OptimalObjectives = {}
+    for Name in ResultsByFormulation:
+        if ResultsByFormulation[Name]['Status'] == 'OPTIMAL':
+            OptimalObjectives[Name] = ResultsByFormulation[Name]['Objective']
+
+    # Check that they all agree
+    if len(set(OptimalObjectives.values())) > 1:
+        raise AssertionError('The formulations disagree on the optimal objective: %s' % OptimalObjectives)
+
+def main():
+
+    # Define the formulations that can be benchmarked
+    Formulations = {
+        'dense' : lambda Volunteers, Shifts, MaxTime: TimeBuildAndSolve(BuildDenseModel, Volunteers, Shifts, MaxTime),
+        'sparse' : lambda Volunteers, Shifts, MaxTime: TimeBuildAndSolve(ScheduleShifts.BuildModel, Volunteers, Shifts, MaxTime),
+        'flow' : TimeMinCostFlow,
+    }
+
+    # Parse the command line arguments
+    Parser = argparse.ArgumentParser(description='Benchmark the formulations and backends of the scheduling model.')
+    Parser.add_argument('--sizes', type=int, nargs='*', default=[10000, 100000], help='numbers of synthetic volunteers')
+    Parser.add_argument('--formulations', choices=list(Formulations), nargs='+', default=list(Formulations), help='formulations to benchmark')
+    Parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic data generator')
+    Parser.add_argument('--max-time', type=float, default=600.0, help='time limit of each solve, in seconds')
+    Parser.add_argument('--ingestion-sizes', type=int, nargs='*', default=[], help='numbers of synthetic sign-up rows for the ingestion benchmark')
+    Parser.add_argument('--memory-sizes', type=int, nargs='*', default=[], help='numbers of synthetic sign-up rows for the memory benchmark')
+    Parser.add_argument('--distinct-requirements', type=int, nargs='*', default=[], help='numbers of distinct shift requirements for the objective scaling benchmark')
+    Parser.add_argument('--scaling-size', type=int, default=10000, help='number of synthetic volunteers of the objective scaling benchmark')
+    Parser.add_argument('--stage-sizes', type=int, nargs='*', default=[], help='numbers of synthetic volunteers for the stage-by-stage benchmark')
+    Parser.add_argument('--backend', choices=['cpsat', 'flow'], default='cpsat', help='solver backend of the stage-by-stage benchmark')
+    Parser.add_argument('--json', default=None, help='file to save the stage-by-stage results to, as JSON')
+    Parser.add_argument('--generate', default=None, help='only write a synthetic workload of --workload-size volunteers to this directory')
+    Parser.add_argument('--workload-size', type=int, default=10000, help='number of volunteers of the workload written by --generate')
+    Parser.add_argument('--sites', type=int, default=1, help='number of sites of the synthetic workloads')
+    Parser.add_argument('--periods', type=int, default=4, help='number of shifts per day and site of the synthetic workloads')
+    Parser.add_argument('--preference-length', type=int, default=6, help='largest number of shifts ranked by a synthetic volunteer')
+    Parser.add_argument('--skew', type=float, default=1.0, help='popularity skew of the synthetic sign-ups (0 = every shift equally popular)')
+    Parser.add_argument('--preferred-ratio', type=float, default=0.25, help='fraction of preferred applicants among the synthetic volunteers')
+    Parser.add_argument('--groups', type=int, default=4, help='number of synthetic volunteer groups')
+    Parser.add_argument('--group-sizes', type=int, nargs=2, default=[3, 5], metavar=('MIN', 'MAX'), help='smallest and largest synthetic volunteer group')
+    Arguments = Parser.parse_args()
+
+    # Collect the parameters of the synthetic workloads
+    WorkloadParameters = {
+        'Seed' : Arguments.seed,
+        'Sites' : Arguments.sites,
+        'PeriodsPerDay' : Arguments.periods,
+        'PreferenceLength' : Arguments.preference_length,
+        'Skew' : Arguments.skew,
+        'PreferredRatio' : Arguments.preferred_ratio,
+        'NumberOfGroups' : Arguments.groups,
+        'GroupSizes' : tuple(Arguments.group_sizes),
+    }
+
+    # Only write a workload, if requested
+    if Arguments.generate != None:
+        os.makedirs(Arguments.generate, exist_ok=True)
+        WriteSyntheticWorkload(Arguments.generate, Arguments.workload_size, **WorkloadParameters)
+        print('Wrote a workload of %d volunteers to %s.' % (Arguments.workload_size, Arguments.generate))
+        return
+
+    # Time each stage across the workload sizes
+    if len(Arguments.stage_sizes) > 0:
+        Report = RunStageBenchmark(Arguments.stage_sizes, Arguments.backend, Arguments.max_time, **WorkloadParameters)
+        for Results in Report['Results']:
+            print('%7d volunteers, %5d shifts: ingestion %6.2f s (scoring %6.2f s), solve %6.2f s (%s), export %6.2f s, %s' % (
+                Results['Volunteers'],
+                Results['Shifts'],
+                Results['Ingestion [s]'],
+                Results['Preference points, within ingestion [s]'],
+                Results['Solve [s]'],
+                'reduction %6.2f s, build %6.2f s' % (Results['Presolve reduction, within solve [s]'], Results['Build model, within solve [s]']) if Results['Build model, within solve [s]'] != None else 'network built with the solve',
+                Results['Export [s]'],
+                Results['Status'],
+            ))
+
+        # Save the results
+        if Arguments.json != None:
+            import json
+            with open(Arguments.json, 'w') as f:
+                json.dump(Report, f, indent=4)
+
+    # Build the list of shifts
+    Shifts = ScheduleShifts.BuildShiftDictionary()
+
+    # Benchmark the ingestion of the individual preference file
+    for NumberOfRows in Arguments.ingestion_sizes:
+        print('%7d sign-up rows: ingestion and scoring %7.2f s' % (NumberOfRows, TimeIngestion(NumberOfRows, Shifts, Arguments.seed)))
+
+    # Benchmark the memory used per volunteer
+    for NumberOfRows in Arguments.memory_sizes:
+        Results = MeasureMemory(NumberOfRows, Shifts, Arguments.seed)
+        print('%7d sign-up rows: records %6.0f B/volunteer, solution %6.0f B/volunteer, peak %6.0f B/volunteer' % (
+            NumberOfRows,
+            Results['Records [B/volunteer]'],
+            Results['Solution [B/volunteer]'],
+            Results['Peak [B/volunteer]'],
+        ))
+
+    # Benchmark the objective scaling against the number of distinct shift requirements
+    for DistinctRequirements in Arguments.distinct_requirements:
+        Results = TimeObjectiveScaling(Arguments.scaling_size, DistinctRequirements, Arguments.seed, Arguments.max_time)
+        for Name in Results:
+            if Results[Name]['Status'] == 'OVERFLOW':
+                print('%2d distinct requirements, %-7s scalar: max coefficient %.3g, overflows 64-bit integers' % (
+                    DistinctRequirements, Name, Results[Name]['Max coefficient']))
+            else:
+                print('%2d distinct requirements, %-7s scalar: max coefficient %.3g, solve %7.2f s, %s' % (
+                    DistinctRequirements, Name, Results[Name]['Max coefficient'], Results[Name]['Solve [s]'], Results[Name]['Status']))
+
+    # Loop over the problem sizes
+    for NumberOfVolunteers in Arguments.sizes:
+
+        # Generate the synthetic volunteers
+        Volunteers = GenerateSyntheticVolunteers(NumberOfVolunteers, Shifts, Arguments.seed)
+
+        # Benchmark each formulation
+        ResultsByFormulation = {}
+        for Name in Arguments.formulations:
+
+            # Build and solve the model
+            Results = Formulations[Name](Volunteers, Shifts, Arguments.max_time)
+            ResultsByFormulation[Name] = Results
+
+            # Print the results
+            print('%7d volunteers, %-6s: %8d variables, %8d constraints, build %7.2f s, solve %7.2f s, %s, objective %d' % (
+                NumberOfVolunteers,
+                Name,
+                Results['Variables'],
+                Results['Constraints'],
+                Results['Build [s]'],
+                Results['Solve [s]'],
+                Results['Status'],
+                Results['Objective'],
+            ))
+
+        # Check that the formulations agree
+        CrossCheckObjectives(ResultsByFormulation)
+
+if __name__ == '__main__':
+    main()
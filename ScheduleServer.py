@@ -0,0 +1,552 @@
+# This script runs the scheduler as a shared service on this computer. Sign-up sheets are uploaded over HTTP, solved in a
+# bounded pool of worker processes, and the schedules are downloaded once they are ready. A typical session is:
+#   python ScheduleServer.py --port 8080
+#   curl -F "individual=@Individual Preferences.csv" -F "groups=@Group Volunteers.csv" "http://127.0.0.1:8080/jobs?backend=flow"
+#   curl -N http://127.0.0.1:8080/jobs/1/events
+#   curl -o "Shift-Focused Schedule.csv" http://127.0.0.1:8080/jobs/1/shift-focused
+# Only the Python standard library is used for the server, and it only listens on 127.0.0.1.
+
+# Import the standard libraries
+import argparse
+import asyncio
+import csv
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+import urllib.parse
+
+# Import the scheduling code
+import ScheduleShifts
+
+# Define the files of a job, by the name under which they are uploaded or downloaded
+UploadFiles = {
+    'individual' : 'Individual Preferences.csv',
+    'groups' : 'Group Volunteers.csv',
+    'shifts' : 'Shifts.json',
+}
+DownloadFiles = {
+    'shift-focused' : 'Shift-Focused Schedule.csv',
+    'volunteer-focused' : 'Volunteer-Focused Schedule.csv',
+}
+
+# Define the columns each uploaded sign-up sheet must have
+RequiredColumns = {
+    'individual' : ['First Name', 'Last Name', 'Preferred Applicants'] + ScheduleShifts.PreferenceColumns,
+    'groups' : ['Shift', 'Group', 'Volunteers'],
+}
+
+# Define the reason phrases of the HTTP status codes used by the server
+StatusReasons = {
+    200 : 'OK',
+    202 : 'Accepted',
+    400 : 'Bad Request',
+    404 : 'Not Found',
+    405 : 'Method Not Allowed',
+    409 : 'Conflict',
+    413 : 'Payload Too Large',
+    503 : 'Service Unavailable',
+}
+
+class ServiceError(Exception):
+    # This class describes a request which the server refuses, with the HTTP status code of the refusal
+
+    def __init__(self, Code, Message, Headers=None):
+        Exception.__init__(self, Message)
+        self.Code = Code
+        self.Headers = Headers or {}
+
+class ServiceJob():
+    # This class describes a scheduling job submitted to the service
+
+    def __init__(self):
+        self.ID_Number = 0
+        self.Directory = ''  # The directory holding the job's uploads and schedules
+        self.Settings = {}  # The solver settings of the job (see RunServiceJob)
+        self.Status = 'queued'  # 'queued', 'running', 'done' or 'failed'
+        self.Submitted = None
+        self.Started = None
+        self.Finished = None
+        self.Result = None  # The summary returned by RunServiceJob, once done
+        self.Error = ''
+        self.Events = []  # The status and progress events of the job, in order
+        self.Changed = None  # An asyncio event which is set, and replaced, whenever an event is added
+
+    def Describe(self):
+        # This function describes the job
+        # Outputs:
+        #   Description = a JSON serializable dictionary
+
+        # Describe the job
+        Description = {
+            'Job' : self.ID_Number,
+            'Status' : self.Status,
+            'Settings' : self.Settings,
+            'Submitted' : self.Submitted,
+            'Started' : self.Started,
+            'Finished' : self.Finished,
+            'Error' : self.Error,
+        }
+
+        # Add the summary of the schedule, and where to download it, once it is ready
+        if self.Result != None:
+            Description.update(self.Result)
+            Description['Downloads'] = ['/jobs/%d/%s' % (self.ID_Number, Name) for Name in DownloadFiles]
+
+        # Return the description
+        return Description
+
+class ScheduleService():
+    # This class runs the scheduling service: it accepts jobs over HTTP, solves each in a worker process of its own, and
+    # reports their progress.
+    # The event loop only parses requests and moves data around; everything slow (parsing uploads, reading and writing
+    # files, solving) runs in a thread or in a worker process. A job's solver stops at the job's time limit, and a worker
+    # which overruns it anyway (e.g. while reading a huge sheet) is killed, so that it cannot hold its slot for good. Submissions are refused with "503 Service Unavailable"
+    # once MaxQueuedJobs jobs are waiting for a worker, so that a burst of uploads cannot exhaust the memory or the disk.
+
+    def __init__(self, Directory='Service Jobs', Processes=None, MaxQueuedJobs=16, TimeLimit=300, MaxUploadBytes=50 * 2**20):
+        self.Directory = Directory  # The directory under which each job gets its own directory
+        self.Processes = Processes or os.cpu_count()  # The number of jobs solved at the same time
+        self.MaxQueuedJobs = MaxQueuedJobs  # The number of jobs which can wait for a worker
+        self.TimeLimit = TimeLimit  # The time limit of each job, in seconds
+        self.MaxUploadBytes = MaxUploadBytes  # The largest request body accepted
+        self.GracePeriod = 60  # The time a worker is given beyond its job's time limit to read and write the files, in seconds
+        self.Jobs = {}  # The jobs, indexed by ID number
+        self.JobCount = 0  # The number of jobs submitted, which numbers the jobs
+        self.Pending = 0  # The number of submissions whose uploads are being saved, which hold a place in the queue
+        self.Slots = None  # A semaphore held by each running job
+        self.Manager = None
+        self.Progress = None  # A queue on which the workers report the improving schedules they find
+        self.Loop = None
+        self.Port = None  # The port the service listens on, once it is serving
+
+    async def Serve(self, Port=8080):
+        # This function runs the service until it is interrupted
+        # Inputs:
+        #   Port = the port to listen on, or 0 to pick a free one
+
+        # Number the jobs after those of earlier runs, so that their directories are not reused
+        if os.path.isdir(self.Directory):
+            self.JobCount = max([int(Name) for Name in os.listdir(self.Directory) if Name.isdigit()], default=0)
+
+        # Start the queue on which the workers report their progress
+        self.Loop = asyncio.get_running_loop()
+        self.Slots = asyncio.Semaphore(self.Processes)
+        self.Manager = multiprocessing.Manager()
+        self.Progress = self.Manager.Queue()
+        Pump = threading.Thread(target=self.PumpProgress, daemon=True)
+        Pump.start()
+
+        # Serve the requests, on this computer only
+        Server = await asyncio.start_server(self.HandleConnection, '127.0.0.1', Port)
+        self.Port = Server.sockets[0].getsockname()[1]
+        print('Serving on http://127.0.0.1:%d/ with %d worker processes.' % (self.Port, self.Processes), flush=True)
+        try:
+            async with Server:
+                await Server.serve_forever()
+        finally:
+
+            # Stop the progress pump
+            self.Progress.put(None)
+            Pump.join()
+            self.Manager.shutdown()
+
+    def PumpProgress(self):
+        # This function forwards the progress reported by the workers to the event loop, in a thread of its own
+        while True:
+            Item = self.Progress.get()
+            if Item == None:
+                break
+            self.Loop.call_soon_threadsafe(self.Publish, Item[0], Item[1])
+
+    def Publish(self, ID_Number, Event):
+        # This function adds an event to a job, and wakes up the clients following it
+        # Inputs:
+        #   ID_Number = the ID number of the job
+        #   Event = a JSON serializable dictionary, with the kind of event under 'Event'
+
+        # Look up the job, ignoring late progress of a job which has already been finished
+        Job = self.Jobs.get(ID_Number)
+        if Job == None or (Job.Finished != None and Event['Event'] == 'solution'):
+            return
+
+        # Add the event, and wake up the clients
+        Event['Time'] = time.time()
+        Job.Events.append(Event)
+        Job.Changed.set()
+        Job.Changed = asyncio.Event()
+
+    async def HandleConnection(self, Reader, Writer):
+        # This function answers one HTTP request, and closes the connection
+        # Inputs:
+        #   Reader, Writer = the streams of the connection
+
+        # Answer the request, turning refusals into error responses
+        try:
+            try:
+                (Method, Path, Query, Headers, Body) = await ReadRequest(Reader, self.MaxUploadBytes)
+                await self.Route(Writer, Method, Path, Query, Headers, Body)
+            except ServiceError as e:
+                await WriteResponse(Writer, e.Code, {'Error' : str(e)}, Headers=e.Headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # the client went away
+        finally:
+            Writer.close()
+
+    async def Route(self, Writer, Method, Path, Query, Headers, Body):
+        # This function dispatches a request to the handler of its path
+        # Inputs:
+        #   Writer = the stream of the response
+        #   Method, Path, Query, Headers, Body = the parsed request (see ReadRequest)
+
+        # Split the path into its parts
+        Parts = [p for p in Path.split('/') if p != '']
+
+        # Submit a job, or list the jobs
+        if Parts == ['jobs']:
+            if Method == 'POST':
+                Job = await self.Submit(Query, Headers.get('content-type', ''), Body)
+                await WriteResponse(Writer, 202, Job.Describe(), Headers={'Location' : '/jobs/%d' % Job.ID_Number})
+            elif Method == 'GET':
+                await WriteResponse(Writer, 200, [Job.Describe() for Job in self.Jobs.values()])
+            else:
+                raise ServiceError(405, 'Use GET or POST.')
+            return
+
+        # Look up the job of the other paths
+        if len(Parts) < 2 or Parts[0] != 'jobs' or not Parts[1].isdigit() or not int(Parts[1]) in self.Jobs:
+            raise ServiceError(404, 'No such job or path.')
+        if Method != 'GET':
+            raise ServiceError(405, 'Use GET.')
+        Job = self.Jobs[int(Parts[1])]
+
+        # Describe the job, stream its events, or send one of its schedules
+        if len(Parts) == 2:
+            await WriteResponse(Writer, 200, Job.Describe())
+        elif Parts[2:] == ['events']:
+            await self.StreamEvents(Writer, Job)
+        elif len(Parts) == 3 and Parts[2] in DownloadFiles:
+            if Job.Status != 'done':
+                raise ServiceError(409, 'The schedule is not ready; the job is %s.' % Job.Status)
+            FileName = os.path.join(Job.Directory, DownloadFiles[Parts[2]])
+            Content = await asyncio.get_running_loop().run_in_executor(None, ReadFile, FileName)
+            await WriteResponse(Writer, 200, Content, 'text/csv', {'Content-Disposition' : 'attachment; filename="%s"' % DownloadFiles[Parts[2]]})
+        else:
+            raise ServiceError(404, 'No such job or path.')
+
+    async def Submit(self, Query, ContentType, Body):
+        # This function accepts a job
+        # Inputs:
+        #   Query = the query parameters: "backend" (cpsat or flow) and "max_time" (seconds, at most the service's limit)
+        #   ContentType, Body = the multipart/form-data upload of the sign-up sheets (see UploadFiles)
+        # Outputs:
+        #   Job = the new ServiceJob object
+
+        # Refuse the job if too many are waiting already, counting the submissions whose uploads are still being saved
+        Queued = sum(1 for Job in self.Jobs.values() if Job.Status == 'queued') + self.Pending
+        if Queued >= self.MaxQueuedJobs:
+            raise ServiceError(503, '%d jobs are already waiting; try again later.' % Queued, {'Retry-After' : '10'})
+
+        # Read the solver settings
+        Backend = Query.get('backend', 'cpsat')
+        if not Backend in ('cpsat', 'flow'):
+            raise ServiceError(400, 'The backend must be cpsat or flow.')
+        try:
+            MaxTime = min(float(Query.get('max_time', self.TimeLimit)), self.TimeLimit)
+        except ValueError:
+            raise ServiceError(400, 'The time limit must be a number of seconds.')
+
+        # Instantiate the job
+        Job = ServiceJob()
+        self.JobCount += 1
+        Job.ID_Number = self.JobCount
+        Job.Directory = os.path.join(self.Directory, str(Job.ID_Number))
+        Job.Settings = {'Backend' : Backend, 'MaxTime' : MaxTime}
+        Job.Submitted = time.time()
+        Job.Changed = asyncio.Event()
+
+        # Save the uploads in the job's directory, refusing malformed ones, while holding the job's place in the queue
+        self.Pending += 1
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, SaveUpload, ContentType, Body, Job.Directory)
+        except (ValueError, KeyError, IndexError, csv.Error) as e:
+            raise ServiceError(400, 'Malformed upload: %s' % e)
+        finally:
+            self.Pending -= 1
+
+        # Queue the job
+        self.Jobs[Job.ID_Number] = Job
+        self.Publish(Job.ID_Number, {'Event' : 'queued'})
+        asyncio.ensure_future(self.RunJob(Job))
+
+        # Return the job
+        return Job
+
+    async def RunJob(self, Job):
+        # This function solves a job in a worker process, once one is free
+        # Inputs:
+        #   Job = a ServiceJob object
+
+        # Wait for a free worker
+        async with self.Slots:
+
+            # Start the job in a worker process of its own, sharing the cores between the jobs which run at the same time
+            Job.Status = 'running'
+            Job.Started = time.time()
+            self.Publish(Job.ID_Number, {'Event' : 'running'})
+            Deadline = Job.Started + Job.Settings['MaxTime']
+            Workers = max(1, os.cpu_count() // self.Processes)
+            Worker = None
+            try:
+                (Receiver, Sender) = multiprocessing.Pipe(duplex=False)
+                Worker = multiprocessing.Process(target=RunServiceWorker, args=((Job.ID_Number, Job.Directory, Job.Settings, self.Progress, Deadline, Workers), Sender), daemon=True)
+                Worker.start()
+                Sender.close()
+
+                # Wait for the result, giving the worker some time beyond the solver's time limit to read and write the files
+                Loop = asyncio.get_running_loop()
+                Ready = await Loop.run_in_executor(None, Receiver.poll, max(0.0, Deadline + self.GracePeriod - time.time()))
+                try:
+                    Result = Receiver.recv() if Ready == True else None
+                except EOFError:  # the worker died without reporting
+                    Result = ('failed', 'The worker stopped unexpectedly (exit code %s).' % Worker.exitcode)
+                Receiver.close()
+
+                # Kill the worker if it overran its time limit, and wait for it to stop, which no longer takes long
+                if Result == None:
+                    Worker.kill()
+                    Result = ('failed', 'The job did not finish within its time limit.')
+                await Loop.run_in_executor(None, Worker.join)
+
+            # Fail the job if its worker could not be run or followed, rather than leaving it running for good
+            except Exception as e:
+                if Worker != None and Worker.pid != None:
+                    Worker.kill()
+                Result = ('failed', 'The worker could not be run (%s: %s).' % (type(e).__name__, e))
+
+            # Record the outcome
+            if Result[0] == 'done':
+                (Job.Status, Job.Result) = Result
+            else:
+                (Job.Status, Job.Error) = Result
+            Job.Finished = time.time()
+            self.Publish(Job.ID_Number, {'Event' : Job.Status, 'Error' : Job.Error})
+
+    async def StreamEvents(self, Writer, Job):
+        # This function sends the events of a job as they happen, one JSON object per line, until the job is finished
+        # Inputs:
+        #   Writer = the stream of the response
+        #   Job = a ServiceJob object
+
+        # Start the response, whose end is marked by closing the connection
+        Writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n')
+
+        # Send the events
+        Sent = 0
+        while True:
+
+            # Send the new events
+            Changed = Job.Changed
+            for Event in Job.Events[Sent:]:
+                Writer.write((json.dumps(Event) + '\n').encode())
+            Sent = len(Job.Events)
+            await Writer.drain()
+
+            # Stop once the job is finished, or wait for the next event
+            if Job.Finished != None:
+                break
+            await Changed.wait()
+
+async def ReadRequest(Reader, MaxBytes):
+    # This function reads an HTTP request
+    # Inputs:
+    #   Reader = the stream of the connection
+    #   MaxBytes = the largest body accepted
+    # Outputs:
+    #   (Method, Path, Query, Headers, Body) = the method, the path, a dictionary of query parameters, a dictionary of
+    #                                          headers (with lower case names) and the body
+
+    # Read the request line and the headers
+    try:
+        Head = await Reader.readuntil(b'\r\n\r\n')
+    except asyncio.LimitOverrunError:
+        raise ServiceError(413, 'The request headers are too large.')
+    Lines = Head.decode('latin-1').split('\r\n')
+    try:
+        (Method, Target, Version) = Lines[0].split(' ')
+    except ValueError:
+        raise ServiceError(400, 'Malformed request line.')
+    Headers = {}
+    for Line in Lines[1:]:
+        if ':' in Line:
+            (Name, Value) = Line.split(':', 1)
+            Headers[Name.strip().lower()] = Value.strip()
+
+    # Split the target into the path and the query parameters
+    Target = urllib.parse.urlsplit(Target)
+    Query = dict(urllib.parse.parse_qsl(Target.query))
+
+    # Read the body, refusing it before reading it if it is too large
+    try:
+        Length = int(Headers.get('content-length', 0) or 0)
+    except ValueError:
+        raise ServiceError(400, 'The Content-Length header must be a number of bytes.')
+    if Length < 0:
+        raise ServiceError(400, 'The Content-Length header must be a number of bytes.')
+    if Length > MaxBytes:
+        raise ServiceError(413, 'The upload is larger than %d bytes.' % MaxBytes)
+    Body = await Reader.readexactly(Length)
+
+    # Return the request
+    return (Method.upper(), urllib.parse.unquote(Target.path), Query, Headers, Body)
+
+async def WriteResponse(Writer, Code, Content, ContentType='application/json', Headers=None):
+    # This function writes an HTTP response
+    # Inputs:
+    #   Writer = the stream of the connection
+    #   Code = the HTTP status code
+    #   Content = the body, as bytes, or as a JSON serializable object
+    #   ContentType = the media type of a body given as bytes
+    #   Headers = a dictionary of extra headers
+
+    # Encode the body
+    if not isinstance(Content, bytes):
+        Content = (json.dumps(Content, indent=1) + '\n').encode()
+        ContentType = 'application/json'
+
+    # Write the status line, the headers and the body
+    Lines = ['HTTP/1.1 %d %s' % (Code, StatusReasons[Code]), 'Content-Type: %s' % ContentType, 'Content-Length: %d' % len(Content), 'Connection: close']
+    for (Name, Value) in (Headers or {}).items():
+        Lines.append('%s: %s' % (Name, Value))
+    Writer.write(('\r\n'.join(Lines) + '\r\n\r\n').encode('latin-1') + Content)
+    await Writer.drain()
+
+def SaveUpload(ContentType, Body, Directory):
+    # This function saves the sign-up sheets of a multipart/form-data upload in a job's directory
+    # Inputs:
+    #   ContentType = the Content-Type header of the upload
+    #   Body = the body of the upload
+    #   Directory = the job's directory, which is created
+    # The "individual" part is required. Without a "groups" part, the job has no volunteer groups, and without a
+    # "shifts" part (a shift table, see ScheduleShifts.ReadInShiftConfig), every period of every day of the week is scheduled.
+
+    # Import the email libraries, which parse multipart messages
+    import email.parser
+    import email.policy
+
+    # Parse the upload
+    if not ContentType.startswith('multipart/form-data'):
+        raise ValueError('Upload the sign-up sheets as multipart/form-data.')
+    Message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(b'Content-Type: ' + ContentType.encode('latin-1') + b'\r\n\r\n' + Body)
+    Parts = {}
+    for Part in Message.iter_parts():
+        Parts[Part.get_param('name', header='content-disposition')] = Part.get_payload(decode=True)
+    if not 'individual' in Parts:
+        raise ValueError('The upload has no "individual" part with the individual preferences.')
+
+    # Check that the sign-up sheets are csv files with the columns the scheduler reads
+    Parts.setdefault('groups', b'Shift,Group,Volunteers\n')
+    for (Name, Columns) in RequiredColumns.items():
+        Header = next(csv.reader(io.StringIO(Parts[Name].decode('utf-8-sig'))), [])
+        Missing = [Column for Column in Columns if not Column in Header]
+        if len(Missing) > 0:
+            raise ValueError('The "%s" sheet is missing the columns %s.' % (Name, ', '.join('"%s"' % Column for Column in Missing)))
+
+    # Write the files, with an empty group sheet if none was uploaded
+    os.makedirs(Directory, exist_ok=True)
+    for (Name, FileName) in UploadFiles.items():
+        if Name in Parts:
+            with open(os.path.join(Directory, FileName), 'wb') as f:
+                f.write(Parts[Name])
+
+def ReadFile(FileName):
+    # This function reads a whole file
+    with open(FileName, 'rb') as f:
+        return f.read()
+
+def RunServiceWorker(Job, Sender):
+    # This function runs a job of the service in a worker process, and sends its outcome back
+    # Inputs:
+    #   Job = the job (see RunServiceJob)
+    #   Sender = the connection on which a ('done', summary) or ('failed', error message) pair is sent
+
+    # Run the job, reporting its error if it fails
+    try:
+        Result = ('done', RunServiceJob(Job))
+    except Exception as e:
+        Result = ('failed', '%s: %s' % (type(e).__name__, e))
+
+    # Send the outcome
+    Sender.send(Result)
+    Sender.close()
+
+def RunServiceJob(Job):
+    # This function schedules a job of the service, in a worker process
+    # Inputs:
+    #   Job = an (ID number, directory, settings, progress queue, deadline, search workers) tuple; each improving schedule
+    #         found is reported on the queue as an (ID number, event) pair, the solver stops at the deadline (a wall-clock
+    #         time), and the CP solver uses the given number of search workers
+    # Outputs:
+    #   Summary = a dictionary of the schedule's status, objective and summary statistics, and of the problems found in
+    #             the sign-up sheets
+
+    # Unpack the job
+    (ID_Number, Directory, Settings, Progress, Deadline, Workers) = Job
+
+    # Build the shift table
+    ShiftFile = os.path.join(Directory, UploadFiles['shifts'])
+    if os.path.exists(ShiftFile):
+        Shifts = ScheduleShifts.ReadInShiftConfig(ShiftFile)
+    else:
+        Shifts = ScheduleShifts.BuildShiftDictionary()
+
+    # Set up the scheduler, solving the components one after the other since the jobs already run in parallel
+    s = ScheduleShifts.Scheduler(Shifts)
+    s.Backend = Settings['Backend']
+    s.Options.Workers = Workers
+    s.Processes = 1
+
+    # Read in the volunteers and groups
+    s.Load(os.path.join(Directory, UploadFiles['individual']), os.path.join(Directory, UploadFiles['groups']))
+
+    # Define the function which reports an improving schedule
+    def OnSolution(Schedule):
+        Progress.put((ID_Number, {'Event' : 'solution', 'Objective' : int(Schedule.Objective), 'Statistics' : ScheduleShifts.CalcSummaryStatistics(Schedule)}))
+
+    # Find the optimal shift assignment, stopping the solver at the job's deadline, and write the schedules
+    s.Options.MaxTime = max(0.0, Deadline - time.time())
+    s.Solve(OnSolution=OnSolution)
+    s.Export(Directory)
+
+    # Return the summary
+    return {
+        'Solver status' : s.Store.Status,
+        'Objective' : int(s.Store.Objective),
+        'Statistics' : ScheduleShifts.CalcSummaryStatistics(s.Schedule),
+        'Problems' : s.Validate(),
+    }
+
+def main():
+    # This function is the command-line entry point
+
+    # Parse the command line arguments
+    Parser = argparse.ArgumentParser(description='Run the Y2Y scheduler as a service on this computer.')
+    Parser.add_argument('--port', type=int, default=8080, help='the port to listen on, on 127.0.0.1 (0 picks a free port)')
+    Parser.add_argument('--directory', default='Service Jobs', help='the directory under which the uploads and schedules of each job are kept')
+    Parser.add_argument('--processes', type=int, default=None, help='the number of jobs solved at the same time (default: one per core)')
+    Parser.add_argument('--max-queued-jobs', type=int, default=16, help='the number of jobs which can wait for a worker before new jobs are refused')
+    Parser.add_argument('--time-limit', type=float, default=300, help='the time limit of each job, in seconds')
+    Parser.add_argument('--max-upload', type=float, default=50, help='the largest upload accepted, in megabytes')
+    Arguments = Parser.parse_args()
+
+    # Run the service until it is interrupted
+    Service = ScheduleService(Arguments.directory, Arguments.processes, Arguments.max_queued_jobs, Arguments.time_limit, int(Arguments.max_upload * 2**20))
+    try:
+        asyncio.run(Service.Serve(Arguments.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
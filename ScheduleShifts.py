@@ -1,70 +1,188 @@
-# Import the pandas library
-import pandas as pd
-
-# Import the OR-Tools library
-from ortools.sat.python import cp_model
+# Import the standard libraries
+import argparse
+import itertools
+import time
+
+# Import the numpy library
+import numpy as np
+
+# The pandas and OR-Tools libraries are slow to import, so they are only imported by the functions which use them.
+# This keeps importing the module, "--help" and "--validate" fast.
+
+# Define the weights of the various objectives
+ObjectiveWeights = {
+    'Maximize the shift coverage' : 10,
+    'Respect the volunteer preferences' : 1,
+    'Keep the published assignments' : 0,  # Points per volunteer kept on their previous shift (see ApplyPreviousSchedule)
+    'Preferred volunteer multiplier' : 2,  # Preferred volunteers earn this many times the preference points of the others
+}
+
+# Define the standard shift table: every period of every day of the week.
+# Other tables can be read from a JSON file with the same layout (see ReadInShiftConfig), which may also list
+#   "Sites": a list of {"Name": ..., "Weekdays": [...], "Periods": [...]} entries, whose shift names start with the site's
+#            name and whose missing "Weekdays" and "Periods" fall back on those of the whole table
+#   "Shifts": a list of {"Name": ..., "RequiredVolunteers": ...} one-off shifts (e.g. holidays), which may also change
+#             the requirement of a weekly shift; with "Weekday" and "Period" (and "Site") keys, they also get the conflicts
+#             of that period
+#   "Conflicts": a list of {"First": period, "Second": period, "Days later": n} pairs of periods which cannot be held by
+#                the same volunteer, e.g. because they are back to back (see AddConflicts)
+DefaultShiftConfig = {
+    'Weekdays' : [
+        'Sunday',
+        'Monday',
+        'Tuesday',
+        'Wednesday',
+        'Thursday',
+        'Friday',
+        'Saturday',
+    ],
+    'Periods' : [
+        {'Name' : 'Breakfast', 'RequiredVolunteers' : 8},
+        {'Name' : 'Dinner', 'RequiredVolunteers' : 6},
+        {'Name' : 'Evening', 'RequiredVolunteers' : 5},
+        {'Name' : 'Overnight', 'RequiredVolunteers' : 4},
+    ],
+    'Conflicts' : [
+        {'First' : 'Dinner', 'Second' : 'Evening'},
+        {'First' : 'Evening', 'Second' : 'Overnight'},
+        {'First' : 'Overnight', 'Second' : 'Breakfast', 'Days later' : 1},
+    ],
+}
+
+# Define the largest objective scalar (see CalcObjectiveScalar). This is the least common multiple of 1 to 20,
+# so the coverage term of any shift table with requirements up to 20 is scaled exactly, while the objective
+# coefficients stay far from overflowing 64-bit integers.
+MaxObjectiveScalar = 232792560
 
 class Volunteer():
-    # This class describes individual volunteers
+    # This class describes individual volunteers.
+    # The attributes are fixed by __slots__, which keeps the memory footprint of large volunteer pools small.
+
+    __slots__ = ('ID_Number', 'FirstName', 'LastName', 'IsPreferredVolunteer', 'MaxShifts', 'PreferredShifts', 'ShiftIDs', 'Points', 'PreviousCounts')
+
+    Volunteers = 1  # An individual volunteer is a single volunteer (compare with VolunteerGroup and VolunteerClass)
 
     def __init__(self):
         self.ID_Number = 0
         self.FirstName = ''
         self.LastName = ''
         self.IsPreferredVolunteer = False
+        self.MaxShifts = 1  # The number of shifts the volunteer can take, which must not conflict (see AddConflicts)
         self.PreferredShifts = []
-        self.ShiftPreferencePoints = {}
+        self.ShiftIDs = ()  # The ID numbers of the shifts the volunteer could be assigned to, in order of preference
+        self.Points = ()  # The preference points of each of those shifts
+        self.PreviousCounts = ()  # 1 for each shift the volunteer held in the previous schedule, 0 for the others (empty if none)
 
     def CalculateShiftPreferencePoints(self, Shifts):
+        # This function calculates the points of each shift in the volunteer's preference list.
+        # The shifts that are not listed are worth 0 points and are left out.
 
-        # Instantiate the dictionary of shift preference points
-        self.ShiftPreferencePoints = {}
+        # Initialize the lists of shift ID numbers and points
+        ShiftIDs = []
+        Points = []
 
-        # Initialize a point value of zero for each shift
-        for s in Shifts:
-            self.ShiftPreferencePoints[s] = 0
+        # Find the length of the list
+        ListLength = len(self.PreferredShifts)
 
-        # Assign preference points for each of the volunteer's preferred shifts
-        for s in Shifts:
-            
-            # Check if the current shift is in the volunteer's list of preferred shifts
-            if not s in self.PreferredShifts:  # then it's not there
+        # Assign preference points for each of the volunteer's preferred shifts, in a single pass over the list
+        for (Index, s) in enumerate(self.PreferredShifts):
 
-                # Assign 0 preference points to this shift for this volunteer
-                self.ShiftPreferencePoints[s] = 0
+            # Skip blank cells, misspelled shift names and repeated preferences
+            if not s in Shifts or Shifts[s].ID_Number in ShiftIDs:
+                continue
 
-            else: # the shift *is* in the volunteer's list of preferred shifts
+            # Calculate the number of points corresponding to this index
+            ShiftPoints = ListLength - Index  # Index = 0 ==> max points,  Index = Max Index ==> 1 point
 
-                # Find the position of the shift in the list
-                Index = self.PreferredShifts.index(s)
+            # Check if this is a preferred volunteer
+            if self.IsPreferredVolunteer == True:
 
-                # Find the length of the list
-                ListLength = len(self.PreferredShifts)
+                # Increase the points
+                ShiftPoints = ShiftPoints * 2  # This ensures preferential treatment for preferred volunteers
 
-                # Calculate the number of points corresponding to this index
-                self.ShiftPreferencePoints[s] = ListLength - Index  # Index = 0 ==> max points,  Index = Max Index ==> 1 point
+            # Record the shift and its points
+            ShiftIDs.append(Shifts[s].ID_Number)
+            Points.append(ShiftPoints)
 
-                # Check if this is a preferred volunteer
-                if self.IsPreferredVolunteer == True: 
-
-                    # Increase the points
-                    self.ShiftPreferencePoints[s] = self.ShiftPreferencePoints[s] * 2  # This ensures preferential treatment for preferred volunteers
+        # Store the results
+        self.ShiftIDs = tuple(ShiftIDs)
+        self.Points = tuple(Points)
 
 class VolunteerGroup():
-    # This class describes volunteer groups
+    # This class describes volunteer groups.
+    # A group is scheduled as a single unit, whose members are interchangeable; the members' names are only
+    # expanded when the schedule is reported.
+
+    MaxShifts = 1  # Each member takes at most one shift
 
     def __init__(self):
         self.ID_Number = 0
         self.GroupName = ''
         self.AssignedShift = ''
         self.Volunteers = 0
+        self.IsPreferredVolunteer = True  # Group members are treated as preferred volunteers
+        self.PreferredShifts = []
+        self.ShiftIDs = ()
+        self.Points = ()
+        self.PreviousCounts = ()  # The number of members who held each shift in the previous schedule (empty if none)
+        self.FirstMember = 0  # The number of members of the group listed before this part of it (see SplitVolunteerGroups)
+
+    def ExpandVolunteers(self, Count):
+        # This function creates individual volunteer objects for the first "Count" members of the group
+        # Outputs:
+        #   Members = a list of volunteer objects named after the group
+
+        # Instantiate the list of members
+        Members = []
+
+        # Create an individual volunteer object for each member
+        for VolunteerIndex in range(Count):
+
+            # Instantiate a new individual volunteer
+            v = Volunteer()
+
+            # Create a placeholder for the name of the volunteer
+            v.FirstName = self.GroupName
+            v.LastName = 'Volunteer %d' % (self.FirstMember + VolunteerIndex + 1)
+
+            # Specify them as a preferred volunteer
+            v.IsPreferredVolunteer = self.IsPreferredVolunteer
+
+            # Specify their first preference for a shift as the group's preference
+            v.PreferredShifts = [ self.AssignedShift ]
+
+            # Specify their other preferences as empty
+            for _ in range(4):
+                v.PreferredShifts.append('')
+
+            # Add this individual to the list of members
+            Members.append(v)
+
+        # Return the list of members
+        return Members
+
+    def CalculateShiftPreferencePoints(self, Shifts):
+        # This function calculates the preference points of each member of the group, which are the same for all members
+
+        # Calculate the points of a representative member
+        Member = self.ExpandVolunteers(1)[0]
+        Member.CalculateShiftPreferencePoints(Shifts)
+
+        # Adopt them as the group's points
+        self.ShiftIDs = Member.ShiftIDs
+        self.Points = Member.Points
 
 class Shift():
     # This class describes shifts
 
     def __init__(self):
+        self.ID_Number = 0  # The position of the shift in the shift dictionary (see InternShifts)
         self.ShiftName = ''
         self.RequiredVolunteers = 0
+        self.Site = ''  # Where and when the shift takes place, if it was built from a weekly template (see BuildShiftDictionary)
+        self.Weekday = ''
+        self.Period = ''
+        self.Conflicts = []  # The names of the sets of shifts, including this one, of which a volunteer can hold at most one
 
 class Period():
     # This class describes periods
@@ -73,39 +191,379 @@ class Period():
         self.Name = Name
         self.RequiredVolunteers = RequiredVolunteers
         
-def ReadInIndividualVolunteerData():
-    # This function reads the preferences into a data frame
+class VolunteerClass():
+    # This class describes a set of individual volunteers with identical preference profiles.
+    # The members of a class are interchangeable, so the model only decides how many of them are assigned to each shift.
 
-    # Specify the name of the csv file
-    CSV_Name = 'Individual Preferences.csv'
+    __slots__ = ('ID_Number', 'Members', 'Volunteers', 'IsPreferredVolunteer', 'ShiftIDs', 'Points', 'PreviousCounts')
+
+    MaxShifts = 1  # Only volunteers who take at most one shift are collapsed into classes (see CollapseEquivalentVolunteers)
+
+    def __init__(self):
+        self.ID_Number = 0
+        self.Members = []  # The individual volunteers in the class, in sign-up order
+        self.Volunteers = 0  # The multiplicity of the class
+        self.IsPreferredVolunteer = False
+        self.ShiftIDs = ()
+        self.Points = ()
+        self.PreviousCounts = ()  # The number of members who held each shift in the previous schedule (empty if none)
+
+class AssignmentStore():
+    # This class stores the decision variables and the solution of the model in flat arrays.
+    # The units (volunteers, groups or classes) are numbered by their position in the list of units, and the shifts by
+    # their ID numbers. Unit k has one entry per shift it ranked, in order of preference, at positions
+    # Offsets[k] to Offsets[k+1] - 1 of the entry arrays.
+
+    def __init__(self, Units):
+
+        # Store the units
+        self.Units = list(Units)
+
+        # Number of volunteers represented by each unit
+        self.Headcounts = np.fromiter((u.Volunteers for u in self.Units), dtype=np.int64, count=len(self.Units))
+
+        # Number of shifts each member of each unit can take
+        self.MaxShifts = np.fromiter((u.MaxShifts for u in self.Units), dtype=np.int64, count=len(self.Units))
+
+        # Whether each unit is made up of preferred volunteers
+        self.IsPreferred = np.fromiter((u.IsPreferredVolunteer == True for u in self.Units), dtype=bool, count=len(self.Units))
+
+        # Position of the first entry of each unit
+        Lengths = np.fromiter((len(u.ShiftIDs) for u in self.Units), dtype=np.int64, count=len(self.Units))
+        self.Offsets = np.zeros(len(self.Units) + 1, dtype=np.int64)
+        np.cumsum(Lengths, out=self.Offsets[1:])
+
+        # Shift ID number and preference points of each entry
+        self.ShiftIDs = np.fromiter(itertools.chain.from_iterable(u.ShiftIDs for u in self.Units), dtype=np.int32, count=self.Offsets[-1])
+        self.Points = np.fromiter(itertools.chain.from_iterable(u.Points for u in self.Units), dtype=np.int64, count=self.Offsets[-1])
+
+        # Number of volunteers of each entry who held its shift in the previous schedule
+        self.Previous = np.zeros(self.Offsets[-1], dtype=np.int64)
+        for (k, u) in enumerate(self.Units):
+            if len(u.PreviousCounts) > 0:
+                self.Previous[self.Offsets[k]:self.Offsets[k + 1]] = u.PreviousCounts
+
+        # Decision variable (cpsat) or arc (flow) of each entry, filled in by the backend
+        self.Variables = None
+        self.VariableIndices = None  # The index of each CP variable in the model, used to read the solution in bulk
+
+        # Solution value of each entry, and the objective value, filled in by the backend
+        self.Values = np.zeros(self.Offsets[-1], dtype=np.int64)
+        self.Objective = 0
+        self.Status = 'OPTIMAL'  # The solver status, e.g. 'FEASIBLE' if a time limit stopped the search early
+        self.Statistics = []  # The model and solver statistics of each solve that contributed to the solution (see SolveSubproblem)
+
+    def UnitOfEachEntry(self):
+        # This function returns the position of the unit of each entry
+        return np.repeat(np.arange(len(self.Units)), np.diff(self.Offsets))
+
+    def CountKeptAssignments(self):
+        # This function counts the assignments of the previous schedule which the solution keeps
+        # Outputs:
+        #   (Kept, Previous) = the number of volunteers kept on their previous shift, and the number previously assigned
+
+        # Count the assignments
+        Kept = int(np.minimum(self.Values, self.Previous).sum())
+        Previous = int(self.Previous.sum())
+
+        # Return the counts
+        return (Kept, Previous)
+
+    def ReadSolution(self, solver):
+        # This function reads the values of all of the decision variables from a CP solver which has solved the model,
+        # or from a solution callback during the search.
+        # The whole solution vector is copied out of the solver's response at once, instead of querying the variables one by one.
+
+        # Get the solver's response
+        if hasattr(solver, 'Response'):  # it's a solution callback
+            Response = solver.Response()
+            self.Status = 'FEASIBLE'
+        else:
+            Response = solver.ResponseProto()
+            self.Status = Response.status.name
+
+        # Get the solution vector of the model
+        Solution = np.array(Response.solution, dtype=np.int64)
+
+        # Pick out the values of the store's variables (all zero if the solver found no solution)
+        if len(Solution) == 0:
+            self.Values = np.zeros(len(self.Variables), dtype=np.int64)
+        else:
+            self.Values = Solution[self.VariableIndices]
+        self.Objective = solver.ObjectiveValue()
+
+class SolverOptions():
+    # This class describes the options of the CP solver.
+    # The min-cost flow backend always runs to optimality, so it ignores them.
+
+    def __init__(self):
+        self.MaxTime = None  # The time limit of the whole solve, in seconds
+        self.Workers = None  # The number of parallel search workers
+        self.RelativeGap = None  # The search stops once the objective is within this fraction of the best bound
+        self.Seed = None  # The random seed of the search
+        self.Deadline = None  # The wall-clock time at which the time limit runs out (set by Solve)
+        self.RecordLog = False  # Whether to record the solver log, so that the presolve and search times can be told apart
+        self.Presolve = True  # Whether to simplify the problem, and try a greedy solution, before the CP solver (see PresolveAssignments)
+
+    def Configure(self, solver):
+        # This function applies the options to a CP solver
+
+        # Set the time limit to the time remaining until the deadline, so that it covers every component of the problem
+        if self.Deadline != None:
+            solver.parameters.max_time_in_seconds = max(0.0, self.Deadline - time.time())
+        elif self.MaxTime != None:
+            solver.parameters.max_time_in_seconds = self.MaxTime
+
+        # Set the other options
+        if self.Workers != None:
+            solver.parameters.num_workers = self.Workers
+        if self.RelativeGap != None:
+            solver.parameters.relative_gap_limit = self.RelativeGap
+        if self.Seed != None:
+            solver.parameters.random_seed = self.Seed
+
+def MakeSolutionStreamer(Store, OnSolution):
+    # This function creates a CP solver callback which passes each improving solution on to a function, as a solved assignment store.
+    # The callback class is defined here, rather than at module level, because it derives from an OR-Tools class.
+
+    # Import the OR-Tools library
+    from ortools.sat.python import cp_model
+
+    class SolutionStreamer(cp_model.CpSolverSolutionCallback):
+
+        def __init__(self):
+            cp_model.CpSolverSolutionCallback.__init__(self)
+
+        def on_solution_callback(self):
+            Store.ReadSolution(self)
+            OnSolution(Store)
+
+    # Return the callback
+    return SolutionStreamer()
+
+class RunReport():
+    # This class records where the time of a run goes: the wall-clock time, CPU time and peak memory of each stage of
+    # the pipeline, and the model and solver statistics of each solve (see SolveSubproblem).
+    # It is saved as "Run Report.json" and "Run Report.csv" next to the schedules.
+
+    def __init__(self):
+        self.Started = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.Stages = []  # A list of dictionaries, one per stage, in the order they ran
+        self.Solves = []  # A list of dictionaries, one per model solved
+        self.Settings = {}  # The settings of the run (see Scheduler.Settings)
+        self.CacheHit = False
+
+    def Stage(self, Name):
+        # This function returns a context manager which records the time and memory taken by the code it wraps
+
+        # Import the contextlib library
+        import contextlib
+
+        @contextlib.contextmanager
+        def Measure():
+
+            # Start the clocks
+            WallStart = time.perf_counter()
+            CPUStart = time.process_time()
+
+            # Run the stage, recording it even if it fails
+            try:
+                yield
+            finally:
+                self.Stages.append({
+                    'Stage' : Name,
+                    'Wall [s]' : time.perf_counter() - WallStart,
+                    'CPU [s]' : time.process_time() - CPUStart,
+                    'Peak memory [MB]' : PeakMemory(),
+                })
+
+        # Return the context manager
+        return Measure()
+
+    def Save(self, Directory='.'):
+        # This function writes the report as JSON, and as a CSV file with one (section, name, metric, value) row per figure
+
+        # Import the csv, json and os libraries
+        import csv
+        import json
+        import os
+
+        # Write the JSON report
+        Report = {
+            'Started' : self.Started,
+            'Settings' : self.Settings,
+            'Cache hit' : self.CacheHit,
+            'Stages' : self.Stages,
+            'Solves' : self.Solves,
+        }
+        with open(os.path.join(Directory, 'Run Report.json'), 'w') as f:
+            json.dump(Report, f, indent=4)
+
+        # Write the CSV report
+        with open(os.path.join(Directory, 'Run Report.csv'), mode='w', newline='') as f:
+            Writer = csv.writer(f)
+            Writer.writerow(['Section', 'Name', 'Metric', 'Value'])
+            for Stage in self.Stages:
+                for Metric in Stage:
+                    if Metric != 'Stage':
+                        Writer.writerow(['Stage', Stage['Stage'], Metric, Stage[Metric]])
+            for (i, Statistics) in enumerate(self.Solves):
+                for Metric in Statistics:
+                    Writer.writerow(['Solve', i + 1, Metric, Statistics[Metric]])
+
+def PeakMemory():
+    # This function returns the peak resident memory of the process so far, in megabytes, or None where the operating
+    # system does not report it (the resource library is not available on Windows)
+
+    # Import the resource and sys libraries
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+
+    # Get the peak resident memory, which is in kilobytes on Linux and in bytes on macOS
+    Peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        Peak = Peak / 1024
+
+    # Return it in megabytes
+    return Peak / 1024
+
+def ParseSearchStart(LogLines):
+    # This function finds the time at which the CP solver finished presolving and started searching, from its log
+    # Outputs:
+    #   SearchStart = the time in seconds since the start of the solve, or None if the search never started
+
+    # Import the re library
+    import re
+
+    # The search events are logged as e.g. "#1       0.06s best:194310 ..." or "#Bound   0.05s ..."
+    for Line in LogLines:
+        Match = re.match(r'#\S+\s+([0-9.]+)s ', Line)
+        if Match != None:
+            return float(Match.group(1))
+
+    # The search never started
+    return None
+
+class ShiftSchedule():
+    # This class describes a solved schedule in the form used for reporting.
+    # It is built once from an assignment store (see ExtractSchedule), and shared by all of the reporting functions.
+
+    def __init__(self):
+        self.Shifts = {}  # The dictionary of shift objects, indexed by shift names
+        self.Rosters = {}  # A dictionary mapping each shift name to the list of volunteers assigned to it
+        self.VolunteerAssignments = []  # A list of (volunteer, shift name) tuples, where the shift name is None for unassigned volunteers
+        self.Objective = 0
+
+# Specify the columns of the individual preference data that list the volunteers' preferred shifts, in order
+PreferenceColumns = [
+    '1st Preference',
+    '2nd Preference',
+    '3rd Preference',
+    '4th Preference',
+    '5th Preference',
+    '6th Preference',
+]
+
+def CalculatePreferencePointsMatrix(ShiftIDs, IsPreferredVolunteer):
+    # This function calculates the shift preference points of every volunteer at once, as a sparse matrix
+    # Inputs:
+    #   ShiftIDs = an integer array with one row per volunteer and one column per preference, holding the ID number of
+    #              each preferred shift, or -1 for blank cells and misspelled shift names
+    #   IsPreferredVolunteer = a boolean array with one entry per volunteer
+    # Outputs:
+    #   (RowStarts, ShiftIndices, Points) = the matrix in compressed sparse row (CSR) format: the nonzero points of
+    #                                       volunteer i are Points[RowStarts[i]:RowStarts[i+1]], in order of preference,
+    #                                       for the shifts ShiftIndices[RowStarts[i]:RowStarts[i+1]]
+
+    # Get the length of the preference lists
+    (_, ListLength) = ShiftIDs.shape
+
+    # Flag the valid preferences, dropping blanks, misspelled shift names and repeated preferences
+    IsValid = ShiftIDs >= 0
+    for Index in range(1, ListLength):
+        for EarlierIndex in range(Index):
+            IsValid[:, Index] &= ShiftIDs[:, Index] != ShiftIDs[:, EarlierIndex]
+
+    # Calculate the number of points corresponding to each index
+    Points = np.broadcast_to(ListLength - np.arange(ListLength, dtype=np.int32), ShiftIDs.shape)  # Index = 0 ==> max points,  Index = Max Index ==> 1 point
+
+    # Double the points of the preferred volunteers
+    Points = Points * np.where(IsPreferredVolunteer, 2, 1).astype(np.int32)[:, None]  # This ensures preferential treatment for preferred volunteers
+
+    # Compress the matrix, keeping the entries of each row in order of preference
+    RowStarts = np.zeros(len(ShiftIDs) + 1, dtype=np.int64)
+    np.cumsum(IsValid.sum(axis=1), out=RowStarts[1:])
+
+    # Return the matrix
+    return (RowStarts, ShiftIDs[IsValid].astype(np.int32), Points[IsValid])
+
+def ReadInIndividualVolunteerData(Shifts, CSV_Name='Individual Preferences.csv'):
+    # This function reads the preferences into a data frame and converts them into volunteer objects
+    # Inputs:
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   CSV_Name = the name of the csv file
+    # Outputs:
+    #   Volunteers = a list of volunteer objects, with their shift preference points already calculated
+    #
+    # The columns are processed as whole arrays, rather than row by row, so that large sign-up sheets load quickly.
+
+    # Import the pandas library
+    import pandas as pd
 
     # Read in the data
     Data = pd.read_csv(CSV_Name)
 
+    # Map the preferred shifts to their ID numbers in one pass (-1 for blank cells and misspelled shift names)
+    ShiftNames = ListShiftNames(Shifts)
+    PreferredShifts = Data[PreferenceColumns].to_numpy(dtype=object)
+    ShiftIDs = pd.Index(ShiftNames).get_indexer(PreferredShifts.ravel()).reshape(PreferredShifts.shape)
+
+    # Read in the preferred volunteer flags
+    IsPreferredVolunteer = (Data['Preferred Applicants'] == True).to_numpy()
+
+    # Read in the number of shifts each volunteer can take, from the optional "Max Shifts" column (1 if blank)
+    if 'Max Shifts' in Data:
+        MaxShifts = pd.to_numeric(Data['Max Shifts'], errors='coerce').fillna(1).clip(lower=1).astype(int).tolist()
+    else:
+        MaxShifts = [1] * len(Data)
+
+    # Calculate the shift preference points of every volunteer
+    (RowStarts, ShiftIndices, Points) = CalculatePreferencePointsMatrix(ShiftIDs, IsPreferredVolunteer)
+
+    # Convert the columns to plain lists, which are much faster to loop over than arrays
+    FirstNames = Data['First Name'].tolist()
+    LastNames = Data['Last Name'].tolist()
+    IsPreferredVolunteer = IsPreferredVolunteer.tolist()
+    PreferredShifts = [tuple(Row) for Row in PreferredShifts.tolist()]
+    RowStarts = RowStarts.tolist()
+    ShiftIndices = ShiftIndices.tolist()
+    Points = Points.tolist()
+
     # Instantiate the list of volunteers
     Volunteers = []
 
-    # Loop over the rows of data
-    for (_, Row) in Data.iterrows():
+    # Create the volunteer objects
+    for ID_Number in range(len(Data)):
 
         # Instantiate a new volunteer
         v = Volunteer()
-    
-        # Assign an ID Number to the volunteer
-        v.ID_Number = len(Volunteers)
-        
-        # Read in most of the volunteer's properties
-        v.FirstName = Row['First Name']
-        v.LastName = Row['Last Name']
-        v.IsPreferredVolunteer = Row['Preferred Applicants']
-        v.PreferredShifts = [
-            Row['1st Preference'],
-            Row['2nd Preference'],
-            Row['3rd Preference'],
-            Row['4th Preference'],
-            Row['5th Preference'],
-            Row['6th Preference']
-        ]
+
+        # Populate the volunteer's properties
+        v.ID_Number = ID_Number
+        v.FirstName = FirstNames[ID_Number]
+        v.LastName = LastNames[ID_Number]
+        v.IsPreferredVolunteer = IsPreferredVolunteer[ID_Number]
+        v.MaxShifts = MaxShifts[ID_Number]
+        v.PreferredShifts = PreferredShifts[ID_Number]
+
+        # Look up the volunteer's row of the preference points matrix
+        Start = RowStarts[ID_Number]
+        End = RowStarts[ID_Number + 1]
+        v.ShiftIDs = tuple(ShiftIndices[Start:End])
+        v.Points = tuple(Points[Start:End])
 
         # Add this volunteer to the growing list
         Volunteers.append(v)
@@ -113,11 +571,13 @@ def ReadInIndividualVolunteerData():
     # Return the list of volunteers
     return Volunteers
 
-def ReadInGroupVolunteerData():
-    # This function reads the preferences into a data frame
+def ReadInGroupVolunteerData(CSV_Name='Group Volunteers.csv'):
+    # This function reads the volunteer groups into a data frame and converts them into volunteer group objects
+    # Inputs:
+    #   CSV_Name = the name of the csv file
 
-    # Specify the name of the csv file
-    CSV_Name = 'Group Volunteers.csv'
+    # Import the pandas library
+    import pandas as pd
 
     # Read in the data
     Data = pd.read_csv(CSV_Name)
@@ -125,17 +585,18 @@ def ReadInGroupVolunteerData():
     # Instantiate the list of volunteer groups
     VolunteerGroups = []
 
-    # Loop over the rows of data
-    for (_, Row) in Data.iterrows():
-    
+    # Loop over the columns of data together
+    for (GroupName, AssignedShift, Size) in zip(Data['Group'].tolist(), Data['Shift'].tolist(), Data['Volunteers'].tolist()):
+
         # Instantiate a new volunteer group
         v = VolunteerGroup()
 
         # Populate the volunteer's properties
         v.ID_Number = len(VolunteerGroups) + 1
-        v.GroupName = Row['Group']
-        v.AssignedShift = Row['Shift']
-        v.Volunteers = Row['Volunteers']
+        v.GroupName = GroupName
+        v.AssignedShift = AssignedShift
+        v.Volunteers = Size
+        v.PreferredShifts = [ v.AssignedShift ]
 
         # Add this volunteer group to the growing list
         VolunteerGroups.append(v)
@@ -143,184 +604,913 @@ def ReadInGroupVolunteerData():
     # Return the list of volunteer groups
     return VolunteerGroups
 
-def DisaggregateVolunteerGroups(GroupVolunteers, IndividualVolunteers):
+def CapVolunteerGroups(GroupVolunteers, Shifts):
     # Inputs:
     #   GroupVolunteers = a list of VolunteerGroup objects
-    #   IndividualVolunteers = a list of individual volunteer objects
+    #   Shifts = a dictionary of shift objects, indexed by shift names
     # Outputs:
-    #   Creates a number of individual volunteers for each VolunteerGroup and adds these individuals to the list of individual volunteers
+    #   Caps the number of volunteers in each group at the number required by their preferred shift
 
     # Loop over the volunteer groups
     for g in GroupVolunteers:
 
-        # Cap the number of volunteers in this group at the number required by their preferred shift
-        g.Volunteers = min(g.Volunteers, Shifts[g.AssignedShift].RequiredVolunteers)
+        # Check that the group's shift exists
+        if g.AssignedShift in Shifts:
 
-        # Create an individual volunteer object for each volunteer in this group
-        for VolunteerIndex in range(g.Volunteers):
+            # Cap the number of volunteers in this group at the number required by their preferred shift
+            g.Volunteers = min(g.Volunteers, Shifts[g.AssignedShift].RequiredVolunteers)
 
-            # Instantiate a new individual volunteer
-            v = Volunteer()
+def ReadInPreviousSchedule(CSV_Name='Volunteer-Focused Schedule.csv'):
+    # This function reads a previously published volunteer-focused schedule (see ExportVolunteerFocusedSchedule)
+    # Inputs:
+    #   CSV_Name = the name of the csv file
+    # Outputs:
+    #   PreviousSchedule = a dictionary mapping each volunteer's full name to the list of shifts held by volunteers of
+    #                      that name, in the order of the file, with None for unassigned volunteers
 
-            # Assign an ID Number to the volunteer
-            v.ID_Number = len(IndividualVolunteers)
+    # Import the pandas library
+    import pandas as pd
 
-            # Create a placeholder for the name of the volunteer
-            v.FirstName = g.GroupName
-            v.LastName = 'Volunteer %d' % (VolunteerIndex + 1)
+    # Read in the data
+    Data = pd.read_csv(CSV_Name, keep_default_na=False)
 
-            # Specify them as a preferred volunteer
-            v.IsPreferredVolunteer = True
+    # Instantiate the previous schedule
+    PreviousSchedule = {}
 
-            # Specify their first preference for a shift as the group's preference
-            v.PreferredShifts = [ g.AssignedShift ]
+    # Loop over the columns of data together
+    for (Name, AssignedShift) in zip(Data['Volunteer'].tolist(), Data['Assignment'].tolist()):
 
-            # Specify their other preferences as empty
-            for _ in range(4):
-                v.PreferredShifts.append('')
+        # Record the volunteer's shift
+        if AssignedShift == 'Unassigned':
+            AssignedShift = None
+        PreviousSchedule.setdefault(Name, []).append(AssignedShift)
+
+    # Return the previous schedule
+    return PreviousSchedule
+
+def ApplyPreviousSchedule(IndividualVolunteers, VolunteerGroups, PreviousSchedule, Shifts):
+    # This function records the shifts held in the previous schedule on the current volunteers and groups, whose
+    # shift preference points must already have been calculated. The volunteers are matched by their full names.
+    # Inputs:
+    #   IndividualVolunteers = a list of volunteer objects
+    #   VolunteerGroups = a list of VolunteerGroup objects
+    #   PreviousSchedule = a dictionary of previous shifts, indexed by volunteer names (see ReadInPreviousSchedule)
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    # Outputs:
+    #   Delta = a dictionary counting the volunteers who are unchanged, who were added, who were removed,
+    #           and whose preferences no longer include the shift they held
+    #
+    # The groups which kept only some of their members on a shift are split, in place, into the members who held it and
+    # the others (see SplitVolunteerGroups).
 
-            # Add this individual to the list of volunteers
-            IndividualVolunteers.append(v)
+    # Copy the previous schedule, so that each previous shift is matched at most once
+    Remaining = {Name: list(PreviousSchedule[Name]) for Name in PreviousSchedule}
 
-def BuildShiftDictionary():
+    # Initialize the delta
+    Delta = {'Unchanged': 0, 'Added': 0, 'Removed': 0, 'Changed': 0}
+
+    # Loop over the volunteers and groups
+    for u in list(IndividualVolunteers) + list(VolunteerGroups):
+
+        # Get the unit's members
+        if isinstance(u, VolunteerGroup):
+            Members = u.ExpandVolunteers(u.Volunteers)
+        else:
+            Members = [u]
+
+        # Count the members who held each of the unit's shifts
+        Counts = [0] * len(u.ShiftIDs)
+        for v in Members:
+
+            # Look up the member's previous shift
+            Name = '%s %s' % (v.FirstName, v.LastName)
+            if len(Remaining.get(Name, [])) == 0:  # they are new
+                Delta['Added'] += 1
+                continue
+            PreviousShifts = [Remaining[Name].pop(0)]
+
+            # A volunteer who can take several shifts is listed once per shift
+            while len(PreviousShifts) < v.MaxShifts and len(Remaining[Name]) > 0 and PreviousShifts[0] != None and Remaining[Name][0] != None:
+                PreviousShifts.append(Remaining[Name].pop(0))
+
+            # Check if they can keep their shifts
+            Kept = True
+            for PreviousShift in PreviousShifts:
+                if PreviousShift == None:  # they were unassigned
+                    continue
+                elif PreviousShift in Shifts and Shifts[PreviousShift].ID_Number in u.ShiftIDs:
+                    Counts[u.ShiftIDs.index(Shifts[PreviousShift].ID_Number)] += 1
+                else:
+                    Kept = False
+            if Kept == True:
+                Delta['Unchanged'] += 1
+            else:
+                Delta['Changed'] += 1
+
+        # Store the counts
+        if sum(Counts) > 0:
+            u.PreviousCounts = tuple(Counts)
+        else:
+            u.PreviousCounts = ()
+
+    # Count the volunteers of the previous schedule who are gone
+    Delta['Removed'] = sum(len(Remaining[Name]) for Name in Remaining)
+
+    # Split the groups, so that only the members who held a shift earn the bonus for keeping it
+    VolunteerGroups[:] = SplitVolunteerGroups(VolunteerGroups)
+
+    # Return the delta
+    return Delta
+
+def SplitVolunteerGroups(VolunteerGroups):
+    # This function splits each group whose members held different shifts in the previous schedule, or only some of
+    # them held one, into one part per previous shift and a part for the other members.
+    # The objective rewards each assigned member of a unit for keeping the unit's previous shift (see
+    # CalcAssignmentValues), which is only right if every member of the unit held it; after the split, every member of
+    # each part did. The members of a group are interchangeable, so the parts can take the same shifts as the group.
+    # Inputs:
+    #   VolunteerGroups = a list of VolunteerGroup objects
+    # Outputs:
+    #   Parts = a list of VolunteerGroup objects, in which each split group is replaced by its parts
+
+    # Import the copy library
+    import copy
+
+    # Initialize the list of parts
+    Parts = []
+
+    # Loop over the volunteer groups
+    for g in VolunteerGroups:
+
+        # Keep the groups whose members all held the same shift, or none
+        Counts = [Count for Count in g.PreviousCounts if Count > 0]
+        if len(Counts) == 0 or (len(Counts) == 1 and Counts[0] == g.Volunteers):
+            Parts.append(g)
+            continue
+
+        # Split off the members who held each shift, numbering the members of each part after those of the previous parts
+        FirstMember = g.FirstMember
+        for (j, Count) in enumerate(g.PreviousCounts):
+            if Count > 0:
+                Part = copy.copy(g)
+                (Part.Volunteers, Part.FirstMember) = (Count, FirstMember)
+                Part.PreviousCounts = tuple(Count if i == j else 0 for i in range(len(g.PreviousCounts)))
+                Parts.append(Part)
+                FirstMember += Count
+
+        # Keep the other members together
+        if FirstMember < g.FirstMember + g.Volunteers:
+            Part = copy.copy(g)
+            (Part.Volunteers, Part.FirstMember, Part.PreviousCounts) = (g.FirstMember + g.Volunteers - FirstMember, FirstMember, ())
+            Parts.append(Part)
+
+    # Return the parts
+    return Parts
+
+def BuildShiftDictionary(Config=None):
     # This function builds a dictionary of shift objects, where the dictionary keys are the shift names
+    # Inputs:
+    #   Config = a dictionary describing the shift table (see DefaultShiftConfig); by default, the standard week is built
     
-    # Specify the days of the week
-    Weekdays = [
-        'Sunday',
-        'Monday',
-        'Tuesday',
-        'Wednesday',
-        'Thursday', 
-        'Friday',
-        'Saturday'
-    ]
-
-    # Create the list of periods
-    Periods = [
-        Period(Name='Breakfast', RequiredVolunteers=8),
-        Period(Name='Dinner', RequiredVolunteers=6),
-        Period(Name='Evening', RequiredVolunteers=5),
-        Period(Name='Overnight', RequiredVolunteers=4),
-    ]
+    # Use the standard week by default
+    if Config == None:
+        Config = DefaultShiftConfig
 
     # Initialize the dictionary of shifts
     Shifts = {}
-    for w in Weekdays:
-        for p in Periods:
 
-            # Construct the shift name corresponding to this weekday and period
-            ShiftName = '%s %s' % (w, p.Name)
+    # Loop over the sites, each of which has its own weekly template (a single, unnamed site by default)
+    for Site in Config.get('Sites', [{'Name': ''}]):
+
+        # Get the days of the week and the periods of the site, falling back on those of the whole table
+        Weekdays = Site.get('Weekdays', Config.get('Weekdays', DefaultShiftConfig['Weekdays']))
+        Periods = [
+            Period(Name=p['Name'], RequiredVolunteers=p['RequiredVolunteers'])
+            for p in Site.get('Periods', Config.get('Periods', []))
+        ]
+
+        for w in Weekdays:
+            for p in Periods:
+
+                # Construct the shift name corresponding to this site, weekday and period
+                ShiftName = '%s %s' % (w, p.Name)
+                if Site['Name'] != '':
+                    ShiftName = '%s %s' % (Site['Name'], ShiftName)
+
+                # Add the shift to the growing dictionary of shifts
+                AddShift(Shifts, ShiftName, p.RequiredVolunteers)
+
+                # Record where and when the shift takes place
+                (Shifts[ShiftName].Site, Shifts[ShiftName].Weekday, Shifts[ShiftName].Period) = (Site['Name'], w, p.Name)
 
-            # Instantiate a new shift object
-            s = Shift()
+    # Add the one-off shifts, such as holiday shifts, which may also change the requirements of weekly shifts
+    for s in Config.get('Shifts', []):
+        AddShift(Shifts, s['Name'], s['RequiredVolunteers'])
+        if 'Weekday' in s and 'Period' in s:
+            (Shifts[s['Name']].Site, Shifts[s['Name']].Weekday, Shifts[s['Name']].Period) = (s.get('Site', ''), s['Weekday'], s['Period'])
 
-            # Add the shift's properties
-            s.ShiftName = ShiftName
-            s.RequiredVolunteers = p.RequiredVolunteers
+    # Check that there is something to schedule
+    if len(Shifts) == 0:
+        raise ValueError('The shift table does not define any shifts.')
 
-            # Add the shift to the growing dictionary of shifts
-            Shifts[ShiftName] = s
+    # Number the shifts
+    InternShifts(Shifts)
+
+    # Find the shifts which cannot be held by the same volunteer
+    AddConflicts(Shifts, Config.get('Conflicts', DefaultShiftConfig['Conflicts']))
 
     # Return the list of shifts
     return Shifts
 
-def BuildModel(IndividualVolunteers, Shifts):
+def AddShift(Shifts, ShiftName, RequiredVolunteers):
+    # This function adds a shift to a dictionary of shifts, or changes the requirement of a shift that is already there
+    # Inputs:
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   ShiftName = the name of the shift
+    #   RequiredVolunteers = the number of volunteers required by the shift
+
+    # Check the requirement
+    if isinstance(RequiredVolunteers, bool) or not isinstance(RequiredVolunteers, int) or RequiredVolunteers < 1:
+        raise ValueError('Shift "%s" must require a positive whole number of volunteers, not %r.' % (ShiftName, RequiredVolunteers))
+
+    # Check if the shift already exists
+    if not ShiftName in Shifts:  # it's not there
+
+        # Instantiate a new shift object
+        s = Shift()
+        s.ShiftName = ShiftName
+
+        # Add the shift to the growing dictionary of shifts
+        Shifts[ShiftName] = s
+
+    # Set the shift's requirement
+    Shifts[ShiftName].RequiredVolunteers = RequiredVolunteers
+
+def AddConflicts(Shifts, Rules):
+    # This function records which shifts cannot be held by the same volunteer, as sets of shifts (cliques) of which a
+    # volunteer can hold at most one
+    # Inputs:
+    #   Shifts = a dictionary of shift objects, indexed by shift names, whose weekdays and periods have been recorded
+    #   Rules = a list of {"First": period, "Second": period, "Days later": n} pairs of periods which conflict; the second
+    #           period is on the same day by default, and "Days later" counts in the order of the standard week
+    #
+    # Every shift of the first period of a day conflicts with every shift of the second period, at every site, and with
+    # the other shifts of its own period (nobody can be at two sites at once). All of them form a single clique, so a rule
+    # adds one clique per day instead of a constraint per pair of shifts. Cliques contained in a larger one are dropped.
+
+    # Index the shifts by weekday and period
+    Slots = {}
+    for s in Shifts:
+        if Shifts[s].Period != '':
+            Slots.setdefault((Shifts[s].Weekday, Shifts[s].Period), []).append(s)
+
+    # The shifts of the same period of the same day overlap
+    Cliques = {}
+    for ((w, p), Names) in Slots.items():
+        Cliques['%s %s' % (w, p)] = frozenset(Names)
+
+    # Add the cliques of each rule, on each day
+    Weekdays = DefaultShiftConfig['Weekdays']
+    for Rule in Rules:
+        Later = Rule.get('Days later', 0)
+        for w in GetUniqueListElements([Shifts[s].Weekday for s in Shifts if Shifts[s].Period != '']):
+
+            # Find the day of the second period, unless it falls outside of the week
+            if Later == 0:
+                LaterDay = w
+            elif w in Weekdays and Weekdays.index(w) + Later < len(Weekdays):
+                LaterDay = Weekdays[Weekdays.index(w) + Later]
+            else:
+                continue
+
+            # Add the clique, if both periods take place
+            (First, Second) = (Slots.get((w, Rule['First']), []), Slots.get((LaterDay, Rule['Second']), []))
+            if len(First) > 0 and len(Second) > 0:
+                Cliques['%s %s / %s %s' % (w, Rule['First'], LaterDay, Rule['Second'])] = frozenset(First + Second)
+
+    # Record the cliques with more than one shift on their shifts, unless they are contained in a larger clique
+    for s in Shifts:
+        Shifts[s].Conflicts = []
+    for (Name, Clique) in Cliques.items():
+        if len(Clique) > 1 and not any(Clique < Other for Other in Cliques.values()):
+            for s in sorted(Clique, key=lambda s: Shifts[s].ID_Number):
+                Shifts[s].Conflicts.append(Name)
+
+def ListShiftConflicts(Shifts):
+    # This function lists the sets of shifts of which a volunteer can hold at most one (see AddConflicts)
+    # Inputs:
+    #   Shifts = a dictionary of shift objects, indexed by shift names, which may be a subset of the interned shifts
+    # Outputs:
+    #   Cliques = a list of lists of shift ID numbers, with at least two shifts each
+
+    # Gather the shifts of each clique
+    Cliques = {}
+    for s in Shifts:
+        for Name in Shifts[s].Conflicts:
+            Cliques.setdefault(Name, []).append(Shifts[s].ID_Number)
+
+    # Return the cliques with at least two shifts
+    return [c for c in Cliques.values() if len(c) > 1]
+
+def ListConflictingEntries(Store, Shifts):
+    # This function lists the entries of an assignment store which cannot all be assigned, because they belong to the
+    # same volunteer and their shifts conflict
+    # Inputs:
+    #   Store = an AssignmentStore object
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    # Outputs:
+    #   Conflicts = a list of tuples of entry positions, of which at most one can be assigned. Only the volunteers who can
+    #               take several shifts have any, since the others can only take one shift anyway.
+
+    # Find the volunteers who can take several shifts
+    MultiShiftUnits = np.flatnonzero(Store.MaxShifts > 1).tolist()
+    if len(MultiShiftUnits) == 0:
+        return []
+
+    # Look up the cliques of each shift
+    CliquesOfShift = {}
+    for (c, Clique) in enumerate(ListShiftConflicts(Shifts)):
+        for ShiftID in Clique:
+            CliquesOfShift.setdefault(ShiftID, []).append(c)
+
+    # Collect the entries of each volunteer in each clique
+    Conflicts = []
+    Offsets = Store.Offsets.tolist()
+    ShiftIDs = Store.ShiftIDs.tolist()
+    for k in MultiShiftUnits:
+        EntriesByClique = {}
+        for e in range(Offsets[k], Offsets[k + 1]):
+            for c in CliquesOfShift.get(ShiftIDs[e], []):
+                EntriesByClique.setdefault(c, []).append(e)
+        Conflicts += [tuple(Entries) for Entries in EntriesByClique.values() if len(Entries) > 1]
+
+    # Return the conflicts
+    return Conflicts
+
+def ReadInShiftConfig(FileName):
+    # This function reads a shift table from a JSON file and builds the dictionary of shifts
+    # Inputs:
+    #   FileName = the name of the JSON file, which follows the layout of DefaultShiftConfig
+    # Outputs:
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+
+    # Import the json library
+    import json
+
+    # Read in the shift table
+    with open(FileName) as f:
+        Config = json.load(f)
+
+    # Build the dictionary of shifts
+    return BuildShiftDictionary(Config)
+
+def InternShifts(Shifts):
+    # This function numbers the shifts by their position in the shift dictionary.
+    # The rest of the pipeline refers to shifts by these ID numbers, and only turns them back into names for reporting.
+    # Inputs:
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+
+    # Loop over the shifts in order
+    for (ID_Number, s) in enumerate(Shifts):
+        Shifts[s].ID_Number = ID_Number
+
+def ListShiftNames(Shifts):
+    # This function lists the shift names by ID number
+    # Inputs:
+    #   Shifts = a dictionary of shift objects, indexed by shift names, which may be a subset of the interned shifts
+    # Outputs:
+    #   ShiftNames = a list whose entry i is the name of shift i, or None for ID numbers missing from Shifts
+
+    # Initialize the list
+    ShiftNames = [None] * (max([Shifts[s].ID_Number for s in Shifts], default=-1) + 1)
+
+    # Fill in the names
+    for s in Shifts:
+        ShiftNames[Shifts[s].ID_Number] = s
+
+    # Return the list
+    return ShiftNames
+
+def ListRequiredVolunteers(Shifts):
+    # This function lists the number of volunteers required by each shift, by ID number
+    # Outputs:
+    #   Required = an integer array whose entry i is the number of volunteers required by shift i (0 if it is missing from Shifts)
+
+    # Initialize the array
+    Required = np.zeros(len(ListShiftNames(Shifts)), dtype=np.int64)
+
+    # Fill in the requirements
+    for s in Shifts:
+        Required[Shifts[s].ID_Number] = Shifts[s].RequiredVolunteers
+
+    # Return the array
+    return Required
+
+def CalcAssignmentValues(Store, Shifts, Scalar, Weights=None, Required=None):
+    # This function calculates the contribution of each entry of an assignment store to the objective
+    # Inputs:
+    #   Store = an AssignmentStore object
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   Scalar = the scalar which makes the objective integer (see CalcObjectiveScalar)
+    #   Weights = a dictionary of objective weights like ObjectiveWeights, which is used by default
+    #   Required = the array of ListRequiredVolunteers(Shifts), if it has been calculated already
+    # Outputs:
+    #   Values = an integer array with the objective value of assigning a single volunteer of each entry's unit to its shift
+
+    # Use the default weights
+    if Weights == None:
+        Weights = ObjectiveWeights
+
+    # Look up the number of volunteers required by the shift of each entry
+    if Required is None:
+        Required = ListRequiredVolunteers(Shifts)
+    Required = Required[Store.ShiftIDs]
+
+    # Rescale the preference points of the preferred volunteers, which were doubled when they were calculated
+    Points = Store.Points
+    Multiplier = Weights.get('Preferred volunteer multiplier', 2)
+    if Multiplier != 2:
+        IsPreferred = np.repeat(Store.IsPreferred, np.diff(Store.Offsets))
+        Points = np.where(IsPreferred, Points // 2 * Multiplier, Points)
+
+    # Calculate the values
+    Values = (
+
+        # Maximize the number of covered shifts (Scalar / Required, rounded in case the scalar was capped)
+        Weights['Maximize the shift coverage'] *
+        ((2 * Scalar + Required) // (2 * Required))
+
+        +
+
+        # Maximize the number of realized shift preference points
+        Weights['Respect the volunteer preferences'] *
+        Scalar *
+        Points
+
+        +
+
+        # Minimize the churn against the previous schedule (every member of a unit which held a shift held it, since
+        # volunteer classes are formed by previous shift and groups are split by it, see SplitVolunteerGroups)
+        Weights.get('Keep the published assignments', 0) *
+        Scalar *
+        (Store.Previous > 0)
+    )
+
+    # Return the values
+    return Values
+
+def BuildModel(IndividualVolunteers, Shifts, VolunteerGroups=(), Scalar=None, Weights=None, Capacities=None, Hint=None):
     # This function builds the constraint programming model for the problem
     # Inputs:
     #   IndividualVolunteers = a list of volunteer objects.
     #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   VolunteerGroups = a list of VolunteerGroup (or VolunteerClass) objects
+    #   Scalar = the objective scalar (see CalcObjectiveScalar); by default, it is calculated from Shifts
+    #   Weights = a dictionary of objective weights like ObjectiveWeights, which is used by default
+    #   Capacities = an array with the number of volunteers each shift (by ID number) can still take; by default, its requirement
+    #   Hint = an array with a starting solution for each entry of the store, used unless there is a previous schedule
     # Outputs:
     #   model = a CP model object populated with decision variables, constraints, and an objective.
+    #   Store = an AssignmentStore over the volunteers followed by the groups, whose Variables are the decision variables:
+    #           binary for the individual volunteers, and integer counts of the members assigned for the groups
+
+    # Import the OR-Tools library
+    from ortools.sat.python import cp_model
 
     # Instantiate the CP model
     model = cp_model.CpModel()
 
+    # Number the volunteers and groups, and their preferred shifts
+    Store = AssignmentStore(list(IndividualVolunteers) + list(VolunteerGroups))
+
+    # Look up the number of volunteers each shift can take
+    if Capacities is None:
+        Required = ListRequiredVolunteers(Shifts)
+    else:
+        Required = Capacities
+
     # Create the model variables
-    ## Primary decision variables
-    Assignment = {}
-    for v in IndividualVolunteers:
-        for s in Shifts:
-            Assignment[(v,s)] = model.NewBoolVar('Volunteer %s assigned to %s shift' % (v.ID_Number,s))
+    ## Primary decision variables, created only for the shifts each volunteer actually ranked,
+    ## and bounded by the size of the volunteer's unit and by the shift's requirement
+    UpperBounds = np.minimum(np.repeat(Store.Headcounts, np.diff(Store.Offsets)), Required[Store.ShiftIDs])
+    Store.Variables = [
+        model.NewBoolVar('Assignment %d' % Entry) if UpperBound == 1 else model.NewIntVar(0, UpperBound, 'Assignment %d' % Entry)
+        for (Entry, UpperBound) in enumerate(UpperBounds.tolist())
+    ]
+    Store.VariableIndices = np.arange(len(Store.Variables)) + (Store.Variables[0].Index() if len(Store.Variables) > 0 else 0)  # They were created consecutively
 
     # Create the constraints
-    ## Each shift has a maximum number of volunteers assigned to it
-    for s in Shifts:
+    ## Each shift has a maximum number of volunteers assigned to it (shifts that nobody ranked are trivially within capacity)
+    Order = np.argsort(Store.ShiftIDs, kind='stable')
+    (ShiftIDs, Starts) = np.unique(Store.ShiftIDs[Order], return_index=True)
+    for (ShiftID, Entries) in zip(ShiftIDs.tolist(), np.split(Order, Starts[1:])):
         model.Add(
-            sum(Assignment[(v,s)] for v in IndividualVolunteers) <= Shifts[s].RequiredVolunteers
+            cp_model.LinearExpr.Sum([Store.Variables[e] for e in Entries.tolist()]) <= int(Required[ShiftID])
         )
 
-    ## Each volunteer is assigned to at most one shift
-    for v in IndividualVolunteers:
-        model.Add(
-            sum(Assignment[(v,s)] for s in Shifts) <= 1
-        )
+    ## Each volunteer, and each group member, is assigned to at most as many shifts as they can take (one by default).
+    ## A single volunteer taking one shift is a native at-most-one constraint; units with no more shifts than they can
+    ## take are already bounded by the variables' domains.
+    Offsets = Store.Offsets.tolist()
+    Headcounts = Store.Headcounts.tolist()
+    MaxShifts = Store.MaxShifts.tolist()
+    for k in range(len(Store.Units)):
+        if Offsets[k + 1] - Offsets[k] <= MaxShifts[k]:
+            continue
+        if Headcounts[k] == 1 and MaxShifts[k] == 1:
+            model.AddAtMostOne(Store.Variables[Offsets[k]:Offsets[k + 1]])
+        else:
+            model.Add(
+                cp_model.LinearExpr.Sum(Store.Variables[Offsets[k]:Offsets[k + 1]]) <= Headcounts[k] * MaxShifts[k]
+            )
 
-    ## Each volunteer can only be assigned to the one of the shifts they indicated in their preference list
-    for v in IndividualVolunteers:
-        for s in Shifts:
-            if not s in v.PreferredShifts:
-                model.Add(
-                    Assignment[(v,s)] == 0
-                )
+    ## A volunteer who takes several shifts holds at most one shift of each set of conflicting shifts, e.g. a dinner
+    ## shift and the evening shift right after it. Each set is a single at-most-one constraint (see AddConflicts).
+    for Entries in ListConflictingEntries(Store, Shifts):
+        model.AddAtMostOne([Store.Variables[e] for e in Entries])
 
-    # Set the objective
-    ## Define the weights of the various objectives
-    Weight = {
-        'Maximize the shift coverage' : 10,
-        'Respect the volunteer preferences' : 1,
-    }
+    ## Each volunteer can only be assigned to one of the shifts they indicated in their preference list
+    ## (this holds by construction, since no variables exist for the other shifts)
 
+    # Set the objective
     ## Calculate the scalar required to make everything integer
-    Scalar = CalcObjectiveScalar(Shifts)  # This is multiplied in because the CP solver insists on the data being integer.
+    if Scalar == None:
+        Scalar = CalcObjectiveScalar(Shifts)  # This is multiplied in because the CP solver insists on the data being integer.
 
-    ## Define the objective
+    ## Define the objective (groups count once per member)
     model.Maximize(
+        cp_model.LinearExpr.WeightedSum(Store.Variables, CalcAssignmentValues(Store, Shifts, Scalar, Weights).tolist())
+    )
 
-        # Maximize the number of covered shifts
-        Weight['Maximize the shift coverage'] *
-        sum(
-            int(Scalar / Shifts[s].RequiredVolunteers) *
-            sum(
-                Assignment[(v,s)] 
-                for v in IndividualVolunteers
-            )
-            for s in Shifts
-        )
+    # Warm start the solver from the previous schedule, if there is one, or else from the given solution
+    if Store.Previous.any():
+        Hint = np.minimum(Store.Previous, UpperBounds)
+    if Hint is not None:
+        for (x, Value) in zip(Store.Variables, Hint.tolist()):
+            model.AddHint(x, Value)
 
-        +
+    # Return the model
+    return (model, Store)
 
-        # Maximize the number of realized shift preference points
-        Weight['Respect the volunteer preferences'] *
-        Scalar *
-        sum(
-            sum(
-                Assignment[(v,s)] * v.ShiftPreferencePoints[s]
-                for v in IndividualVolunteers
-            )
-            for s in Shifts
-        )
-    )
+class PresolveResult():
+    # This class describes the reductions, greedy solution and bound found by PresolveAssignments.
+    # The arrays follow the entries of the presolved assignment store.
 
-    # Return the model
-    return (model, Assignment)
+    def __init__(self):
+        self.Values = None  # The objective value of assigning a single volunteer of each entry (see CalcAssignmentValues)
+        self.Remaining = None  # Whether each unit is left for the solver, i.e. it has options and was not fixed
+        self.Fixed = None  # The value of each entry which was fixed, and 0 for the other entries
+        self.Capacities = None  # The number of places of each shift (by ID number) that are left after the fixed entries
+        self.Conflicts = []  # The tuples of entries of which at most one can be assigned (see ListConflictingEntries)
+        self.Greedy = None  # The value of each entry in the greedy solution, which includes the fixed entries
+        self.GreedyObjective = 0
+        self.FixedObjective = 0  # The objective value of the fixed entries alone
+        self.UpperBound = 0  # An upper bound on the objective value
+        self.Statistics = {}  # How much each reduction removed, for reporting
+
+def PresolveAssignments(Store, Shifts, Scalar, Weights=None):
+    # This function simplifies the problem before it is handed to the CP solver, and finds a good solution and a bound
+    # Inputs:
+    #   Store = an AssignmentStore object
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   Scalar = the objective scalar (see CalcObjectiveScalar)
+    #   Weights = a dictionary of objective weights like ObjectiveWeights, which is used by default
+    # Outputs:
+    #   Presolved = a PresolveResult object
+    #
+    # The reductions keep every optimal objective value within reach:
+    #   - Units without a single valid option are dropped, since they cannot be assigned.
+    #   - A shift whose candidates (counting every group member) are no more than it requires can never be full. A unit
+    #     which values such a shift at least as much as all of its other options is fixed to it with all of its members:
+    #     moving a member there from any other shift, or from no shift, never lowers the objective.
+    #     Fixing the other candidates of the shift would not be safe, since they may be worth more elsewhere.
+    #     Volunteers who can take several shifts are never fixed.
+    # The greedy solution hands out the entries in decreasing order of value. The upper bound is the smaller of two
+    # relaxations: every volunteer gets their best options (ignoring the shift requirements and the conflicts), and
+    # every shift gets its best candidates (ignoring that a volunteer can only work so many shifts).
+
+    # Instantiate the result
+    Presolved = PresolveResult()
+
+    # Calculate the value of each entry, and look up its unit and the requirement of its shift
+    Values = CalcAssignmentValues(Store, Shifts, Scalar, Weights)
+    Presolved.Values = Values
+    Units = Store.UnitOfEachEntry()
+    Lengths = np.diff(Store.Offsets)
+    Required = ListRequiredVolunteers(Shifts)
+    EntryHeadcounts = Store.Headcounts[Units]
+
+    # Find the shifts which can never be full
+    Candidates = np.bincount(Store.ShiftIDs, weights=EntryHeadcounts, minlength=len(Required))
+    NeverFull = Candidates <= Required
+
+    # Find each unit's best value, and fix the units whose best option is a shift which can never be full (their first
+    # such option, in order of preference, if there are ties)
+    BestValue = np.full(len(Store.Units), -1, dtype=np.int64)
+    np.maximum.at(BestValue, Units, Values)
+    IsFixable = NeverFull[Store.ShiftIDs] & (Values >= BestValue[Units]) & (Values >= 0) & (Store.MaxShifts[Units] == 1)
+    FirstFixable = np.full(len(Store.Units), len(Values), dtype=np.int64)
+    np.minimum.at(FirstFixable, Units[IsFixable], np.flatnonzero(IsFixable))
+    IsFixedUnit = FirstFixable < len(Values)
+    Presolved.Fixed = np.zeros(len(Values), dtype=np.int64)
+    Presolved.Fixed[FirstFixable[IsFixedUnit]] = Store.Headcounts[IsFixedUnit]
+    Presolved.FixedObjective = int((Presolved.Fixed * Values).sum())
+
+    # Leave the other units with options to the solver, with what is left of the shifts
+    Presolved.Remaining = (Lengths > 0) & ~IsFixedUnit
+    Presolved.Capacities = Required - np.bincount(Store.ShiftIDs, weights=Presolved.Fixed, minlength=len(Required)).astype(np.int64)
+
+    # Hand out the remaining entries greedily, most valuable first
+    Presolved.Conflicts = ListConflictingEntries(Store, Shifts)
+    Presolved.Greedy = AssignGreedily(Store, Values, np.argsort(-Values, kind='stable'), Presolved.Remaining, Presolved.Capacities, Presolved.Fixed, Presolved.Conflicts)
+    Presolved.GreedyObjective = int((Presolved.Greedy * Values).sum())
+
+    # Bound the objective by giving every volunteer their best options, as many as they can take
+    if (Store.MaxShifts == 1).all():
+        UnitBound = int((Store.Headcounts * np.maximum(BestValue, 0)).sum())
+    else:
+        Order = np.lexsort((-Values, Units))
+        Rank = np.arange(len(Order)) - Store.Offsets[Units[Order]]  # The entries stay in their units' ranges
+        Best = Order[Rank < Store.MaxShifts[Units[Order]]]
+        UnitBound = int((EntryHeadcounts[Best] * np.maximum(Values[Best], 0)).sum())
+
+    # Bound the objective by giving every shift its best candidates: sort the entries of each shift by decreasing value,
+    # and take the members of each entry until the shift is full
+    Order = np.lexsort((-Values, Store.ShiftIDs))
+    SortedShifts = Store.ShiftIDs[Order]
+    SortedHeadcounts = EntryHeadcounts[Order]
+    Cumulative = np.cumsum(SortedHeadcounts)
+    ShiftStarts = np.searchsorted(SortedShifts, SortedShifts)  # The position of the first entry of each entry's shift
+    Before = Cumulative - SortedHeadcounts - np.concatenate(([0], Cumulative))[ShiftStarts]  # Members of the shift's better entries
+    Taken = np.clip(Required[SortedShifts] - Before, 0, SortedHeadcounts)
+    ShiftBound = int((Taken * np.maximum(Values[Order], 0)).sum())
+
+    # Take the better of the two bounds
+    Presolved.UpperBound = min(UnitBound, ShiftBound)
+
+    # Record how much each reduction removed
+    Presolved.Statistics = {
+        'Units without options' : int((Lengths == 0).sum()),
+        'Volunteers without options' : int(Store.Headcounts[Lengths == 0].sum()),
+        'Fixed units' : int(IsFixedUnit.sum()),
+        'Fixed volunteers' : int(Store.Headcounts[IsFixedUnit].sum()),
+        'Entries removed' : int(Lengths[~Presolved.Remaining].sum()),
+        'Greedy objective' : Presolved.GreedyObjective,
+        'Upper bound' : Presolved.UpperBound,
+    }
 
-def CalcObjectiveScalar(Shifts):
+    # Return the result
+    return Presolved
+
+def AssignGreedily(Store, Values, Order, Remaining, Capacities, Start=None, Conflicts=()):
+    # This function hands out the entries of an assignment store one by one, giving each entry as many of its unit's
+    # members as its shift still has places for, and each member as many shifts as they can take
+    # Inputs:
+    #   Store = an AssignmentStore object
+    #   Values = the objective value of each entry (see CalcAssignmentValues); entries worth nothing are skipped
+    #   Order = the positions of the entries, in the order in which they are handed out
+    #   Remaining = whether each unit can still be assigned
+    #   Capacities = the number of places of each shift (by ID number) that are still open
+    #   Start = the values of the entries which are already assigned (counted neither in Remaining nor in Capacities)
+    #   Conflicts = the tuples of entries of which at most one can be assigned (see ListConflictingEntries)
+    # Outputs:
+    #   Assigned = the value of each entry in the greedy solution, including the starting ones
+
+    # Start from the given solution, or from nothing
+    if Start is None:
+        Assigned = np.zeros(len(Values), dtype=np.int64)
+    else:
+        Assigned = Start.copy()
+
+    # Skip the entries which are worth nothing or whose unit cannot be assigned
+    Units = Store.UnitOfEachEntry()
+    Order = Order[(Values[Order] > 0) & Remaining[Units[Order]]]
+
+    # Convert the arrays to lists, which are much faster to update one element at a time
+    UnitsLeft = np.where(Remaining, Store.Headcounts * Store.MaxShifts, 0).tolist()
+    Headcounts = Store.Headcounts.tolist()
+    PlacesLeft = Capacities.tolist()
+    (Handed, Counts) = ([], [])
+
+    # Look up the conflicts of each entry, and whether each conflict has been used up
+    ConflictsOfEntry = {}
+    for (c, Entries) in enumerate(Conflicts):
+        for e in Entries:
+            ConflictsOfEntry.setdefault(e, []).append(c)
+    Used = [False] * len(Conflicts)
+
+    # Hand out the entries
+    for (e, u, s) in zip(Order.tolist(), Units[Order].tolist(), Store.ShiftIDs[Order].tolist()):
+        Count = UnitsLeft[u]
+        if Count > 0 and PlacesLeft[s] > 0:
+            if PlacesLeft[s] < Count:
+                Count = PlacesLeft[s]
+            if Headcounts[u] < Count:
+                Count = Headcounts[u]
+            if e in ConflictsOfEntry:
+                if any(Used[c] for c in ConflictsOfEntry[e]):
+                    continue
+                for c in ConflictsOfEntry[e]:
+                    Used[c] = True
+            Handed.append(e)
+            Counts.append(Count)
+            UnitsLeft[u] -= Count
+            PlacesLeft[s] -= Count
+    Assigned[Handed] = Counts
+
+    # Return the solution
+    return Assigned
+
+def CalcLagrangianBound(Store, Values, Remaining, Capacities, LowerBound, Deadline, Prices=None):
+    # This function bounds the objective by relaxing the shift requirements into prices (Lagrangian relaxation)
+    # Inputs:
+    #   Store = an AssignmentStore object
+    #   Values = the objective value of each entry (see CalcAssignmentValues)
+    #   Remaining = whether each unit can still be assigned
+    #   Capacities = the number of places of each shift (by ID number) that are still open
+    #   LowerBound = the objective value of a known solution over the remaining units, which steers the step size
+    #   Deadline = the time.perf_counter() value at which to stop improving the bound
+    #   Prices = the starting price of each shift (by ID number), e.g. from an earlier bound of a similar problem; zero by default
+    # Outputs:
+    #   (UpperBound, Prices, Iterations) = the best bound, the shift prices which prove it, and the number of price updates
+    #
+    # For any non-negative price of each shift, charging every volunteer the price of their shift and paying the price of
+    # each place of each shift leaves the objective of every feasible schedule unchanged or higher, and without the
+    # requirements every volunteer simply takes their option with the best value after the price. So
+    #   sum over shifts of (price * places) + sum over volunteers of max(0, best value after the price)
+    # is an upper bound. The prices are improved by subgradient steps: a shift which more volunteers want than it has
+    # places gets more expensive, and a shift with places to spare gets cheaper. Since the assignment problem is a
+    # transportation problem, whose linear relaxation has integral optima, the best prices close the gap completely.
+    # A volunteer who can take several shifts takes that many of their best options after the price instead, ignoring
+    # their conflicts, so with conflicts the bound may stay above the optimum.
+
+    # Lay out the options of the remaining units as the rows of a matrix, padded with worthless options
+    Units = Store.UnitOfEachEntry()
+    Entries = np.flatnonzero(Remaining[Units])
+    (UnitIDs, Rows) = np.unique(Units[Entries], return_inverse=True)
+    Columns = Entries - Store.Offsets[Units[Entries]]
+    OptionValues = np.full((len(UnitIDs), Columns.max(initial=-1) + 1), -np.inf)
+    OptionValues[Rows, Columns] = Values[Entries]
+    OptionShifts = np.zeros(OptionValues.shape, dtype=np.int64)
+    OptionShifts[Rows, Columns] = Store.ShiftIDs[Entries]
+    Headcounts = Store.Headcounts[UnitIDs].astype(np.float64)
+    MaxShifts = Store.MaxShifts[UnitIDs]
+    Places = Capacities.astype(np.float64)
+
+    # Start from the given prices, or without prices, and halve the step size whenever the bound stops improving
+    if Prices is None:
+        Prices = np.zeros(len(Places))
+    else:
+        Prices = np.asarray(Prices, dtype=np.float64)
+    (UpperBound, BestPrices) = (np.inf, Prices)
+    (StepSize, Stalls, Iterations) = (2.0, 0, 0)
+    while len(Entries) > 0:
+
+        # Give every volunteer their best option after the prices (the first of them, if there are ties), or their best
+        # options, as many as they can take
+        Reduced = OptionValues - Prices[OptionShifts]
+        if MaxShifts.max(initial=1) == 1:
+            (Rows, Choices) = (np.arange(len(UnitIDs)), Reduced.argmax(axis=1))
+        else:
+            Ranked = np.argsort(-Reduced, axis=1, kind='stable')[:, :MaxShifts.max()]
+            (Rows, Ranks) = np.nonzero(np.arange(Ranked.shape[1]) < MaxShifts[:, None])
+            Choices = Ranked[Rows, Ranks]
+        ChoiceValues = np.maximum(Reduced[Rows, Choices], 0)
+        Bound = Places @ Prices + Headcounts[Rows] @ ChoiceValues
+
+        # Keep the best bound
+        if Bound < UpperBound:
+            (UpperBound, BestPrices, Stalls) = (Bound, Prices, 0)
+        else:
+            Stalls += 1
+            if Stalls >= 5:
+                (StepSize, Stalls) = (StepSize / 2, 0)
+
+        # Stop once the bound meets the known solution, the step size vanishes or the time is up
+        if UpperBound - LowerBound < 1 or StepSize < 1e-6 or time.perf_counter() >= Deadline:
+            break
+
+        # Count the volunteers who want each shift
+        Wanted = ChoiceValues > 0
+        Demand = np.bincount(OptionShifts[Rows[Wanted], Choices[Wanted]], weights=Headcounts[Rows[Wanted]], minlength=len(Places))
+
+        # Step the prices against the excess demand, leaving the free shifts with places to spare at zero
+        Subgradient = Places - Demand
+        Subgradient[(Prices <= 0) & (Subgradient > 0)] = 0
+        Norm = Subgradient @ Subgradient
+        if Norm == 0:  # every shift is exactly as wanted as it should be, so the bound is optimal
+            break
+        Prices = np.maximum(Prices - StepSize * (Bound - LowerBound) / Norm * Subgradient, 0)
+        Iterations += 1
+
+    # The objective is integer, so the bound can be rounded down (allowing for rounding errors in the sums)
+    if len(Entries) == 0:
+        UpperBound = 0
+    else:
+        UpperBound = int(np.floor(UpperBound + 1e-9 * abs(UpperBound) + 1e-6))
+
+    # Return the bound
+    return (UpperBound, BestPrices, Iterations)
+
+def PreviewAssignments(Store, Shifts, Scalar, Weights=None, TimeLimit=1.0):
+    # This function quickly finds a good solution, without a solver, together with a bound on how far it is from optimal
+    # Inputs:
+    #   Store = an AssignmentStore object
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   Scalar = the objective scalar (see CalcObjectiveScalar)
+    #   Weights = a dictionary of objective weights like ObjectiveWeights, which is used by default
+    #   TimeLimit = the number of seconds to spend, roughly; the greedy solutions are always completed
+    # Outputs:
+    #   Store = the same store, with the values, objective and status of the solution, and one Statistics entry
+    #
+    # The presolve (see PresolveAssignments) fixes the uncontested volunteers and finds a greedy solution and a first
+    # bound. The rest of the time is spent tightening the bound (see CalcLagrangianBound), and the final shift prices
+    # steer a second greedy solution, which hands out the entries in decreasing order of value after the price.
+
+    # Start the clock
+    Start = time.perf_counter()
+
+    # Presolve, which gives a greedy solution and a bound
+    Presolved = PresolveAssignments(Store, Shifts, Scalar, Weights)
+    (Values, Objective, UpperBound) = (Presolved.Greedy, Presolved.GreedyObjective, Presolved.UpperBound)
+    (Iterations, Improved) = (0, False)
+
+    # Tighten the bound, leaving as much time for the second greedy solution as the presolve took
+    if Objective < UpperBound:
+        Elapsed = time.perf_counter() - Start
+        (Bound, Prices, Iterations) = CalcLagrangianBound(
+            Store, Presolved.Values, Presolved.Remaining, Presolved.Capacities,
+            Objective - Presolved.FixedObjective, Start + max(TimeLimit - Elapsed, 0),
+        )
+        UpperBound = min(UpperBound, Presolved.FixedObjective + Bound)
+
+    # Hand out the entries again by their value after the prices, and keep the better solution
+    if Objective < UpperBound:
+        Order = np.argsort(-(Presolved.Values - Prices[Store.ShiftIDs]), kind='stable')
+        Candidate = AssignGreedily(Store, Presolved.Values, Order, Presolved.Remaining, Presolved.Capacities, Presolved.Fixed, Presolved.Conflicts)
+        CandidateObjective = int((Candidate * Presolved.Values).sum())
+        if CandidateObjective > Objective:
+            (Values, Objective, Improved) = (Candidate, CandidateObjective, True)
+
+    # Store the solution
+    Store.Values = Values
+    Store.Objective = Objective
+    Store.Status = 'OPTIMAL' if Objective >= UpperBound else 'FEASIBLE'
+    Store.Statistics = [{
+        'Volunteers' : int(Store.Headcounts.sum()),
+        'Entries' : len(Store.ShiftIDs),
+        'Fixed volunteers' : Presolved.Statistics['Fixed volunteers'],
+        'Greedy objective' : Presolved.GreedyObjective,
+        'Priced greedy improved' : Improved,
+        'Price iterations' : Iterations,
+        'Status' : Store.Status,
+        'Objective' : Objective,
+        'Bound' : UpperBound,
+        'Gap' : (UpperBound - Objective) / max(abs(UpperBound), 1),
+        'Preview [s]' : time.perf_counter() - Start,
+    }]
+
+    # Return the solution
+    return Store
+
+def CalcObjectiveScalar(Shifts, MaxScalar=MaxObjectiveScalar):
+    # This function calculates the scalar which makes the objective integer.
+    # The coverage term of a shift is divided by its requirement, so the scalar is the least common multiple of the
+    # requirements, which keeps the objective coefficients as small as possible. If even that exceeds MaxScalar, the
+    # scalar is capped and the coverage coefficients are rounded to the nearest integer (see CalcAssignmentValues and
+    # DescribeObjectiveRounding).
 
     # Get the list of unique "Required Volunteer" numbers
     UniqueList = GetUniqueListElements(
         [Shifts[s].RequiredVolunteers for s in Shifts]
     )
 
-    # Calculate the product of this list
-    p = ListProd(UniqueList)
+    # Calculate the least common multiple of this list
+    Scalar = ListLCM(UniqueList)
 
-    # Round the product to an integer
-    Scalar = int(p)
+    # Cap the scalar
+    Scalar = min(Scalar, MaxScalar)
 
     # Return the scalar
     return Scalar
 
+def DescribeObjectiveRounding(Shifts, MaxScalar=MaxObjectiveScalar):
+    # This function checks whether the objective scalar is capped (see CalcObjectiveScalar), in which case the coverage
+    # coefficients are rounded and the objective is only approximately the documented one
+    # Outputs:
+    #   Message = a message describing the rounding, or None if the objective is exact
+
+    # Calculate the least common multiple of the requirements, before capping it
+    Required = GetUniqueListElements([Shifts[s].RequiredVolunteers for s in Shifts])
+    if ListLCM(Required) <= MaxScalar:
+        return None
+
+    # Describe the rounding
+    return 'The shift requirements (%s) have no common multiple up to %d, so the coverage term of the objective is rounded and the objective is approximate.' % (
+        ', '.join(str(r) for r in sorted(Required)),
+        MaxScalar,
+    )
+
 def ListProd(List):
 
     # Initialize the product
@@ -333,6 +1523,21 @@ def ListProd(List):
 
     return p
 
+def ListLCM(List):
+
+    # Import the math library
+    import math
+
+    # Initialize the least common multiple
+    m = 1
+
+    # Loop over the elements of the list
+    for e in List:
+
+        m = m * e // math.gcd(m, e)
+
+    return m
+
 def GetUniqueListElements(List):
 
     # Initialize the list of unique elements
@@ -350,32 +1555,881 @@ def GetUniqueListElements(List):
     # Return the unique list
     return UniqueList
 
-def PrintShiftAssignments(solver, Assignment, Shifts):
-    # This function prints out a shift-centric view of the shift assignments
+def CollapseEquivalentVolunteers(IndividualVolunteers, Shifts):
+    # This function groups the individual volunteers with identical preference profiles into volunteer classes
     # Inputs:
-    #   solver = the CP solver object, which has already solved the model.
-    #   Assignment = a dictionary mapping (volunteer, shift) tuples to binary assignment decision variables
-    #   Shifts = a dictionary of Shift objects
-    
-    # Loop over the shifts
-    for s in Shifts:
+    #   IndividualVolunteers = a list of volunteer objects, whose shift preference points have been calculated
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    # Outputs:
+    #   VolunteerClasses = a list of VolunteerClass objects, ordered by the sign-up of their first member.
+    #                      Volunteers without a single valid preference are left out, since they cannot be assigned.
+    #                      Volunteers who can take several shifts are kept as they are, since their conflicts are
+    #                      modelled per volunteer (see ListConflictingEntries).
 
-        # Print the name of the shift
-        print(s)
+    # Initialize the dictionary of classes, indexed by preference profile
+    ClassesByProfile = {}
 
-        for v in IndividualVolunteers:
+    # Loop over the volunteers in sign-up order
+    for v in IndividualVolunteers:
 
-            if solver.Value(Assignment[(v,s)]) == 1:
+        # Skip volunteers with no valid preferences
+        if len(v.ShiftIDs) == 0:
+            continue
 
-                # Print the volunteer's first and last name
-                print('\t' + v.FirstName, v.LastName)
+        # Keep the volunteers who can take several shifts on their own
+        if v.MaxShifts > 1:
+            ClassesByProfile[id(v)] = v
+            continue
 
-def PrintSummaryStatistics(solver, Assignment, Shifts):
-    # This function prints out several statistics summarizing the quality of the shift assignment found by the optimizer
+        # Construct the volunteer's preference profile
+        Profile = (v.IsPreferredVolunteer == True, v.ShiftIDs, v.Points, v.PreviousCounts)
+
+        # Check if a class with this profile already exists
+        if not Profile in ClassesByProfile:  # then it's not there
+
+            # Instantiate a new volunteer class
+            c = VolunteerClass()
+            c.ID_Number = len(ClassesByProfile)
+            c.IsPreferredVolunteer = v.IsPreferredVolunteer == True
+            c.ShiftIDs = v.ShiftIDs
+            c.Points = v.Points
+
+            # Add the class to the dictionary
+            ClassesByProfile[Profile] = c
+
+        # Add the volunteer to their class
+        c = ClassesByProfile[Profile]
+        c.Members.append(v)
+        c.Volunteers += 1
+
+    # Count the members of each class who held each shift in the previous schedule
+    for c in ClassesByProfile.values():
+        if isinstance(c, VolunteerClass) and len(c.Members[0].PreviousCounts) > 0:
+            c.PreviousCounts = tuple(Count * c.Volunteers for Count in c.Members[0].PreviousCounts)
+
+    # Return the list of volunteer classes
+    return list(ClassesByProfile.values())
+
+def DisaggregateVolunteerClasses(Store, IndividualVolunteers, VolunteerGroups):
+    # This function maps a solution over volunteer classes back to the individual volunteers
+    # Inputs:
+    #   Store = a solved AssignmentStore over the volunteer groups and classes
+    #   IndividualVolunteers = the list of volunteer objects that were collapsed into the classes
+    #   VolunteerGroups = the list of VolunteerGroup objects
+    # Outputs:
+    #   Disaggregated = a solved AssignmentStore over the individual volunteers followed by the groups
+    #
+    # Within each class, the shifts are handed out in the class's order of preference to the members in sign-up order,
+    # so the result is deterministic.
+
+    # Instantiate the disaggregated store
+    Disaggregated = AssignmentStore(list(IndividualVolunteers) + list(VolunteerGroups))
+    Disaggregated.Objective = Store.Objective
+    Disaggregated.Status = Store.Status
+    Disaggregated.Statistics = Store.Statistics
+
+    # Number the units of the disaggregated store
+    Position = {}
+    for u in Disaggregated.Units:
+        Position[id(u)] = len(Position)
+
+    # Loop over the units of the class-level store
+    Offsets = Store.Offsets.tolist()
+    for (k, u) in enumerate(Store.Units):
+
+        # Get the unit's solution values
+        Values = Store.Values[Offsets[k]:Offsets[k + 1]].tolist()
+
+        # Check if this is a volunteer class
+        if isinstance(u, VolunteerClass):
+
+            # Hand out the class's assignments to its members in sign-up order.
+            # The members have the same preferences as their class, so entry j of a member is entry j of the class.
+            MemberIndex = 0
+            for (j, Value) in enumerate(Values):
+                for _ in range(Value):
+                    Disaggregated.Values[Disaggregated.Offsets[Position[id(u.Members[MemberIndex])]] + j] = 1
+                    MemberIndex += 1
+
+        else:
+
+            # Keep the assignments of groups (and of individual volunteers) as they are
+            Start = Disaggregated.Offsets[Position[id(u)]]
+            Disaggregated.Values[Start:Start + len(Values)] = Values
+
+    # Return the disaggregated store
+    return Disaggregated
+
+def SolveMinCostFlow(IndividualVolunteers, Shifts, VolunteerGroups=(), Scalar=None, Weights=None):
+    # This function solves the problem exactly as a min-cost flow, which is much faster than the CP solver on large volunteer pools.
+    # Inputs:
+    #   IndividualVolunteers = a list of volunteer objects.
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   VolunteerGroups = a list of VolunteerGroup (or VolunteerClass) objects
+    #   Scalar = the objective scalar (see CalcObjectiveScalar); by default, it is calculated from Shifts
+    #   Weights = a dictionary of objective weights like ObjectiveWeights, which is used by default
+    # Outputs:
+    #   Store = a solved AssignmentStore over the volunteers followed by the groups, whose Variables are the arcs of the network
+    #
+    # The network is:
+    #   source --(capacity 1)--> volunteer --(capacity 1, cost = -value)--> shift --(capacity = required volunteers)--> sink
+    # plus an arc from the source straight to the sink, which carries the flow of the volunteers left unassigned.
+    # A group is a single node, whose arcs have a capacity equal to the number of members in the group. A volunteer who
+    # can take several shifts gets that much flow from the source; their conflicting shifts, if they ranked any, cannot
+    # be expressed in the network, so such problems are refused.
+
+    # Import the OR-Tools min-cost flow solver
+    from ortools.graph.python import min_cost_flow
+
+    # Number the volunteers and groups, and their preferred shifts
+    Store = AssignmentStore(list(IndividualVolunteers) + list(VolunteerGroups))
+
+    # Look up the number of volunteers required by each shift
+    Required = ListRequiredVolunteers(Shifts)
+
+    # Number the nodes of the network: the source, the sink, the shifts by ID number, then the volunteers and groups
+    Source = 0
+    Sink = 1
+    ShiftNodes = 2 + np.arange(len(Required))
+    UnitNodes = 2 + len(Required) + np.arange(len(Store.Units))
+
+    # Count the total number of volunteers, including the members of each group, and the shifts they can take
+    TotalVolunteers = int((Store.Headcounts * Store.MaxShifts).sum())
+
+    # Conflicting shifts cannot be modelled as a flow
+    if len(ListConflictingEntries(Store, Shifts)) > 0:
+        raise ValueError('Some volunteers who can take several shifts signed up for conflicting shifts, which the flow backend cannot schedule; use the cpsat backend.')
+
+    # Calculate the scalar required to make everything integer
+    if Scalar == None:
+        Scalar = CalcObjectiveScalar(Shifts)
+
+    # Create the arcs
+    ## Volunteer arcs, from the source to each volunteer and group with at least one valid preference, with one unit of
+    ## flow per shift each member can take
+    HasShifts = np.diff(Store.Offsets) > 0
+    VolunteerArcs = (
+        np.full(HasShifts.sum(), Source),
+        UnitNodes[HasShifts],
+        (Store.Headcounts * Store.MaxShifts)[HasShifts],
+        np.zeros(HasShifts.sum(), dtype=np.int64),
+    )
+
+    ## Assignment arcs, from each volunteer and group to each of their valid shifts
+    AssignmentArcs = (
+        UnitNodes[Store.UnitOfEachEntry()],
+        ShiftNodes[Store.ShiftIDs],
+        np.minimum(np.repeat(Store.Headcounts, np.diff(Store.Offsets)), Required[Store.ShiftIDs]),
+        -CalcAssignmentValues(Store, Shifts, Scalar, Weights),  # The flow solver minimizes, so the values are negated
+    )
+
+    ## Shift arcs
+    ShiftArcs = (
+        ShiftNodes,
+        np.full(len(Required), Sink),
+        Required,
+        np.zeros(len(Required), dtype=np.int64),
+    )
+
+    ## Overflow arc for the unassigned volunteers
+    OverflowArc = ([Source], [Sink], [TotalVolunteers], [0])
+
+    # Build the network
+    Network = min_cost_flow.SimpleMinCostFlow()
+    Arcs = [VolunteerArcs, AssignmentArcs, ShiftArcs, OverflowArc]
+    Network.add_arcs_with_capacity_and_unit_cost(
+        np.concatenate([a[0] for a in Arcs]).astype(np.int32),
+        np.concatenate([a[1] for a in Arcs]).astype(np.int32),
+        np.concatenate([a[2] for a in Arcs]).astype(np.int64),
+        np.concatenate([a[3] for a in Arcs]).astype(np.int64),
+    )
+    Store.Variables = len(VolunteerArcs[0]) + np.arange(len(Store.ShiftIDs), dtype=np.int32)
+
+    # Send one unit of flow per volunteer from the source to the sink
+    Network.set_node_supply(Source, TotalVolunteers)
+    Network.set_node_supply(Sink, -TotalVolunteers)
+
+    # Solve the min-cost flow problem
+    Status = Network.solve()
+    if Status != Network.OPTIMAL:
+        raise RuntimeError('The min-cost flow solver failed with status %s.' % Status)
+
+    # Store the solution
+    Store.Values = Network.flows(Store.Variables).astype(np.int64)
+    Store.Objective = -Network.optimal_cost()
+
+    # Return the solution
+    return Store
+
+def FindConnectedComponents(IndividualVolunteers, Shifts, VolunteerGroups=()):
+    # This function splits the volunteer-shift preference graph into its connected components, which can be solved independently
+    # Inputs:
+    #   IndividualVolunteers = a list of volunteer objects.
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   VolunteerGroups = a list of VolunteerGroup (or VolunteerClass) objects
+    # Outputs:
+    #   Components = a list of (volunteers, shifts, groups) tuples, one per component, largest first.
+    #                Volunteers and groups without a valid preference, and shifts that nobody ranked, are left out.
+
+    # Look up the shift names by ID number
+    ShiftNames = ListShiftNames(Shifts)
+
+    # Initialize the union-find forest over the shift ID numbers
+    Parent = list(range(len(ShiftNames)))
+
+    def FindRoot(s):
+        # This function finds the root of a shift's tree, compressing the path along the way
+        while Parent[s] != s:
+            Parent[s] = Parent[Parent[s]]
+            s = Parent[s]
+        return s
+
+    # Join the shifts ranked by the same volunteer or group
+    for v in list(IndividualVolunteers) + list(VolunteerGroups):
+        for s in v.ShiftIDs[1:]:
+            Parent[FindRoot(s)] = FindRoot(v.ShiftIDs[0])
+
+    # Collect the members of each component, indexed by the root shift
+    ComponentsByRoot = {}
+    for (Units, Position) in [(IndividualVolunteers, 0), (VolunteerGroups, 2)]:
+        for v in Units:
+
+            # Skip volunteers and groups with no valid preferences
+            if len(v.ShiftIDs) == 0:
+                continue
+
+            # Find or create the component
+            Root = FindRoot(v.ShiftIDs[0])
+            if not Root in ComponentsByRoot:
+                ComponentsByRoot[Root] = ([], {}, [])
+
+            # Add the volunteer or group, and their shifts, to the component
+            ComponentsByRoot[Root][Position].append(v)
+            for s in v.ShiftIDs:
+                ComponentsByRoot[Root][1][ShiftNames[s]] = Shifts[ShiftNames[s]]
+
+    # Order the components from largest to smallest, so that the big ones start first
+    Components = sorted(
+        ComponentsByRoot.values(),
+        key=lambda c: len(c[0]) + len(c[2]),
+        reverse=True,
+    )
+
+    # Return the components
+    return Components
+
+def SolveSubproblem(IndividualVolunteers, Shifts, VolunteerGroups, Backend, Scalar=None, Weights=None, Options=None, OnSolution=None, Capacities=None, Hint=None):
+    # This function builds and solves the model for a set of volunteers and shifts using the requested backend
+    # Inputs:
+    #   Options = a SolverOptions object; by default, the solver runs to optimality with its default settings, after
+    #             presolving the problem (see PresolveAssignments)
+    #   OnSolution = a function called with the store each time an improving solution is found
+    #   Capacities, Hint = the remaining shift capacities and a starting solution of the CP model (see BuildModel)
+    # Outputs:
+    #   Store = a solved AssignmentStore over the volunteers followed by the groups
+
+    # Import the copy library
+    import copy
+
+    # Check which backend was requested
+    if Backend == 'cpsat' and (Options == None or Options.Presolve == True):
+
+        # Simplify the problem, and find a greedy solution and a bound
+        Start = time.perf_counter()
+        if Scalar == None:
+            Scalar = CalcObjectiveScalar(Shifts)
+        Store = AssignmentStore(list(IndividualVolunteers) + list(VolunteerGroups))
+        Presolved = PresolveAssignments(Store, Shifts, Scalar, Weights)
+        ReductionTime = time.perf_counter() - Start
+
+        # Check if the greedy solution is already optimal
+        if Presolved.GreedyObjective == Presolved.UpperBound:
+
+            # Use it, without calling the solver
+            Store.Values = Presolved.Greedy
+            Store.Objective = Presolved.GreedyObjective
+            if OnSolution != None:
+                OnSolution(Store)
+            Statistics = {'Backend' : 'cpsat', 'Units' : len(Store.Units), 'Status' : Store.Status, 'Objective' : Store.Objective, 'Solver skipped' : True}
+
+        else:
+
+            # Solve what is left, starting from the greedy solution
+            RemainingUnits = [u for (u, IsRemaining) in zip(Store.Units, Presolved.Remaining.tolist()) if IsRemaining]
+            RemainingEntries = np.flatnonzero(np.repeat(Presolved.Remaining, np.diff(Store.Offsets)))
+            def Expand(Reduced):
+                # This function copies a solution of what is left into the full store, next to the fixed entries,
+                # keeping the greedy solution instead if the solver stopped without finding anything better
+                if not Reduced.Status in ['OPTIMAL', 'FEASIBLE'] or Presolved.FixedObjective + Reduced.Objective < Presolved.GreedyObjective:
+                    Store.Values = Presolved.Greedy.copy()
+                    Store.Objective = Presolved.GreedyObjective
+                    Store.Status = 'FEASIBLE'
+                    return Store
+                Store.Values = Presolved.Fixed.copy()
+                Store.Values[RemainingEntries] = Reduced.Values
+                Store.Objective = Presolved.FixedObjective + Reduced.Objective
+                Store.Status = Reduced.Status
+                return Store
+            ReducedOptions = copy.copy(Options) if Options != None else SolverOptions()
+            ReducedOptions.Presolve = False
+            Reduced = SolveSubproblem(
+                [], Shifts, RemainingUnits, Backend, Scalar, Weights, ReducedOptions,
+                (lambda r: OnSolution(Expand(r))) if OnSolution != None else None,
+                Presolved.Capacities, Presolved.Greedy[RemainingEntries],
+            )
+            Expand(Reduced)
+            Statistics = dict(Reduced.Statistics[0])
+            Statistics['Units'] = len(Store.Units)
+            Statistics['Objective'] = Store.Objective
+            if Reduced.Status in ['OPTIMAL', 'FEASIBLE']:
+                Statistics['Bound'] = min(Presolved.UpperBound, Presolved.FixedObjective + Statistics['Bound'])
+            else:
+                Statistics['Bound'] = Presolved.UpperBound
+            Statistics['Status'] = Store.Status
+            Statistics['Gap'] = abs(Statistics['Bound'] - Statistics['Objective']) / max(1.0, abs(Statistics['Objective']))
+            Statistics['Solver skipped'] = False
+
+        # Record how much the presolve removed
+        Statistics['Reduction [s]'] = ReductionTime
+        Statistics.update(Presolved.Statistics)
+        Store.Statistics = [Statistics]
+
+    elif Backend == 'cpsat':
+
+        # Build the constraint programming model
+        Start = time.perf_counter()
+        (model, Store) = BuildModel(IndividualVolunteers, Shifts, VolunteerGroups, Scalar, Weights, Capacities, Hint)
+        BuildTime = time.perf_counter() - Start
+
+        # Create the solver, recording its log if requested
+        from ortools.sat.python import cp_model
+        solver = cp_model.CpSolver()
+        LogLines = []
+        if Options != None:
+            Options.Configure(solver)
+            if Options.RecordLog == True:
+                solver.parameters.log_search_progress = True
+                solver.parameters.log_to_stdout = False
+                solver.log_callback = LogLines.append
+
+        # Solve
+        Start = time.perf_counter()
+        if OnSolution != None:
+            solver.Solve(model, MakeSolutionStreamer(Store, OnSolution))
+        else:
+            solver.Solve(model)
+        SolveTime = time.perf_counter() - Start
+
+        # Read out the solution
+        Store.ReadSolution(solver)
+
+        # Record the model and solver statistics
+        Proto = model.Proto()
+        Response = solver.ResponseProto()
+        Statistics = {
+            'Backend' : 'cpsat',
+            'Units' : len(Store.Units),
+            'Variables' : len(Proto.variables),
+            'Constraints' : len(Proto.constraints),
+            'Objective terms' : len(Proto.objective.coeffs),
+            'Build [s]' : BuildTime,
+            'Solve [s]' : SolveTime,
+            'Status' : Store.Status,
+            'Objective' : Response.objective_value,
+            'Bound' : Response.best_objective_bound,
+            'Gap' : abs(Response.best_objective_bound - Response.objective_value) / max(1.0, abs(Response.objective_value)),
+            'Branches' : Response.num_branches,
+            'Conflicts' : Response.num_conflicts,
+        }
+
+        # Split the solve time into presolve and search, if the log was recorded
+        if len(LogLines) > 0:
+            SearchStart = ParseSearchStart(LogLines)
+            if SearchStart != None:
+                Statistics['Presolve [s]'] = SearchStart
+                Statistics['Search [s]'] = max(0.0, Response.wall_time - SearchStart)
+        Store.Statistics = [Statistics]
+
+    elif Backend == 'flow':
+
+        # Build and solve the min-cost flow problem, which is always solved to optimality in one go
+        Start = time.perf_counter()
+        Store = SolveMinCostFlow(IndividualVolunteers, Shifts, VolunteerGroups, Scalar, Weights)
+        SolveTime = time.perf_counter() - Start
+        if OnSolution != None:
+            OnSolution(Store)
+
+        # Record the network and solver statistics
+        Store.Statistics = [{
+            'Backend' : 'flow',
+            'Units' : len(Store.Units),
+            'Arcs' : len(Store.Variables),
+            'Solve [s]' : SolveTime,
+            'Status' : Store.Status,
+            'Objective' : Store.Objective,
+        }]
+
+    else:
+        raise ValueError('Unknown solver backend "%s". Choose "cpsat" or "flow".' % Backend)
+
+    # Return the solution
+    return Store
+
+def SolveComponent(Job):
+    # This function solves one connected component in a worker process
+    # Inputs:
+    #   Job = a (volunteers, shifts, groups, backend, scalar, weights, options) tuple
+    # Outputs:
+    #   Values = the solution value of each entry, for the volunteers followed by the groups of the component
+    #   Objective = the objective value of the component
+    #   Status = the status of the solver
+    #   Statistics = the model and solver statistics of the component (see SolveSubproblem)
+
+    # Unpack the job
+    (IndividualVolunteers, Shifts, VolunteerGroups, Backend, Scalar, Weights, Options) = Job
+
+    # Solve the component
+    Store = SolveSubproblem(IndividualVolunteers, Shifts, VolunteerGroups, Backend, Scalar, Weights, Options)
+
+    # Return only the solution arrays, since the units are copies of the caller's objects
+    return (Store.Values, Store.Objective, Store.Status, Store.Statistics)
+
+def MergeComponentSolution(Store, Position, Job, Values):
+    # This function copies the solution of a component into a store over the whole problem
+    # Inputs:
+    #   Store = an AssignmentStore over all of the volunteers and groups
+    #   Position = a dictionary mapping the id() of each unit to its position in the store
+    #   Job = the component's job (see SolveComponent)
+    #   Values = the solution value of each entry of the component
+
+    # Copy each unit's entries to its position in the merged store
+    Start = 0
+    for u in list(Job[0]) + list(Job[2]):
+        MergedStart = Store.Offsets[Position[id(u)]]
+        Store.Values[MergedStart:MergedStart + len(u.ShiftIDs)] = Values[Start:Start + len(u.ShiftIDs)]
+        Start += len(u.ShiftIDs)
+
+def CombineStatuses(Statuses):
+    # This function combines the solver statuses of several components into the status of the whole problem
+
+    # Check if every component was solved to optimality, or at least has a solution
+    if all(Status == 'OPTIMAL' for Status in Statuses):
+        return 'OPTIMAL'
+    elif all(Status in ['OPTIMAL', 'FEASIBLE'] for Status in Statuses):
+        return 'FEASIBLE'
+    else:
+        return [Status for Status in Statuses if not Status in ['OPTIMAL', 'FEASIBLE']][0]
+
+def Solve(IndividualVolunteers, Shifts, VolunteerGroups=(), Backend='cpsat', ReduceSymmetry=True, Decompose=True, Processes=None, Weights=None, Options=None, OnSolution=None):
+    # This function finds the optimal shift assignment using the requested backend
+    # Inputs:
+    #   IndividualVolunteers = a list of volunteer objects.
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   VolunteerGroups = a list of VolunteerGroup objects
+    #   Backend = 'cpsat' for the constraint programming solver, or 'flow' for the min-cost flow solver
+    #   ReduceSymmetry = whether to solve over classes of volunteers with identical preference profiles
+    #   Decompose = whether to solve the connected components of the preference graph separately
+    #   Processes = the number of worker processes used to solve the components; by default, one per core
+    #   Weights = a dictionary of objective weights like ObjectiveWeights, which is used by default
+    #   Options = a SolverOptions object; its time limit applies to the whole solve
+    #   OnSolution = a function called with a solved AssignmentStore over the individual volunteers followed by the groups
+    #                each time an improving schedule is found. The components are then solved one after the other in this
+    #                process, and the components which have not been reached yet are reported unassigned.
+    # Outputs:
+    #   Store = a solved AssignmentStore over the individual volunteers followed by the groups
+
+    # Import the process pool
+    import concurrent.futures
+    import copy
+    import os
+
+    # Start the clock on the time limit
+    if Options != None:
+        Options = copy.copy(Options)
+        if Options.MaxTime != None:
+            Options.Deadline = time.time() + Options.MaxTime
+
+    # Collapse the volunteers with identical preference profiles into classes
+    if ReduceSymmetry == True:
+        VolunteerClasses = CollapseEquivalentVolunteers(IndividualVolunteers, Shifts)
+        (Individuals, Units) = ([], list(VolunteerGroups) + VolunteerClasses)
+    else:
+        (Individuals, Units) = (IndividualVolunteers, VolunteerGroups)
+
+    def Finish(Store):
+        # This function assigns the individual volunteers of each class
+        if ReduceSymmetry == True:
+            Store = DisaggregateVolunteerClasses(Store, IndividualVolunteers, VolunteerGroups)
+        return Store
+
+    # Calculate the objective scalar over all of the shifts, so that every component uses the same objective
+    Scalar = CalcObjectiveScalar(Shifts)
+
+    # Split the problem into its connected components
+    if Decompose == True:
+        Components = FindConnectedComponents(Individuals, Shifts, Units)
+    else:
+        Components = [(Individuals, Shifts, Units)]
+
+    # Check if there is more than one component
+    if len(Components) <= 1:
+
+        # Solve the whole problem at once
+        if OnSolution != None:
+            Store = SolveSubproblem(Individuals, Shifts, Units, Backend, Scalar, Weights, Options, lambda s: OnSolution(Finish(s)))
+        else:
+            Store = SolveSubproblem(Individuals, Shifts, Units, Backend, Scalar, Weights, Options)
+
+    else:
+
+        # Package the components as jobs
+        Jobs = [(c[0], c[1], c[2], Backend, Scalar, Weights, Options) for c in Components]
+
+        # Instantiate the store over all of the volunteers and groups, into which the solutions of the components are merged
+        Store = AssignmentStore(list(Individuals) + list(Units))
+        Position = {}
+        for u in Store.Units:
+            Position[id(u)] = len(Position)
+
+        # Solve the components
+        if OnSolution != None:
+
+            # Solve the components one by one, reporting the improving solutions of each in the context of the others
+            Statuses = []
+            for Job in Jobs:
+
+                # Define the function which reports an improving solution of this component
+                SolvedObjective = Store.Objective
+                def OnComponentSolution(ComponentStore, Job=Job, SolvedObjective=SolvedObjective):
+                    MergeComponentSolution(Store, Position, Job, ComponentStore.Values)
+                    Store.Objective = SolvedObjective + ComponentStore.Objective
+                    OnSolution(Finish(Store))
+
+                # Solve the component
+                ComponentStore = SolveSubproblem(Job[0], Job[1], Job[2], Backend, Scalar, Weights, Options, OnComponentSolution)
+                MergeComponentSolution(Store, Position, Job, ComponentStore.Values)
+                Store.Objective = SolvedObjective + ComponentStore.Objective
+                Store.Statistics += ComponentStore.Statistics
+                Statuses.append(ComponentStore.Status)
+
+        else:
+
+            # Solve the components, in parallel if several processes are available
+            if Processes == None:
+                Processes = os.cpu_count()
+            if Processes <= 1:
+                Results = [SolveComponent(Job) for Job in Jobs]
+            else:
+                with concurrent.futures.ProcessPoolExecutor(Processes) as Pool:
+                    Results = list(Pool.map(SolveComponent, Jobs, chunksize=max(1, len(Jobs) // (4 * Processes))))
+
+            # Merge the solutions of the components
+            Statuses = []
+            for (Job, (ComponentValues, ComponentObjective, ComponentStatus, ComponentStatistics)) in zip(Jobs, Results):
+                MergeComponentSolution(Store, Position, Job, ComponentValues)
+                Store.Objective += ComponentObjective
+                Store.Statistics += ComponentStatistics
+                Statuses.append(ComponentStatus)
+
+        # Combine the statuses of the components
+        Store.Status = CombineStatuses(Statuses)
+
+    # Assign the individual volunteers of each class
+    Store = Finish(Store)
+
+    # Return the solution
+    return Store
+
+def SolveWeightConfiguration(Job):
+    # This function solves a CP model, which was built once for a weight sweep, with the objective of one configuration
+    # Inputs:
+    #   Job = a (model text, variable indices, objective coefficients, hint values, options) tuple; the model is passed as
+    #         text because CP models cannot be pickled, and the hint values are None to keep the model's own hints
+    # Outputs:
+    #   Values = the solution value of each variable of the store
+    #   Objective = the objective value
+    #   Status = the status of the solver
+
+    # Unpack the job
+    (ModelText, VariableIndices, Coefficients, Hint, Options) = Job
+
+    # Rebuild the model
+    from ortools.sat.python import cp_model
+    model = cp_model.CpModel()
+    model.Proto().parse_text_format(ModelText)
+    Variables = [model.GetIntVarFromProtoIndex(i) for i in VariableIndices]
+
+    # Replace the objective
+    model.ClearObjective()
+    model.Maximize(cp_model.LinearExpr.WeightedSum(Variables, Coefficients))
+
+    # Start from the hinted solution
+    if Hint != None:
+        model.ClearHints()
+        for (x, Value) in zip(Variables, Hint):
+            model.AddHint(x, Value)
+
+    # Solve
+    solver = cp_model.CpSolver()
+    if Options != None:
+        Options.Configure(solver)
+    solver.Solve(model)
+
+    # Read out the solution, in bulk
+    Response = solver.ResponseProto()
+    Solution = np.array(Response.solution, dtype=np.int64)
+    if len(Solution) > 0:
+        Values = Solution[VariableIndices]
+    elif Hint != None:
+
+        # Keep the hinted solution, which satisfies the same constraints, if the shared time limit ran out first
+        Values = np.array(Hint, dtype=np.int64)
+        return (Values, float(np.dot(Coefficients, Values)), 'FEASIBLE')
+    else:
+        Values = np.zeros(len(VariableIndices), dtype=np.int64)
+
+    # Return the solution
+    return (Values, solver.ObjectiveValue(), Response.status.name)
+
+def SweepWeights(IndividualVolunteers, Shifts, VolunteerGroups, WeightSets, Backend='cpsat', ReduceSymmetry=True, Decompose=True, Processes=None, Options=None):
+    # This function solves the problem for several sets of objective weights, to compare the trade-offs between them
+    # Inputs:
+    #   IndividualVolunteers = a list of volunteer objects.
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   VolunteerGroups = a list of VolunteerGroup objects
+    #   WeightSets = a list of dictionaries of objective weights like ObjectiveWeights
+    #   Backend = 'cpsat' or 'flow' (see Solve)
+    #   ReduceSymmetry, Decompose = whether to solve over classes of volunteers and split the problem into its components (see Solve)
+    #   Processes = the number of worker processes, which solve the weight sets and components at the same time; by
+    #               default, one per core
+    #   Options = a SolverOptions object; its time limit applies to the whole sweep
+    # Outputs:
+    #   Stores = a list with a solved AssignmentStore over the individual volunteers followed by the groups for each weight set
+    #
+    # The volunteers are collapsed into classes and the problem is split into its components once. With the presolve
+    # turned off, the CP model of each component is also built once: only its objective changes between weight sets. The
+    # first weight set is solved first, and its solution is the starting point of all of the others. With the presolve,
+    # which depends on the weights, each component of each weight set is presolved and solved on its own.
+
+    # Import the process pool
+    import concurrent.futures
+    import copy
+    import os
+
+    # Collapse the volunteers with identical preference profiles into classes
+    if ReduceSymmetry == True:
+        VolunteerClasses = CollapseEquivalentVolunteers(IndividualVolunteers, Shifts)
+        (Individuals, Units) = ([], list(VolunteerGroups) + VolunteerClasses)
+    else:
+        (Individuals, Units) = (list(IndividualVolunteers), list(VolunteerGroups))
+
+    # Split the problem into its connected components
+    if Decompose == True:
+        Components = FindConnectedComponents(Individuals, Shifts, Units)
+    else:
+        Components = [(Individuals, Shifts, Units)]
+
+    # Calculate the objective scalar over all of the shifts, so that every component uses the same objective
+    Scalar = CalcObjectiveScalar(Shifts)
+
+    # Start the clock on the time limit, which every component of every weight set shares
+    if Options != None:
+        Options = copy.copy(Options)
+        if Options.MaxTime != None:
+            Options.Deadline = time.time() + Options.MaxTime
+
+    # Set the number of processes
+    if Processes == None:
+        Processes = os.cpu_count()
+
+    def Map(Function, Jobs):
+        # This function runs a function over a list of jobs, in parallel if several processes are available
+        if Processes <= 1 or len(Jobs) <= 1:
+            return [Function(Job) for Job in Jobs]
+        with concurrent.futures.ProcessPoolExecutor(min(Processes, len(Jobs))) as Pool:
+            return list(Pool.map(Function, Jobs))
+
+    # Check which backend was requested
+    if Backend == 'cpsat' and Options != None and Options.Presolve == False:
+
+        # Build the model of each component once, and pass it on as text
+        Models = []
+        for c in Components:
+            (model, ComponentStore) = BuildModel(c[0], c[1], c[2], Scalar, WeightSets[0])
+            Models.append((str(model.Proto()), ComponentStore.VariableIndices.tolist(), ComponentStore))
+
+        # Package the components of each weight set as jobs, with the objective coefficients of each
+        Jobs = [
+            [(ModelText, VariableIndices, CalcAssignmentValues(ComponentStore, Shifts, Scalar, Weights).tolist(), None, Options) for (ModelText, VariableIndices, ComponentStore) in Models]
+            for Weights in WeightSets
+        ]
+
+        # Solve the first weight set, and start the others from its solution
+        Results = [Map(SolveWeightConfiguration, Jobs[0])]
+        Hints = [Result[0].tolist() for Result in Results[0]]
+        OtherJobs = [Job[:3] + (Hint,) + Job[4:] for ComponentJobs in Jobs[1:] for (Job, Hint) in zip(ComponentJobs, Hints)]
+        OtherResults = Map(SolveWeightConfiguration, OtherJobs)
+        Results += [OtherResults[k:k + len(Components)] for k in range(0, len(OtherResults), len(Components))]
+
+    elif Backend in ['cpsat', 'flow']:
+
+        # The flow networks are cheap to build, and the presolve depends on the weights, so each component of each weight
+        # set is simply solved from scratch
+        Jobs = [[(c[0], c[1], c[2], Backend, Scalar, Weights, Options) for c in Components] for Weights in WeightSets]
+        AllResults = Map(SolveComponent, [Job for ComponentJobs in Jobs for Job in ComponentJobs])
+        Results = [AllResults[k:k + len(Components)] for k in range(0, len(AllResults), len(Components))]
+
+    else:
+        raise ValueError('Unknown solver backend "%s". Choose "cpsat" or "flow".' % Backend)
+
+    # Merge the components of each weight set, and assign the individual volunteers of each class
+    Stores = []
+    for ComponentResults in Results:
+
+        # Instantiate the store over all of the volunteers, groups and classes
+        Store = AssignmentStore(Individuals + Units)
+        Position = {}
+        for u in Store.Units:
+            Position[id(u)] = len(Position)
+
+        # Merge the solutions of the components
+        for (c, Result) in zip(Components, ComponentResults):
+            MergeComponentSolution(Store, Position, c, Result[0])
+            Store.Objective += Result[1]
+        Store.Status = CombineStatuses([Result[2] for Result in ComponentResults])
+
+        # Assign the individual volunteers of each class
+        if ReduceSymmetry == True:
+            Store = DisaggregateVolunteerClasses(Store, IndividualVolunteers, VolunteerGroups)
+        Stores.append(Store)
+
+    # Return the solutions
+    return Stores
+
+def ParseWeightSweep(Coverage, Preference, Multiplier, Churn=0):
+    # This function lists every combination of the given objective weights
+    # Inputs:
+    #   Coverage, Preference, Multiplier = lists of values of the coverage weight, the preference weight and the
+    #                                      preferred volunteer multiplier
+    #   Churn = the weight of keeping the published assignments
+    # Outputs:
+    #   WeightSets = a list of dictionaries of objective weights like ObjectiveWeights
+
+    # Build the combinations
+    WeightSets = []
+    for (c, p, m) in itertools.product(Coverage, Preference, Multiplier):
+        WeightSets.append({
+            'Maximize the shift coverage' : c,
+            'Respect the volunteer preferences' : p,
+            'Keep the published assignments' : Churn,
+            'Preferred volunteer multiplier' : m,
+        })
+
+    # Return the combinations
+    return WeightSets
+
+def PrintWeightSweep(WeightSets, Schedules, FileName='Weight Sweep.csv'):
+    # This function prints out the summary statistics of each weight set of a sweep side by side, and writes them to a CSV file
+    # Inputs:
+    #   WeightSets = a list of dictionaries of objective weights like ObjectiveWeights
+    #   Schedules = the list of ShiftSchedule objects solved for the weight sets
+    #   FileName = the name of the CSV file, or None to only print the table
+
+    # Build the table, with one row per weight set
+    Header = ['Coverage weight', 'Preference weight', 'Preferred multiplier', 'Requirements covered', 'Shifts fully covered', 'Volunteers assigned', 'Preferred assigned', 'Objective']
+    Rows = []
+    for (Weights, Schedule) in zip(WeightSets, Schedules):
+        Statistics = CalcSummaryStatistics(Schedule)
+        Rows.append([
+            Weights['Maximize the shift coverage'],
+            Weights['Respect the volunteer preferences'],
+            Weights.get('Preferred volunteer multiplier', 2),
+            '%1.1f%%' % (Statistics['Staffing requirements covered'] * 100),
+            '%1.1f%%' % (Statistics['Shifts fully covered'] * 100),
+            '%1.1f%%' % (Statistics['Volunteers assigned to a shift'] * 100),
+            '%1.1f%%' % (Statistics['Preferred volunteers assigned to a shift'] * 100),
+            '%d' % Schedule.Objective,
+        ])
+
+    # Print the table and write it to the CSV file
+    PrintTable(Header, Rows, FileName)
+
+def ExtractSchedule(Store, Shifts):
+    # This function reads a solved assignment store, once, into a schedule for reporting
     # Inputs:
-    #   solver = the CP solver object, which has already solved the model.
-    #   Assignment = a dictionary mapping (volunteer, shift) tuples to binary assignment decision variables
+    #   Store = a solved AssignmentStore over the individual volunteers and the volunteer groups
     #   Shifts = a dictionary of Shift objects
+    # Outputs:
+    #   Schedule = a ShiftSchedule object, which pairs each volunteer, including each member of each volunteer group,
+    #              with the shift they were assigned to, and lists the roster of each shift. A volunteer who can take
+    #              several shifts is paired with each of their shifts.
+
+    # Look up the shift names by ID number
+    ShiftNames = ListShiftNames(Shifts)
+
+    # Instantiate the schedule
+    Schedule = ShiftSchedule()
+    Schedule.Shifts = Shifts
+    Schedule.Rosters = {s: [] for s in Shifts}
+    Schedule.Objective = Store.Objective
+
+    # Find the nonzero entries of the solution, and the unit each of them belongs to
+    Entries = np.flatnonzero(Store.Values)
+    EntryUnits = np.searchsorted(Store.Offsets, Entries, side='right') - 1
+
+    # Collect the assignments of each unit, in the unit's order of preference
+    AssignmentsByUnit = {}
+    for (k, s, Count) in zip(EntryUnits.tolist(), Store.ShiftIDs[Entries].tolist(), Store.Values[Entries].tolist()):
+        AssignmentsByUnit.setdefault(k, []).append((ShiftNames[s], Count))
+
+    # Loop over the volunteers and groups
+    for (k, u) in enumerate(Store.Units):
+
+        # A volunteer who can take several shifts holds all of the unit's assignments
+        if u.MaxShifts > 1:
+            for (s, _) in AssignmentsByUnit.get(k, []):
+                Schedule.VolunteerAssignments.append((u, s))
+                Schedule.Rosters[s].append(u)
+            if not k in AssignmentsByUnit:
+                Schedule.VolunteerAssignments.append((u, None))
+            continue
+
+        # Get the unit's members
+        if isinstance(u, VolunteerGroup):
+            Members = u.ExpandVolunteers(u.Volunteers)  # Expand the group into its members
+        else:
+            Members = [u]
+
+        # Hand out the unit's assignments to its members in order
+        MemberIndex = 0
+        for (s, Count) in AssignmentsByUnit.get(k, []):
+            for v in Members[MemberIndex:MemberIndex + Count]:
+                Schedule.VolunteerAssignments.append((v, s))
+                Schedule.Rosters[s].append(v)
+            MemberIndex += Count
+
+        # The remaining members are unassigned
+        for v in Members[MemberIndex:]:
+            Schedule.VolunteerAssignments.append((v, None))
+
+    # Return the schedule
+    return Schedule
+
+def PrintShiftAssignments(Schedule):
+    # This function prints out a shift-centric view of the shift assignments
+    # Inputs:
+    #   Schedule = a ShiftSchedule object (see ExtractSchedule)
+
+    # Stream the shift-focused table to the console
+    ExportTable(ListShiftFocusedRows(Schedule), [ConsoleSink()])
+
+def CalcSummaryStatistics(Schedule):
+
+    # This function calculates several statistics summarizing the quality of the shift assignment found by the optimizer
+    # Inputs:
+    #   Schedule = a ShiftSchedule object (see ExtractSchedule)
+    # Outputs:
+    #   Statistics = a dictionary of fractions, indexed by the names printed by PrintSummaryStatistics
 
     # Calculate the fraction of the staffing requirements that have been fulfilled
     ## Initialize the count of desired assignments
@@ -384,51 +2438,36 @@ def PrintSummaryStatistics(solver, Assignment, Shifts):
     ## Initialize the count of assignments realized
     AssignmentsRealized = 0
 
-    ## Initialize the count of preferred assignments realized
-    PreferredAssignmentsRealized = 0
-
-    ## Count the number of preferred volunteers
-    PreferredVolunteers = 0
-    for v in IndividualVolunteers:
+    ## Find the distinct volunteers, and those assigned to at least one shift
+    ## (a volunteer who can take several shifts is listed once per shift)
+    Volunteers = {}
+    AssignedVolunteers = {}
+    for (v, s) in Schedule.VolunteerAssignments:
+        Volunteers[id(v)] = v
+        if s != None:
+            AssignedVolunteers[id(v)] = v
 
-        # Check if this is a preferred volunteer
-        if v.IsPreferredVolunteer == True:
-
-            # Increment the count of preferred volunteers
-            PreferredVolunteers += 1
+    ## Count the number of preferred volunteers, and of those assigned
+    PreferredVolunteers = sum(1 for v in Volunteers.values() if v.IsPreferredVolunteer == True)
+    PreferredVolunteersAssigned = sum(1 for v in AssignedVolunteers.values() if v.IsPreferredVolunteer == True)
 
     ## Initialize the count of under-staffed shifts
     UnderStaffedShifts = 0
 
     ## Loop over the shifts
-    for s in Shifts:
+    for s in Schedule.Shifts:
 
         # Increment the staffing requirements
-        AssignmentsRequired += Shifts[s].RequiredVolunteers
-
-        # Initialize the count of volunteers assigned to this shift
-        AssignmentsForShift = 0
-
-        # Loop over each of the volunteers
-        for v in IndividualVolunteers:
-
-            # Check if they were assigned to the current shift
-            if solver.Value(Assignment[(v,s)]) == 1:  # They were assigned to the current shfit
-
-                # Increment the count of assignments realized
-                AssignmentsRealized += 1
-
-                # Increment the count of assignments for this particular shift
-                AssignmentsForShift += 1
+        AssignmentsRequired += Schedule.Shifts[s].RequiredVolunteers
 
-                # Check if this is a preferred volunteer
-                if v.IsPreferredVolunteer == True:
+        # Count the volunteers assigned to this shift
+        AssignmentsForShift = len(Schedule.Rosters[s])
 
-                    # Increment the count of preferred assignments realized
-                    PreferredAssignmentsRealized += 1
+        # Increment the count of assignments realized
+        AssignmentsRealized += AssignmentsForShift
 
         # Check if this shift is under-staffed
-        if AssignmentsForShift < Shifts[s].RequiredVolunteers: # this shift is under-staffed
+        if AssignmentsForShift < Schedule.Shifts[s].RequiredVolunteers: # this shift is under-staffed
 
             # Increment the count of under-staffed shifts
             UnderStaffedShifts += 1
@@ -437,192 +2476,1965 @@ def PrintSummaryStatistics(solver, Assignment, Shifts):
     FractionOfRequirementsRealized = AssignmentsRealized / AssignmentsRequired
 
     ## Calculate the fraction of under-staffed shifts
-    FractionOfUnderStaffedShifts = UnderStaffedShifts / len(Shifts)
+    FractionOfUnderStaffedShifts = UnderStaffedShifts / len(Schedule.Shifts)
 
     ## Calculate the fraction of volunteers assigned
-    FractionOfVolunteersAssigned = AssignmentsRealized / len(IndividualVolunteers)
+    FractionOfVolunteersAssigned = len(AssignedVolunteers) / len(Volunteers)
 
     ## Calculate the fraction of preferred volunteers assigned
-    FractionOfPreferredVolunteersAssigned = PreferredAssignmentsRealized / PreferredVolunteers
-
-    ## Print the results
-    print('\nStaffing requirements covered: %1.1f%%.' % (FractionOfRequirementsRealized * 100))
+    FractionOfPreferredVolunteersAssigned = PreferredVolunteersAssigned / PreferredVolunteers
+
+    ## Return the results
+    return {
+        'Staffing requirements covered' : FractionOfRequirementsRealized,
+        'Shifts fully covered' : 1 - FractionOfUnderStaffedShifts,
+        'Volunteers assigned to a shift' : FractionOfVolunteersAssigned,
+        'Preferred volunteers assigned to a shift' : FractionOfPreferredVolunteersAssigned,
+    }
 
-    print('Shifts fully covered: %1.1f%%.' % ((1- FractionOfUnderStaffedShifts) * 100))
+def PrintSummaryStatistics(Schedule):
+    # This function prints out several statistics summarizing the quality of the shift assignment found by the optimizer
+    # Inputs:
+    #   Schedule = a ShiftSchedule object (see ExtractSchedule)
 
-    print('Volunteers assigned to a shift: %1.1f%%.' % (FractionOfVolunteersAssigned * 100))
+    # Calculate the statistics
+    Statistics = CalcSummaryStatistics(Schedule)
 
-    print('Preferred volunteers assigned to a shift: %1.1f%%.' % (FractionOfPreferredVolunteersAssigned * 100))
+    # Print the results
+    print('')
+    for Name in Statistics:
+        print('%s: %1.1f%%.' % (Name, Statistics[Name] * 100))
 
-def ExportVolunteerFocusedSchedule(solver, Assignment, Shifts):
-    # This function exports a shift-centric CSV of the shift assignments
+def ListShiftFocusedRows(Schedule):
+    # This function lists the rows of the shift-focused table of a schedule, lazily, so that a large schedule is never
+    # copied into a table
     # Inputs:
-    #   solver = the CP solver object, which has already solved the model.
-    #   Assignment = a dictionary mapping (volunteer, shift) tuples to binary assignment decision variables
-    #   Shifts = a dictionary of Shift objects
+    #   Schedule = a ShiftSchedule object (see ExtractSchedule)
+    # Outputs:
+    #   (Columns, Rows) = the column names, and an iterator over the rows: the shift, its volunteers' names, and a warning
+    #                     in the "Notes" column if it is under-staffed; empty cells are None
 
-    # Import the necessary libraries
-    import csv
-    import sys
+    # Calculate the maximum number of volunteers required in any given shift, which sets the number of columns
+    MaxVolunteersPerShift = max(s.RequiredVolunteers for s in Schedule.Shifts.values())
+    Columns = ['Shift'] + ['Volunteer %d' % v for v in range(1, MaxVolunteersPerShift + 1)] + ['Notes']
 
-    # Specify the name of the file to be exported
-    FileName = 'Volunteer-Focused Schedule.csv'
+    def Rows():
+        # This function yields the line of each shift
+        for s in Schedule.Shifts:
 
-    # Create the file
-    with open(FileName, mode='w') as f:
+            # List the first and last names of the volunteers assigned to this shift
+            Names = ['%s %s' % (v.FirstName, v.LastName) for v in Schedule.Rosters[s]]
+
+            # Check for under-staffing
+            if len(Names) < Schedule.Shifts[s].RequiredVolunteers:  # this is an under-staffed shift
+                Note = 'Warning: this shift is under-staffed.'
+            else:
+                Note = None
 
-        # Instantiate the csv writer
+            # Fill the remaining columns
+            yield [s] + Names + [None] * (len(Columns) - 2 - len(Names)) + [Note]
+
+    # Return the columns and the rows
+    return (Columns, Rows())
+
+def ListVolunteerFocusedRows(Schedule):
+    # This function lists the rows of the volunteer-focused table of a schedule, lazily
+    # Inputs:
+    #   Schedule = a ShiftSchedule object (see ExtractSchedule)
+    # Outputs:
+    #   (Columns, Rows) = the column names, and an iterator over the rows: each volunteer's first and last name, and their
+    #                     shift or "Unassigned" (a volunteer who takes several shifts has a row for each)
+    Columns = ['Volunteer', 'Assignment']
+    Rows = (
+        ['%s %s' % (v.FirstName, v.LastName), AssignedShift if AssignedShift != None else 'Unassigned']
+        for (v, AssignedShift) in Schedule.VolunteerAssignments
+    )
+    return (Columns, Rows)
+
+class FileSink():
+    # This class is the base of the sinks which write a table to a file (see ExportTable). The table is written to a
+    # temporary file next to the final one, which is only moved into place once it is complete, so that a crash or an
+    # error never leaves a truncated file behind, and readers always see either the old file or the new one.
+
+    def __init__(self, FileName):
+        self.FileName = FileName
+        self.TemporaryName = None
+
+    def OpenTemporaryFile(self, Mode):
+        # This function creates the temporary file
+        # Outputs:
+        #   f = the file object
+        import os
+        import tempfile
+        (Handle, self.TemporaryName) = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.FileName)), prefix='.' + os.path.basename(self.FileName), suffix='.tmp')
+        return os.fdopen(Handle, Mode)
+
+    def Commit(self):
+        # This function moves the complete temporary file into place
+        import os
+        os.replace(self.TemporaryName, self.FileName)
+        self.TemporaryName = None
+
+    def Close(self):
+        # This function completes the temporary file and moves it into place
+        self.Finish()
+        self.Commit()
+
+    def Abort(self):
+        # This function deletes the temporary file, leaving the previous file as it was (nothing is left to do once the
+        # file has been committed)
+        import os
+        if self.TemporaryName != None and os.path.exists(self.TemporaryName):
+            os.remove(self.TemporaryName)
+        self.TemporaryName = None
+
+class CSVSink(FileSink):
+    # This class writes a table to a csv file. Trailing empty cells are left out and the other empty cells are written as
+    # a space, which is the layout the schedules have always been published in.
+
+    def Open(self, Columns):
+        import csv
+        import sys
+        self.File = self.OpenTemporaryFile('w')
         if 'win' in sys.platform:  # Check for windows
-            Writer = csv.writer(f, delimiter=',', lineterminator = '\n')
+            self.Writer = csv.writer(self.File, delimiter=',', lineterminator='\n')
         else:
-            Writer = csv.writer(f, delimiter=',')
+            self.Writer = csv.writer(self.File, delimiter=',')
+        self.Writer.writerow(Columns)
+
+    def Write(self, Row):
+        if None in Row:
+            Length = len(Row)
+            while Length > 0 and Row[Length - 1] == None:
+                Length -= 1
+            Row = [' ' if Cell == None else Cell for Cell in Row[:Length]]
+        self.Writer.writerow(Row)
+
+    def Finish(self):
+        self.File.close()
+
+    def Abort(self):
+        self.File.close()
+        FileSink.Abort(self)
+
+class JSONLinesSink(FileSink):
+    # This class writes a table to a JSON lines file, with one object per row, keyed by the column names; empty cells are null
+
+    def Open(self, Columns):
+        self.Columns = Columns
+        self.File = self.OpenTemporaryFile('w')
+
+    def Write(self, Row):
+        import json
+        self.File.write(json.dumps(dict(zip(self.Columns, Row)), ensure_ascii=False) + '\n')
+
+    def Finish(self):
+        self.File.close()
+
+    def Abort(self):
+        self.File.close()
+        FileSink.Abort(self)
+
+class ParquetSink(FileSink):
+    # This class writes a table to a Parquet file, with a string column for each column of the table, in row groups of
+    # BatchSize rows, so that only one row group is held in memory at a time. It needs the optional pyarrow library.
+
+    def __init__(self, FileName, BatchSize=65536):
+        FileSink.__init__(self, FileName)
+        self.BatchSize = BatchSize
+
+        # Check for pyarrow up front, before any file is touched
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('Writing Parquet files needs the pyarrow library, which can be installed with "pip install pyarrow".') from None
+
+    def Open(self, Columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.Schema = pa.schema([(c, pa.string()) for c in Columns])
+        self.File = self.OpenTemporaryFile('wb')
+        self.Writer = pq.ParquetWriter(self.File, self.Schema)
+        self.Batch = []
+
+    def Write(self, Row):
+        self.Batch.append(Row)
+        if len(self.Batch) >= self.BatchSize:
+            self.Flush()
+
+    def Flush(self):
+        # This function writes the buffered rows as a row group
+        import pyarrow as pa
+        if len(self.Batch) > 0:
+            self.Writer.write_table(pa.Table.from_arrays([pa.array(list(Cells), pa.string()) for Cells in zip(*self.Batch)], schema=self.Schema))
+            self.Batch = []
+
+    def Finish(self):
+        self.Flush()
+        self.Writer.close()
+        self.File.close()
+
+    def Abort(self):
+        self.File.close()
+        FileSink.Abort(self)
+
+class ConsoleSink():
+    # This class prints a table the way the schedule is printed: the first cell of each row as a heading, followed by
+    # its other non-empty cells, indented, except those of the Skip columns. With Labels, each cell is preceded by the
+    # name of its column.
+
+    def __init__(self, Skip=('Notes',), Labels=False):
+        self.Skip = Skip
+        self.Labels = Labels
+
+    def Open(self, Columns):
+        self.Columns = Columns
+        self.Shown = [i for (i, c) in enumerate(Columns) if i > 0 and not c in self.Skip]
+
+    def Write(self, Row):
+        print(Row[0])
+        for i in self.Shown:
+            if Row[i] != None:
+                if self.Labels == True:
+                    print('\t%s: %s' % (self.Columns[i], Row[i]))
+                else:
+                    print('\t' + Row[i])
+
+    def Finish(self):
+        pass
+
+    def Commit(self):
+        pass
+
+    def Close(self):
+        pass
+
+    def Abort(self):
+        pass
+
+# Define the file extension and sink of each export format
+ExportFormats = {
+    'csv' : ('.csv', CSVSink),
+    'jsonl' : ('.jsonl', JSONLinesSink),
+    'parquet' : ('.parquet', ParquetSink),
+}
+
+def ExportTable(Table, Sinks):
+    # This function streams a table to several sinks at once, in a single pass over its rows
+    # Inputs:
+    #   Table = a (Columns, Rows) tuple, e.g. from ListShiftFocusedRows, whose rows may be produced lazily
+    #   Sinks = a list of sink objects (CSVSink, JSONLinesSink, ParquetSink, ConsoleSink, ...)
+    # The files are replaced together (see ExportTables).
+    ExportTables([(Table, Sinks)])
+
+def ExportTables(Tables):
+    # This function streams several tables, one after the other, each to its own sinks, and replaces all of their files
+    # together
+    # Inputs:
+    #   Tables = a list of (Table, Sinks) pairs, as for ExportTable
+    #
+    # Every file of every table is completed before any of them is moved into place, so an interruption while writing
+    # never leaves the new version of one table next to the old version of another. If anything fails before then, every
+    # sink is aborted, so the files being replaced are all left as they were; the sinks not yet moved into place are
+    # always aborted.
+
+    # Open the sinks of each table, and hand each of its rows to every one of them
+    Opened = []
+    try:
+        for ((Columns, Rows), Sinks) in Tables:
+            for Sink in Sinks:
+                Sink.Open(Columns)
+                Opened.append(Sink)
+            Writers = [Sink.Write for Sink in Sinks]
+            for Row in Rows:
+                for Write in Writers:
+                    Write(Row)
+
+        # Complete every file, then move them all into place
+        for Sink in Opened:
+            Sink.Finish()
+        for Sink in Opened:
+            Sink.Commit()
+
+    except BaseException:
+        for Sink in Opened:
+            Sink.Abort()
+        raise
+
+def ExportVolunteerFocusedSchedule(Schedule, FileName='Volunteer-Focused Schedule.csv'):
+    # This function exports a volunteer-centric CSV of the shift assignments
+    # Inputs:
+    #   Schedule = a ShiftSchedule object (see ExtractSchedule)
+    #   FileName = the name of the file to be exported
+    ExportTable(ListVolunteerFocusedRows(Schedule), [CSVSink(FileName)])
 
-        # Add the header line
-        ## Intialize the header line
-        HeaderLine = ['Volunteer', 'Assignment']
+def ExportShiftFocusedSchedule(Schedule, FileName='Shift-Focused Schedule.csv'):
+    # This function exports a shift-centric CSV of the shift assignments
+    # Inputs:
+    #   Schedule = a ShiftSchedule object (see ExtractSchedule)
+    #   FileName = the name of the file to be exported
+    ExportTable(ListShiftFocusedRows(Schedule), [CSVSink(FileName)])
 
-        ## Write the header line to the csv
-        Writer.writerow(HeaderLine)
+def ExportSchedules(Schedule, Directory='.', Formats=('csv',)):
+    # This function exports both the shift-focused and the volunteer-focused tables of the shift assignments
+    # Inputs:
+    #   Schedule = a ShiftSchedule object (see ExtractSchedule)
+    #   Directory = the directory the files are written to
+    #   Formats = the formats to write each table in (see ExportFormats), e.g. "Shift-Focused Schedule.csv" for csv
 
-        # Add the line for each volunteer
-        for v in IndividualVolunteers:
+    # Import the os library
+    import os
 
-            # Initialize the line with the volunteer's first and last name
-            Line = [ '%s %s' % (v.FirstName, v.LastName) ]
+    # Write each table to every format at once, replacing the files of both tables together
+    Tables = []
+    for (Name, Table) in [('Shift-Focused Schedule', ListShiftFocusedRows(Schedule)), ('Volunteer-Focused Schedule', ListVolunteerFocusedRows(Schedule))]:
+        Tables.append((Table, [ExportFormats[f][1](os.path.join(Directory, Name + ExportFormats[f][0])) for f in Formats]))
+    ExportTables(Tables)
 
-            # Initialize the flag indicating whether or not an assignment has been found
-            AssignmentFound = False
+def StreamSchedule(Schedule, Directory='.', Formats=('csv',)):
+    # This function exports an improving schedule found during the search, so that it can be used before the search ends
+    # Inputs:
+    #   Schedule = a ShiftSchedule object (see ExtractSchedule)
+    #   Directory = the directory the files are written to
+    #   Formats = the formats to write the schedule in (see ExportSchedules)
 
-            # Loop over each shift
-            for s in Shifts:
+    # Write the files
+    ExportSchedules(Schedule, Directory, Formats)
 
-                # Check if the volunteer was assigned to the current shift
-                if solver.Value(Assignment[(v,s)]) == 1:  # They were assigned to the current shfit
+    # Report the progress
+    print('Wrote an improving schedule with objective %d.' % Schedule.Objective, flush=True)
 
-                    # Print the shift's name
-                    Line.append( '%s' % s )
+class SensitivityResult():
+    # This class describes the marginal values and candidates found by AnalyzeSensitivity, as tables which can be
+    # printed or exported (see ExportTable)
 
-                    # Raise the flag indicating that an assignment has been found
-                    AssignmentFound = True
+    def __init__(self):
+        self.Shifts = ([], [])  # (Columns, Rows) of the marginal values of the under-staffed shifts and of the shifts worth enlarging, with None for empty cells
+        self.Candidates = ([], [])  # (Columns, Rows) of the ways to fill each under-staffed shift, best first
 
-            # Check if an assignment was found
-            if AssignmentFound == False:
+def AnalyzeSensitivity(Store, Shifts, Scalar=None, Weights=None, MaxCandidates=5, MaxMoves=5):
+    # This function finds, from a solved schedule and without solving again, how each under-staffed shift could be
+    # filled, and what one more place or one more volunteer on each shift would be worth
+    # Inputs:
+    #   Store = a solved AssignmentStore over the individual volunteers and the volunteer groups
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   Scalar = the objective scalar (see CalcObjectiveScalar); by default, it is calculated from Shifts
+    #   Weights = a dictionary of objective weights like ObjectiveWeights, which is used by default
+    #   MaxCandidates = the number of candidates of each kind listed for each under-staffed shift
+    #   MaxMoves = the largest number of volunteers moved by a chain
+    # Outputs:
+    #   Result = a SensitivityResult object
+    #
+    # The analysis runs on the residual graph of the schedule, whose nodes are the shifts: a volunteer on shift A who
+    # also ranked shift B (which has room for them) gives an arc from A to B, worth the change of the objective when
+    # they move. A chain starts with a volunteer who has no shift (or a spare one) taking one of theirs, continues along
+    # such arcs, and brings one more volunteer to the shift where it ends, so the best chain into each shift is a
+    # longest path, found by MaxMoves rounds of Bellman-Ford over all of the arcs at once. In an optimal schedule, no
+    # chain into an under-staffed shift gains anything (or the solver would have taken it), so the chains are ranked by
+    # how little of the objective they cost. One more place on a full shift is worth its best chain, which may also
+    # start by taking a volunteer off another shift without replacing them, and one more volunteer for an under-staffed shift is worth as much as any volunteer who ranks it first.
+    # A "preference change" asks an unassigned volunteer to add the shift to their preferences, where it is worth one
+    # point (two for a preferred volunteer). Volunteers who can take several shifts only start chains, and are not moved.
+
+    # Use the default weights and scalar
+    if Weights == None:
+        Weights = ObjectiveWeights
+    if Scalar == None:
+        Scalar = CalcObjectiveScalar(Shifts)
+
+    # Look up the value, unit and shift of each entry, and how many volunteers each shift has and requires
+    Values = CalcAssignmentValues(Store, Shifts, Scalar, Weights)
+    Units = Store.UnitOfEachEntry()
+    Lengths = np.diff(Store.Offsets)
+    ShiftNames = ListShiftNames(Shifts)
+    Required = ListRequiredVolunteers(Shifts)
+    Assigned = np.bincount(Store.ShiftIDs, weights=Store.Values, minlength=len(Required)).astype(np.int64)
+    Spare = Store.Headcounts * Store.MaxShifts - np.bincount(Units, weights=Store.Values, minlength=len(Store.Units)).astype(np.int64)
+
+    # Find the entries which can take one more volunteer: a group member on another shift, or an individual volunteer
+    # not yet on that shift and without a conflicting shift
+    HasRoom = Store.Values < Store.Headcounts[Units]
+    for Entries in ListConflictingEntries(Store, Shifts):
+        if Store.Values[list(Entries)].any():
+            HasRoom[list(Entries)] = False
+
+    # Start the chains: the best entry of a volunteer with a spare shift on each shift
+    Lowest = np.iinfo(np.int64).min // 4  # Marks the shifts no chain reaches
+    IsStart = HasRoom & (Spare[Units] > 0)
+    Gain = np.full(len(Required), Lowest, dtype=np.int64)
+    np.maximum.at(Gain, Store.ShiftIDs[IsStart], Values[IsStart])
+    StartEntry = np.full(len(Required), -1, dtype=np.int64)
+    IsBestStart = IsStart & (Values == Gain[Store.ShiftIDs])
+    StartEntry[Store.ShiftIDs[IsBestStart]] = np.flatnonzero(IsBestStart)
+
+    # Build the arcs: each assigned entry of a volunteer who takes one shift, to each of the unit's other entries with room
+    Occupied = np.flatnonzero((Store.Values > 0) & (Store.MaxShifts[Units] == 1))
+    Counts = Lengths[Units[Occupied]]
+    From = np.repeat(Occupied, Counts)
+    To = np.repeat(Store.Offsets[Units[Occupied]], Counts) + np.arange(Counts.sum()) - np.repeat(np.cumsum(Counts) - Counts, Counts)
+    IsArc = (To != From) & HasRoom[To]
+    (From, To) = (From[IsArc], To[IsArc])
+    (ArcFrom, ArcTo, ArcGain) = (Store.ShiftIDs[From], Store.ShiftIDs[To], Values[To] - Values[From])
+
+    def FindBestChains(Gain):
+        # This function finds the best chain into each shift from the given gains of the chains' first moves, one more
+        # move per round
+        # Outputs:
+        #   (Gain, Last) = the gain of the best chain into each shift, and its last arc (-1 for a chain of one move)
+        Last = np.full(len(Required), -1, dtype=np.int64)
+        for _ in range(MaxMoves - 1):
+            Reached = Gain[ArcFrom] > Lowest
+            Candidate = Gain[ArcFrom] + ArcGain
+            Best = Gain.copy()
+            np.maximum.at(Best, ArcTo[Reached], Candidate[Reached])
+            Improved = Best > Gain
+            if not Improved.any():
+                break
+            IsBest = Reached & Improved[ArcTo] & (Candidate == Best[ArcTo])
+            Last[ArcTo[IsBest]] = np.flatnonzero(IsBest)
+            Gain = Best
+        return (Gain, Last)
+
+    # Find the best chain into each shift which brings one more volunteer onto the schedule
+    (Gain, Last) = FindBestChains(Gain)
+
+    # Find the best chain into each shift which may also start by taking a volunteer off another shift, leaving a place
+    # open there, which is what one more place on a full shift allows
+    (PlaceGain, _) = FindBestChains(np.maximum(Gain, 0))
+
+    def NameUnit(k):
+        # This function names a volunteer or group
+        u = Store.Units[k]
+        if isinstance(u, VolunteerGroup):
+            return u.GroupName
+        return '%s %s' % (u.FirstName, u.LastName)
+
+    def TraceChain(ShiftID, Arc):
+        # This function lists the moves of the chain ending with an arc into a shift (or, for Arc = -1, the start on it)
+        # Outputs:
+        #   (Starter, Moves, Change) = the volunteer who starts the chain, the moves in order, and the objective change
+        (Moves, Change, Visited) = ([], 0, set())
+        while Arc != -1 and not ShiftID in Visited:
+            Visited.add(ShiftID)
+            Moves.append('%s: %s -> %s' % (NameUnit(Units[From[Arc]]), ShiftNames[ArcFrom[Arc]], ShiftNames[ShiftID]))
+            Change += int(ArcGain[Arc])
+            (ShiftID, Arc) = (int(ArcFrom[Arc]), int(Last[ArcFrom[Arc]]))
+        Start = int(StartEntry[ShiftID])
+        Starter = NameUnit(Units[Start])
+        Moves.append('%s: Unassigned -> %s' % (Starter, ShiftNames[ShiftID]))
+        return (Starter, '; '.join(reversed(Moves)), Change + int(Values[Start]))
+
+    # Value a new volunteer on each shift, as their first choice, and a shift added to a volunteer's preferences
+    def ValueNewcomers(Points, IsPreferred):
+        # This function calculates the value of a new entry on each shift, with the given points, by shift ID number
+        Newcomer = Volunteer()
+        (Newcomer.IsPreferredVolunteer, Newcomer.ShiftIDs, Newcomer.Points) = (IsPreferred, tuple(Shifts[s].ID_Number for s in Shifts), (Points,) * len(Shifts))
+        NewcomerValues = np.zeros(len(Required), dtype=np.int64)
+        NewcomerValues[list(Newcomer.ShiftIDs)] = CalcAssignmentValues(AssignmentStore([Newcomer]), Shifts, Scalar, Weights)
+        return NewcomerValues
+    NewVolunteer = ValueNewcomers(len(PreferenceColumns), False)
+    AddedPreference = {False : ValueNewcomers(1, False), True : ValueNewcomers(2, True)}
+
+    # List the unassigned individual volunteers who could add a shift to their preferences, preferred volunteers first
+    Unassigned = [k for k in np.flatnonzero((Spare == Store.Headcounts) & (Store.MaxShifts == 1)).tolist() if not isinstance(Store.Units[k], VolunteerGroup)]
+    Unassigned.sort(key=lambda k: Store.Units[k].IsPreferredVolunteer != True)
+
+    # Rank the last moves into each shift: the arcs from the shifts that chains reach, and the starts
+    Reached = Gain[ArcFrom] > Lowest
+    EndShifts = np.concatenate((ArcTo[Reached], Store.ShiftIDs[IsStart]))
+    EndArcs = np.concatenate((np.flatnonzero(Reached), np.full(IsStart.sum(), -1)))
+    EndStarts = np.concatenate((np.full(Reached.sum(), -1), np.flatnonzero(IsStart)))
+    EndGains = np.concatenate((Gain[ArcFrom[Reached]] + ArcGain[Reached], Values[IsStart]))
+    Order = np.lexsort((-EndGains, EndShifts))
+    Ends = np.split(Order, np.flatnonzero(np.diff(EndShifts[Order])) + 1)
+    EndsByShift = {int(EndShifts[e[0]]) : e.tolist() for e in Ends if len(e) > 0}
+
+    # Build the tables
+    Result = SensitivityResult()
+    ShiftColumns = ['Shift', 'Required', 'Assigned', 'Value of one more place', 'Cost to fill one more place', 'Value of one more volunteer']
+    CandidateColumns = ['Shift', 'Rank', 'Kind', 'Volunteer', 'Moves', 'Objective change']
+    (ShiftRows, CandidateRows) = ([], [])
+    for (ShiftID, s) in enumerate(ShiftNames):
+
+        # Value one more place on a full shift
+        if Assigned[ShiftID] >= Required[ShiftID]:
+            if PlaceGain[ShiftID] > 0:
+                ShiftRows.append([s, int(Required[ShiftID]), int(Assigned[ShiftID]), int(PlaceGain[ShiftID]), None, None])
+            continue
+
+        # Cost the chains which fill an under-staffed shift, each ending with a different move, keeping one chain per starting volunteer
+        (Rank, Starters) = (0, set())
+        for e in EndsByShift.get(ShiftID, [])[:MaxCandidates * 4]:
+            if EndArcs[e] != -1:
+                (Starter, Moves, Change) = TraceChain(int(ArcFrom[EndArcs[e]]), int(Last[ArcFrom[EndArcs[e]]]))
+                Moves += '; %s: %s -> %s' % (NameUnit(Units[From[EndArcs[e]]]), ShiftNames[ArcFrom[EndArcs[e]]], s)
+                Change += int(ArcGain[EndArcs[e]])
+            else:
+                (Starter, Moves, Change) = (NameUnit(Units[EndStarts[e]]), '%s: Unassigned -> %s' % (NameUnit(Units[EndStarts[e]]), s), int(Values[EndStarts[e]]))
+            if Starter in Starters or Rank >= MaxCandidates:
+                continue
+            Starters.add(Starter)
+            Rank += 1
+            CandidateRows.append([s, Rank, 'Chain', Starter, Moves, Change])
+
+        # List the unassigned volunteers who could add the shift to their preferences
+        Rank = 0
+        for k in Unassigned:
+            if Rank >= MaxCandidates:
+                break
+            if not ShiftID in Store.Units[k].ShiftIDs:
+                Rank += 1
+                CandidateRows.append([s, Rank, 'Preference change', NameUnit(k), '%s: Unassigned -> %s' % (NameUnit(k), s), int(AddedPreference[Store.Units[k].IsPreferredVolunteer == True][ShiftID])])
+
+        # Record the shift's marginal values
+        ShiftRows.append([s, int(Required[ShiftID]), int(Assigned[ShiftID]), 0, -int(Gain[ShiftID]) if Gain[ShiftID] > Lowest else None, int(NewVolunteer[ShiftID])])
+
+    # Return the tables
+    Result.Shifts = (ShiftColumns, ShiftRows)
+    Result.Candidates = (CandidateColumns, CandidateRows)
+    return Result
+
+def ValidateInputs(IndividualVolunteers, VolunteerGroups, Shifts):
+    # This function checks the sign-up data for problems a coordinator should fix before scheduling
+    # Inputs:
+    #   IndividualVolunteers = a list of volunteer objects
+    #   VolunteerGroups = a list of VolunteerGroup objects
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    # Outputs:
+    #   Problems = a list of messages describing each problem
 
-                # Print a message indicating that no assignement was found
-                Line.append( 'Unassigned' )
+    # Initialize the list of problems
+    Problems = []
 
-            # Write out the line for the current volunteer
-            Writer.writerow(Line)
+    # Initialize the set of names seen so far
+    Names = set()
 
-def ExportShiftFocusedSchedule(solver, Assignment, Shifts):
-    # This function exports a shift-centric CSV of the shift assignments
-    # Inputs:
-    #   solver = the CP solver object, which has already solved the model.
-    #   Assignment = a dictionary mapping (volunteer, shift) tuples to binary assignment decision variables
-    #   Shifts = a dictionary of Shift objects
+    # Loop over the individual volunteers
+    for v in IndividualVolunteers:
 
-    # Import the necessary libraries
-    import csv
-    import sys
+        # Check for names used more than once, which cannot be told apart in the schedules
+        Name = '%s %s' % (v.FirstName, v.LastName)
+        if Name in Names:
+            Problems.append('%s signed up more than once.' % Name)
+        Names.add(Name)
 
-    # Specify the name of the file to be exported
-    FileName = 'Shift-Focused Schedule.csv'
+        # Check for misspelled shift names
+        for s in v.PreferredShifts:
+            if isinstance(s, str) and s.strip() != '' and not s in Shifts:
+                Problems.append('%s ranked an unknown shift: "%s".' % (Name, s))
 
-    # Create the file
-    with open(FileName, mode='w') as f:
+        # Check for volunteers who cannot be assigned
+        if len(v.ShiftIDs) == 0:
+            Problems.append('%s did not rank any valid shift.' % Name)
 
-        # Instantiate the csv writer
-        if 'win' in sys.platform:  # Check for windows
-            Writer = csv.writer(f, delimiter=',', lineterminator = '\n')
+    # Loop over the volunteer groups
+    for g in VolunteerGroups:
+
+        # Check for misspelled shift names
+        if not g.AssignedShift in Shifts:
+            Problems.append('%s signed up for an unknown shift: "%s".' % (g.GroupName, g.AssignedShift))
+
+    # Check whether the shift requirements can be scaled exactly in the objective
+    Message = DescribeObjectiveRounding(Shifts)
+    if Message != None:
+        Problems.append(Message)
+
+    # Return the list of problems
+    return Problems
+
+class ScheduleCache():
+    # This class stores solved schedules on disk, keyed by a hash of everything that determines the solution
+    # (see HashInputs), so that re-running on unchanged inputs does not need to solve again.
+    # The least recently used entries are evicted once the cache grows beyond its size limit.
+
+    Version = 3  # Part of every key, so that entries written in an older format are never read back
+
+    def __init__(self, Directory='.schedule_cache', MaxBytes=100 * 2**20):
+        self.Directory = Directory
+        self.MaxBytes = MaxBytes
+
+    def EntryPath(self, Key):
+        # This function returns the name of the file which holds the entry with the given key
+        import os
+        return os.path.join(self.Directory, '%s.npz' % Key)
+
+    def Load(self, Key):
+        # This function looks up a solved schedule
+        # Outputs:
+        #   Entry = a (Values, Objective, Status) tuple, or None if the key is not in the cache
+
+        # Import the os library
+        import os
+
+        # Check if the entry exists
+        if not os.path.exists(self.EntryPath(Key)):
+            return None
+
+        # Read the entry, treating an unreadable file as a miss
+        try:
+            with np.load(self.EntryPath(Key)) as Data:
+                Entry = (Data['Values'], Data['Objective'].item(), str(Data['Status']))
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # Mark the entry as recently used, unless another process has just evicted it
+        try:
+            os.utime(self.EntryPath(Key))
+        except FileNotFoundError:
+            pass
+
+        # Return the entry
+        return Entry
+
+    def Save(self, Key, Store):
+        # This function stores the solution of a solved assignment store, then evicts old entries if the cache is too big
+
+        # Import the os and tempfile libraries
+        import os
+        import tempfile
+
+        # Create the cache directory
+        os.makedirs(self.Directory, exist_ok=True)
+
+        # Write the entry to a temporary file, then move it into place, so that readers never see a partial entry
+        (Handle, TemporaryName) = tempfile.mkstemp(dir=self.Directory, suffix='.tmp')
+        with os.fdopen(Handle, 'wb') as f:
+            np.savez(f, Values=Store.Values, Objective=np.array(Store.Objective), Status=np.array(Store.Status))
+        os.replace(TemporaryName, self.EntryPath(Key))
+
+        # Evict the least recently used entries
+        self.Evict()
+
+    def Evict(self):
+        # This function deletes the least recently used entries until the cache fits within its size limit
+
+        # Import the os library
+        import os
+
+        # List the entries, most recently used first, skipping those which another process evicts in the meantime
+        Entries = []
+        for Name in os.listdir(self.Directory):
+            if Name.endswith('.npz'):
+                try:
+                    Status = os.stat(os.path.join(self.Directory, Name))
+                except FileNotFoundError:
+                    continue
+                Entries.append((Status.st_mtime, Status.st_size, Name))
+        Entries.sort(reverse=True)
+
+        # Keep the entries which fit, and delete the rest, unless another process already has
+        TotalBytes = 0
+        for (_, Size, Name) in Entries:
+            TotalBytes += Size
+            if TotalBytes > self.MaxBytes:
+                try:
+                    os.remove(os.path.join(self.Directory, Name))
+                except FileNotFoundError:
+                    pass
+
+def HashInputs(IndividualVolunteers, VolunteerGroups, Shifts, Settings):
+    # This function hashes everything that determines the solution of a problem, in a normalized form
+    # Inputs:
+    #   IndividualVolunteers = a list of volunteer objects, whose shift preference points have been calculated
+    #   VolunteerGroups = a list of VolunteerGroup objects, whose shift preference points have been calculated
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   Settings = a dictionary of the objective weights and solver settings, which must be JSON serializable
+    # Outputs:
+    #   Key = a hexadecimal string
+    #
+    # The volunteers are hashed through their valid preferences, so blank cells, misspellings and repeated preferences
+    # do not change the key, but reordering the sign-up sheet does (since it can change which volunteer gets a shift).
+
+    # Import the hashlib and json libraries
+    import hashlib
+    import json
+
+    # Instantiate the hash
+    Hash = hashlib.sha256()
+
+    # Hash the cache format and the settings
+    Hash.update(json.dumps([ScheduleCache.Version, Settings], sort_keys=True).encode())
+
+    # Hash the shift table, and the shifts which conflict
+    Hash.update(json.dumps([(s, Shifts[s].ID_Number, int(Shifts[s].RequiredVolunteers)) for s in Shifts]).encode())
+    Hash.update(json.dumps(ListShiftConflicts(Shifts)).encode())
+
+    # Hash the names of the volunteers and groups, which identify them in the schedules
+    Names = ['%s %s' % (v.FirstName, v.LastName) for v in IndividualVolunteers] + ['%s' % g.GroupName for g in VolunteerGroups]
+    Hash.update(json.dumps(Names).encode())
+
+    # Hash the preferred volunteer flags
+    Hash.update(bytes(v.IsPreferredVolunteer == True for v in IndividualVolunteers))
+
+    # Hash the preferences, group sizes and previous assignments, in the flat arrays the model is built from
+    Store = AssignmentStore(list(IndividualVolunteers) + list(VolunteerGroups))
+    for Array in [Store.Offsets, Store.Headcounts, Store.MaxShifts, Store.ShiftIDs, Store.Points, Store.Previous]:
+        Hash.update(Array.tobytes())
+
+    # Return the key
+    return Hash.hexdigest()
+
+class Scheduler():
+    # This class runs the scheduling pipeline one step at a time, with explicit inputs and outputs, so that it can be
+    # embedded in other programs and run repeatedly. A typical run is:
+    #   s = Scheduler()
+    #   s.Load()
+    #   s.Solve()
+    #   s.Export()
+
+    def __init__(self, Shifts=None):
+        if Shifts == None:
+            Shifts = BuildShiftDictionary()
+        self.Shifts = Shifts
+        self.IndividualVolunteers = []
+        self.VolunteerGroups = []
+        self.Backend = 'cpsat'  # 'cpsat' or 'flow' (see Solve)
+        self.ReduceSymmetry = True
+        self.Decompose = True
+        self.Processes = None
+        self.Weights = dict(ObjectiveWeights)
+        self.Options = SolverOptions()
+        self.Cache = None  # A ScheduleCache object, or None to always solve
+        self.Formats = ['csv']  # The formats the schedules are exported in (see ExportSchedules)
+        self.CacheHit = False  # Whether the last solution was read from the cache
+        self.Store = None  # The solution, once solved
+        self.Schedule = None  # The schedule, once solved
+        self.Report = None  # A RunReport object recording the time taken by each step, or None
+
+    def Stage(self, Name):
+        # This function returns a context manager which records a stage of the run in the report, if there is one
+
+        # Import the contextlib library
+        import contextlib
+
+        # Return the context manager
+        if self.Report != None:
+            return self.Report.Stage(Name)
         else:
-            Writer = csv.writer(f, delimiter=',')
+            return contextlib.nullcontext()
+
+    def Load(self, IndividualCSV='Individual Preferences.csv', GroupCSV='Group Volunteers.csv'):
+        # This function reads in the volunteers and groups, and calculates their shift preference points
+
+        # Read in the individual volunteer data, calculating the number of preference points each volunteer associates with each shift
+        with self.Stage('Ingestion'):
+            self.IndividualVolunteers = ReadInIndividualVolunteerData(self.Shifts, IndividualCSV)
+
+            # Read in the volunteer group data
+            self.VolunteerGroups = ReadInGroupVolunteerData(GroupCSV)
+
+            # Cap the size of each volunteer group at the number of volunteers required by its shift
+            CapVolunteerGroups(self.VolunteerGroups, self.Shifts)
+
+            # Calculate the number of preference points each group associates with each shift
+            for g in self.VolunteerGroups:
+                g.CalculateShiftPreferencePoints(self.Shifts)
+
+    def LoadPreviousSchedule(self, CSV_Name):
+        # This function matches the volunteers against a previously published schedule (see ApplyPreviousSchedule)
+        # Outputs:
+        #   Delta = a dictionary counting the unchanged, added, removed and changed volunteers
+        with self.Stage('Previous schedule'):
+            return ApplyPreviousSchedule(self.IndividualVolunteers, self.VolunteerGroups, ReadInPreviousSchedule(CSV_Name), self.Shifts)
+
+    def Validate(self):
+        # This function checks the loaded sign-up data (see ValidateInputs)
+        # Outputs:
+        #   Problems = a list of messages describing each problem
+        return ValidateInputs(self.IndividualVolunteers, self.VolunteerGroups, self.Shifts)
+
+    def Solve(self, OnSolution=None):
+        # This function finds the optimal shift assignment of the loaded volunteers and groups
+        # Inputs:
+        #   OnSolution = a function called with a ShiftSchedule each time an improving schedule is found
+        # Outputs:
+        #   Schedule = a ShiftSchedule object (see ExtractSchedule)
+
+        # Record the settings of the run
+        if self.Report != None:
+            self.Report.Settings = self.Settings()
+
+        # Look up the solution in the cache
+        self.CacheHit = False
+        if self.Cache != None:
+            with self.Stage('Cache lookup'):
+                Key = HashInputs(self.IndividualVolunteers, self.VolunteerGroups, self.Shifts, self.Settings())
+                Entry = self.Cache.Load(Key)
+            Store = AssignmentStore(list(self.IndividualVolunteers) + list(self.VolunteerGroups))
+            if Entry != None and len(Entry[0]) == len(Store.Values):  # it's there
+
+                # Use the stored solution
+                (Store.Values, Store.Objective, Store.Status) = Entry
+                self.Store = Store
+                with self.Stage('Extraction'):
+                    self.Schedule = ExtractSchedule(self.Store, self.Shifts)
+                self.CacheHit = True
+                if self.Report != None:
+                    self.Report.CacheHit = True
+                return self.Schedule
+
+        # Wrap the function, so that it receives schedules instead of assignment stores
+        if OnSolution != None:
+            OnStore = lambda Store: OnSolution(ExtractSchedule(Store, self.Shifts))
+        else:
+            OnStore = None
+
+        # Find the optimal shift assignment
+        with self.Stage('Solve'):
+            self.Store = Solve(
+                self.IndividualVolunteers,
+                self.Shifts,
+                self.VolunteerGroups,
+                Backend=self.Backend,
+                ReduceSymmetry=self.ReduceSymmetry,
+                Decompose=self.Decompose,
+                Processes=self.Processes,
+                Weights=self.Weights,
+                Options=self.Options,
+                OnSolution=OnStore,
+            )
+        if self.Report != None:
+            self.Report.Solves = self.Store.Statistics
+
+        # Store the solution in the cache, unless the solver was stopped early
+        if self.Cache != None and self.Store.Status == 'OPTIMAL':
+            self.Cache.Save(Key, self.Store)
+
+        # Read the solution, once, into a schedule for reporting
+        with self.Stage('Extraction'):
+            self.Schedule = ExtractSchedule(self.Store, self.Shifts)
+
+        # Return the schedule
+        return self.Schedule
+
+    def Preview(self, TimeLimit=1.0):
+        # This function quickly finds a good schedule of the loaded volunteers and groups without a solver, together with
+        # a bound on how far it is from optimal (see PreviewAssignments)
+        # Inputs:
+        #   TimeLimit = the number of seconds to spend, roughly
+        # Outputs:
+        #   Schedule = a ShiftSchedule object (see ExtractSchedule)
+
+        # Record the settings of the run
+        if self.Report != None:
+            self.Report.Settings = self.Settings()
+
+        # Find the schedule, over the individual volunteers (collapsing them into classes would take longer than it saves)
+        with self.Stage('Preview'):
+            Store = AssignmentStore(list(self.IndividualVolunteers) + list(self.VolunteerGroups))
+            self.Store = PreviewAssignments(Store, self.Shifts, CalcObjectiveScalar(self.Shifts), self.Weights, TimeLimit)
+        if self.Report != None:
+            self.Report.Solves = self.Store.Statistics
+
+        # Read the solution into a schedule for reporting
+        with self.Stage('Extraction'):
+            self.Schedule = ExtractSchedule(self.Store, self.Shifts)
+
+        # Return the schedule
+        return self.Schedule
+
+    def Sweep(self, WeightSets):
+        # This function solves the loaded problem for several sets of objective weights (see SweepWeights)
+        # Outputs:
+        #   Schedules = a list of ShiftSchedule objects, one per weight set
+        Stores = SweepWeights(self.IndividualVolunteers, self.Shifts, self.VolunteerGroups, WeightSets, self.Backend, self.ReduceSymmetry, self.Decompose, self.Processes, self.Options)
+        return [ExtractSchedule(Store, self.Shifts) for Store in Stores]
+
+    def Settings(self):
+        # This function lists the settings which determine the solution (the number of processes does not)
+        # Outputs:
+        #   Settings = a JSON serializable dictionary
+        return {
+            'Backend' : self.Backend,
+            'ReduceSymmetry' : self.ReduceSymmetry,
+            'Decompose' : self.Decompose,
+            'Weights' : self.Weights,
+            'MaxTime' : self.Options.MaxTime,
+            'Workers' : self.Options.Workers,
+            'RelativeGap' : self.Options.RelativeGap,
+            'Seed' : self.Options.Seed,
+            'Presolve' : self.Options.Presolve,
+        }
+
+    def Print(self):
+        # This function prints out the schedule and its summary statistics
+        with self.Stage('Printing'):
+            PrintShiftAssignments(self.Schedule)
+            PrintSummaryStatistics(self.Schedule)
+
+    def Export(self, Directory='.'):
+        # This function writes the schedule to the two CSV files, and the run report if there is one
+        with self.Stage('Export'):
+            ExportSchedules(self.Schedule, Directory, self.Formats)
+        if self.Report != None:
+            self.Report.Save(Directory)
+
+    def Analyze(self, MaxCandidates=5):
+        # This function finds how each under-staffed shift of the solved schedule could be filled, and what one more
+        # place or volunteer on each shift would be worth, without solving again (see AnalyzeSensitivity)
+        # Outputs:
+        #   Result = a SensitivityResult object
+        with self.Stage('Sensitivity analysis'):
+            return AnalyzeSensitivity(self.Store, self.Shifts, Weights=self.Weights, MaxCandidates=MaxCandidates)
+
+    def ExportSnapshot(self, FileName):
+        # This function writes the loaded problem, without any names, to a snapshot file (see SaveModelSnapshot)
+        with self.Stage('Snapshot'):
+            SaveModelSnapshot(FileName, self.IndividualVolunteers, self.VolunteerGroups, self.Shifts, self.Weights)
+
+class OnlineScheduler():
+    # This class keeps the schedule of a Scheduler up to date as new sign-ups arrive one at a time.
+    # Each newcomer is placed at once by a short augmenting path: they take one of their shifts, whose least valuable
+    # occupant moves to another of their own shifts, and so on, until a shift with a free place is reached or the last
+    # occupant is left unassigned, whichever gains the most (see FindAugmentingPath). This only looks at a few shifts
+    # and their occupants, so it takes about the same time however large the pool is. It does not reconsider the
+    # volunteers left unassigned, so the schedule drifts away from optimal, and it is re-optimized from scratch every
+    # so often (see Drift). Volunteers who can take several shifts only take free places, and keep them until the next
+    # re-optimization.
+
+    def __init__(self, s, MaxExpansions=32, PricingTime=0.25):
+        self.Scheduler = s  # A Scheduler object, whose volunteers and groups have been loaded
+        self.MaxExpansions = MaxExpansions  # The number of shifts each augmenting path search may look at
+        self.PricingTime = PricingTime  # The number of seconds spent pricing the shifts after each re-optimization
+        self.Scalar = CalcObjectiveScalar(s.Shifts)
+        self.Required = ListRequiredVolunteers(s.Shifts)
+        self.ShiftNames = ListShiftNames(s.Shifts)
+        self.Places = []  # The number of open places of each shift (by ID number)
+        self.Assigned = []  # The shift ID number of each individual volunteer, or -1 if unassigned
+        self.Occupants = []  # The set of individual volunteers (by position) assigned to each shift
+        self.Options = []  # A dictionary of the objective value of each shift of each individual volunteer
+        self.GroupValues = None  # The solution values of the entries of the groups, which are only moved by re-optimization
+        self.Pinned = {}  # The solution values of the entries of each individual volunteer (by position) who can take
+                          # several shifts, who are also only moved by re-optimization
+        self.Objective = 0  # The objective value of the current schedule
+        self.Bound = 0  # An upper bound on the optimal objective value (see Drift)
+        self.Prices = []  # The price of each shift (by ID number) which proves the bound (see CalcLagrangianBound)
+        self.Added = 0  # The number of sign-ups placed since the last re-optimization
+        self.LastReoptimized = 0  # The time of the last re-optimization
+
+    def Reoptimize(self):
+        # This function solves the whole problem again, and starts placing newcomers from the new schedule
+
+        # Solve the problem
+        s = self.Scheduler
+        s.Solve()
+
+        # Look up the objective value of every entry, and the shift of every individual volunteer
+        Values = CalcAssignmentValues(s.Store, s.Shifts, self.Scalar, s.Weights)
+        Offsets = s.Store.Offsets.tolist()
+        ShiftIDs = s.Store.ShiftIDs.tolist()
+        Solution = s.Store.Values.tolist()
+        Values = Values.tolist()
+        self.Options = []
+        self.Assigned = []
+        self.Pinned = {}
+        for k in range(len(s.IndividualVolunteers)):
+            Entries = range(Offsets[k], Offsets[k + 1])
+            if s.IndividualVolunteers[k].MaxShifts > 1:
+                self.Options.append({})
+                self.Assigned.append(-1)
+                self.Pinned[k] = Solution[Offsets[k]:Offsets[k + 1]]
+                continue
+            self.Options.append(dict((ShiftIDs[e], Values[e]) for e in Entries))
+            self.Assigned.append(next((ShiftIDs[e] for e in Entries if Solution[e] > 0), -1))
+        self.GroupValues = s.Store.Values[Offsets[len(s.IndividualVolunteers)]:]
+
+        # Fill in the occupants and the open places of each shift
+        self.Places = (self.Required - np.bincount(s.Store.ShiftIDs, weights=s.Store.Values, minlength=len(s.Shifts)).astype(np.int64)).tolist()
+        self.Occupants = [set() for _ in self.Places]
+        for (k, ShiftID) in enumerate(self.Assigned):
+            if ShiftID >= 0:
+                self.Occupants[ShiftID].add(k)
+
+        # Price the shifts, which bounds the optimal objective value
+        self.Objective = int(s.Store.Objective)
+        (Bound, Prices, _) = CalcLagrangianBound(s.Store, np.array(Values), np.diff(s.Store.Offsets) > 0, self.Required, self.Objective, time.perf_counter() + self.PricingTime)
+        self.Bound = max(Bound, self.Objective)
+        self.Prices = Prices.tolist()
+
+        # Start measuring the drift from the new schedule
+        self.Added = 0
+        self.LastReoptimized = time.time()
+
+    def Insert(self, v):
+        # This function adds a new volunteer, and places them in the schedule
+        # Inputs:
+        #   v = a volunteer object, with its shift preference points calculated
+        # Outputs:
+        #   (ShiftID, Moved, Gain) = the shift the volunteer was placed on (-1 if none), the number of other volunteers
+        #                            moved or unassigned to make room, and the increase of the objective
+
+        # Add the volunteer, and calculate the value of each of their shifts
+        s = self.Scheduler
+        s.IndividualVolunteers.append(v)
+        Store = AssignmentStore([v])
+        Values = CalcAssignmentValues(Store, s.Shifts, self.Scalar, s.Weights, self.Required)
+        Options = dict(zip(Store.ShiftIDs.tolist(), Values.tolist()))
+        self.Assigned.append(-1)
+        self.Added += 1
+
+        # A volunteer who can take several shifts takes the free places of their best shifts which do not conflict
+        if v.MaxShifts > 1:
+            self.Options.append({})
+            self.Bound += sum(sorted([max(Value - self.Prices[ShiftID], 0) for (ShiftID, Value) in Options.items()], reverse=True)[:v.MaxShifts])
+            Taken = AssignGreedily(Store, Values, np.argsort(-Values, kind='stable'), np.ones(1, dtype=bool), np.array(self.Places), Conflicts=ListConflictingEntries(Store, s.Shifts))
+            for ShiftID in Store.ShiftIDs[Taken > 0].tolist():
+                self.Places[ShiftID] -= 1
+            self.Pinned[len(self.Assigned) - 1] = Taken.tolist()
+            Gain = int((Taken * Values).sum())
+            self.Objective += Gain
+            return (int(Store.ShiftIDs[Taken > 0][0]) if Taken.any() else -1, 0, Gain)
+        self.Options.append(Options)
+
+        # Raise the bound by the volunteer's best value after the prices, which is their term of the bound
+        self.Bound += max([0] + [Value - self.Prices[ShiftID] for (ShiftID, Value) in Options.items()])
+
+        # Find the best way to place the volunteer, if any
+        (Gain, Path, Dropped) = self.FindAugmentingPath(len(self.Assigned) - 1)
+        if Path == None:
+            return (-1, 0, 0)
+
+        # Move the volunteers along the path, starting with the last one so that each shift stays within its places
+        if Dropped != -1:
+            self.Move(Dropped, -1)
+        for (k, ShiftID) in reversed(Path):
+            self.Move(k, ShiftID)
+        self.Objective += Gain
+
+        # Return the placement
+        return (self.Assigned[-1], len(Path) - 1 + (Dropped != -1), Gain)
+
+    def Move(self, k, ShiftID):
+        # This function moves an individual volunteer to a shift (or, for ShiftID = -1, off their shift)
+
+        # Leave the current shift
+        Current = self.Assigned[k]
+        if Current >= 0:
+            self.Occupants[Current].discard(k)
+            self.Places[Current] += 1
+
+        # Join the new shift
+        self.Assigned[k] = ShiftID
+        if ShiftID >= 0:
+            self.Occupants[ShiftID].add(k)
+            self.Places[ShiftID] -= 1
+
+    def FindAugmentingPath(self, k):
+        # This function finds the best way to place an unassigned individual volunteer in the schedule
+        # Inputs:
+        #   k = the position of the volunteer
+        # Outputs:
+        #   (Gain, Path, Dropped) = the increase of the objective; the list of (volunteer, new shift) moves, starting with
+        #                           the volunteer being placed, or None if placing them gains nothing; and the volunteer
+        #                           left unassigned at the end of the path, or -1 if the path ends at a free place
+        #
+        # The search is best first: each state is a shift which the last volunteer of a path moves to, with the objective
+        # lost so far (the values of the moves, negated). A shift with a free place ends the path; otherwise, each of its
+        # occupants can be left unassigned, which ends the path, or moved to another of their shifts, which continues it.
+        # Each shift is looked at once, and at most MaxExpansions shifts are looked at.
+
+        # Import the heap queue library
+        import heapq
+
+        # Start from each of the volunteer's shifts
+        Heap = [(-Value, ShiftID, ((k, ShiftID),)) for (ShiftID, Value) in self.Options[k].items() if Value > 0]
+        heapq.heapify(Heap)
+        (BestGain, BestPath, BestDropped) = (0, None, -1)
+        Visited = set()
+
+        # Search
+        while len(Heap) > 0 and len(Visited) < self.MaxExpansions:
+
+            # Look at the shift with the smallest loss so far
+            (Loss, ShiftID, Path) = heapq.heappop(Heap)
+            if ShiftID in Visited:
+                continue
+            Visited.add(ShiftID)
+
+            # End the path at a free place
+            if self.Places[ShiftID] > 0:
+                if -Loss > BestGain:
+                    (BestGain, BestPath, BestDropped) = (-Loss, Path, -1)
+                continue
+
+            # Otherwise, make room by moving one of the occupants
+            for Occupant in self.Occupants[ShiftID]:
+                Value = self.Options[Occupant][ShiftID]
+
+                # Leave the occupant unassigned
+                if -(Loss + Value) > BestGain:
+                    (BestGain, BestPath, BestDropped) = (-(Loss + Value), Path, Occupant)
+
+                # Move the occupant to another of their shifts
+                for (NextShiftID, NextValue) in self.Options[Occupant].items():
+                    if not NextShiftID in Visited and NextValue > 0:
+                        heapq.heappush(Heap, (Loss + Value - NextValue, NextShiftID, Path + ((Occupant, NextShiftID),)))
+
+        # Return the best path
+        return (BestGain, BestPath, BestDropped)
+
+    def Reprice(self):
+        # This function tightens the bound by pricing the shifts again, starting from the current prices, over every
+        # volunteer and group; it takes up to PricingTime seconds, so it is called once per batch of sign-ups
+
+        # Price the shifts
+        s = self.Scheduler
+        Store = AssignmentStore(list(s.IndividualVolunteers) + list(s.VolunteerGroups))
+        Values = CalcAssignmentValues(Store, s.Shifts, self.Scalar, s.Weights)
+        (Bound, Prices, _) = CalcLagrangianBound(Store, Values, np.diff(Store.Offsets) > 0, self.Required, self.Objective, time.perf_counter() + self.PricingTime, np.array(self.Prices))
+
+        # Keep the better bound
+        if Bound < self.Bound:
+            (self.Bound, self.Prices) = (max(Bound, self.Objective), Prices.tolist())
+
+    def Drift(self):
+        # This function measures how far the schedule may have drifted from optimal since the last re-optimization
+        # Outputs:
+        #   Drift = (Bound - Objective) / Bound, an upper bound on the fraction of the optimal objective value lost
+        # The bound is the one proven by the shift prices at the last re-optimization (see CalcLagrangianBound), plus
+        # each newcomer's term of it: their best value after the prices.
+        return (self.Bound - self.Objective) / max(self.Bound, 1)
+
+    def Assignments(self):
+        # This function writes the current schedule into an assignment store
+        # Outputs:
+        #   Store = a solved AssignmentStore over the individual volunteers followed by the groups
+
+        # Write the assignments into a store over the volunteers and groups
+        s = self.Scheduler
+        Store = AssignmentStore(list(s.IndividualVolunteers) + list(s.VolunteerGroups))
+        Assigned = np.array(self.Assigned, dtype=np.int64)
+        Entries = np.arange(Store.Offsets[len(Assigned)])
+        IsAssigned = Store.ShiftIDs[Entries] == Assigned[Store.UnitOfEachEntry()[Entries]]
+        Store.Values[Entries[IsAssigned]] = 1
+        for (k, Values) in self.Pinned.items():
+            Store.Values[Store.Offsets[k]:Store.Offsets[k + 1]] = Values
+        Store.Values[len(Entries):] = self.GroupValues
+        Store.Objective = self.Objective
+        Store.Status = 'FEASIBLE' if self.Added > 0 else s.Store.Status
+
+        # Return the store
+        return Store
+
+    def Schedule(self):
+        # This function reads the current schedule
+        # Outputs:
+        #   Schedule = a ShiftSchedule object (see ExtractSchedule)
+        return ExtractSchedule(self.Assignments(), self.Scheduler.Shifts)
+
+class SignUpFeed():
+    # This class reads the sign-ups appended to a file since it was last read: either a csv file in the format of
+    # "Individual Preferences.csv", or a JSON lines file with one object per sign-up, with the same keys as the csv columns.
+    # A row is only read once its line is complete.
+
+    def __init__(self, FileName, Skip=0):
+        self.FileName = FileName
+        self.Offset = 0  # The number of bytes read so far
+        self.Header = None  # The column names of a csv file, once read
+        self.Skip = Skip  # The number of sign-ups at the start of the file to skip, e.g. because they were loaded already
+        self.IsJSON = FileName.lower().endswith(('.jsonl', '.json'))
+
+    def Read(self):
+        # This function reads the new sign-ups
+        # Outputs:
+        #   Rows = a list of dictionaries, one per new sign-up, indexed by column name
+
+        # Import the csv and json libraries
+        import csv
+        import json
+
+        # Read the new complete lines
+        with open(self.FileName, 'rb') as f:
+            f.seek(self.Offset)
+            Data = f.read()
+        Data = Data[:Data.rfind(b'\n') + 1]
+        self.Offset += len(Data)
+        Lines = Data.decode('utf-8-sig').splitlines()
+
+        # Parse the lines
+        if self.IsJSON == True:
+            Rows = [json.loads(Line) for Line in Lines if Line.strip() != '']
+        else:
+            if self.Header == None and len(Lines) > 0:
+                self.Header = next(csv.reader(Lines[:1]))
+                Lines = Lines[1:]
+            Rows = [dict(zip(self.Header, Row)) for Row in csv.reader(Lines) if len(Row) > 0]
 
-        # Construct the header line
-        ## Intialize the header line
-        HeaderLine = ['Shift']
+        # Skip the sign-ups which were read already
+        Skipped = min(self.Skip, len(Rows))
+        self.Skip -= Skipped
 
-        ## Calculate the maximum number of volunteers required in any given shift
-        MaxVolunteersPerShift = max( [s.RequiredVolunteers for s in Shifts.values()] )
- 
-        ## Add a column for each possible volunteer
-        for v in range(1, MaxVolunteersPerShift + 1):
+        # Return the new sign-ups
+        return Rows[Skipped:]
 
-            # Add the header for the vth volunteer
-            HeaderLine.append( 'Volunteer %s' % str(v) )
+def CreateVolunteer(Row, Shifts, ID_Number):
+    # This function creates a volunteer from a sign-up (see SignUpFeed)
+    # Inputs:
+    #   Row = a dictionary indexed by the columns of "Individual Preferences.csv"
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   ID_Number = the ID number of the volunteer
+    # Outputs:
+    #   v = a volunteer object, with its shift preference points calculated
 
-        ## Add a column for notes
-        HeaderLine.append( 'Notes' )
+    # Instantiate a new volunteer
+    v = Volunteer()
 
-        ## Write the header line to the csv
-        Writer.writerow(HeaderLine)
+    # Populate the volunteer's properties, reading the preferred volunteer flag like pandas does ("TRUE", "True", ...)
+    v.ID_Number = ID_Number
+    v.FirstName = Row.get('First Name', '')
+    v.LastName = Row.get('Last Name', '')
+    Flag = Row.get('Preferred Applicants', '')
+    v.IsPreferredVolunteer = Flag == True or str(Flag).strip().lower() == 'true'
 
-        # Add the line for each shift
-        for s in Shifts:
+    # Read the number of shifts the volunteer can take (1 if blank or invalid)
+    try:
+        v.MaxShifts = max(1, int(float(Row.get('Max Shifts') or 1)))
+    except (ValueError, OverflowError):
+        v.MaxShifts = 1
 
-            # Initialize the line with the name of the shift
-            Line = [s]
+    # Read the volunteer's preferences
+    v.PreferredShifts = tuple(Row.get(c) or '' for c in PreferenceColumns)
 
-            # Initialize the count of volunteers assigned to this shift
-            VolunteersAssigned = 0
+    # Calculate the volunteer's shift preference points
+    v.CalculateShiftPreferencePoints(Shifts)
 
-            # Loop over the volunteers
-            for v in IndividualVolunteers:
+    # Return the volunteer
+    return v
 
-                # Check if they were assigned to the current shift
-                if solver.Value(Assignment[(v,s)]) == 1:  # They were assigned to the current shfit
+def PlaceSignUps(Online, Rows, ReoptimizeEvery=500, ReoptimizeAfter=600, MaxDrift=0.02):
+    # This function places a batch of new sign-ups in the schedule, and re-optimizes it if it is due
+    # Inputs:
+    #   Online = an OnlineScheduler object, which has been optimized once
+    #   Rows = the new sign-ups (see SignUpFeed)
+    #   ReoptimizeEvery, ReoptimizeAfter, MaxDrift = when to re-optimize (see FollowSignUps)
+    # Outputs:
+    #   (Drift, Reoptimized) = the drift from optimal after placing the sign-ups (see OnlineScheduler.Drift), and whether
+    #                          the schedule was re-optimized
+
+    # Place each new sign-up
+    s = Online.Scheduler
+    for Row in Rows:
+        Start = time.perf_counter()
+        v = CreateVolunteer(Row, s.Shifts, len(s.IndividualVolunteers))
+        (ShiftID, Moved, Gain) = Online.Insert(v)
+        Latency = 1000 * (time.perf_counter() - Start)
+        if ShiftID >= 0:
+            print('Placed %s %s on %s, moving %d other volunteers, in %.2f ms.' % (v.FirstName, v.LastName, Online.ShiftNames[ShiftID], Moved, Latency), flush=True)
+        else:
+            print('Could not place %s %s for now (%.2f ms).' % (v.FirstName, v.LastName, Latency), flush=True)
 
-                    # Print the volunteer's first and last name
-                    Line.append( '%s %s' % (v.FirstName, v.LastName) )
+    # Tighten the bound with the new sign-ups
+    if len(Rows) > 0:
+        Online.Reprice()
 
-                    # Increment the count of volunteers assigned
-                    VolunteersAssigned += 1
+    # Re-optimize every so often, or once the schedule has drifted too far from optimal
+    Drift = Online.Drift()
+    if Online.Added > 0 and (Online.Added >= ReoptimizeEvery or time.time() - Online.LastReoptimized >= ReoptimizeAfter or Drift > MaxDrift):
+        print('Re-optimizing after %d new sign-ups (the schedule was at most %.2f%% below optimal).' % (Online.Added, 100 * Drift), flush=True)
+        Online.Reoptimize()
+        return (Drift, True)
 
-            # Check for under-staffing
-            if VolunteersAssigned < Shifts[s].RequiredVolunteers: # this is an under-staffed shift
+    # Return the drift
+    return (Drift, False)
 
-                # Add the appropriate number of empty strings
-                for _ in range(MaxVolunteersPerShift - VolunteersAssigned):
-                    Line.append(' ')
+def FollowSignUps(s, FileName, Skip=0, PollInterval=1.0, ReoptimizeEvery=500, ReoptimizeAfter=600, MaxDrift=0.02, Directory='.'):
+    # This function keeps the schedule up to date as sign-ups are appended to a file, until it is interrupted
+    # Inputs:
+    #   s = a Scheduler object, whose volunteers and groups have been loaded
+    #   FileName = the file to follow (see SignUpFeed)
+    #   Skip = the number of sign-ups at the start of the file which were loaded already
+    #   PollInterval = the number of seconds between reads of the file
+    #   ReoptimizeEvery = the number of sign-ups after which the schedule is re-optimized
+    #   ReoptimizeAfter = the number of seconds after which the schedule is re-optimized, if there were new sign-ups
+    #   MaxDrift = the drift from optimal (see OnlineScheduler.Drift) beyond which the schedule is re-optimized
+    #   Directory = the directory the schedules are written to, after every read which changed them
+
+    # Solve the problem as it stands
+    Online = OnlineScheduler(s)
+    Online.Reoptimize()
+    ExportSchedules(s.Schedule, Directory, s.Formats)
+    print('Scheduled %d volunteers; following %s for new sign-ups (press Ctrl+C to stop).' % (len(s.IndividualVolunteers), FileName), flush=True)
+
+    # Follow the file
+    Feed = SignUpFeed(FileName, Skip)
+    try:
+        while True:
+
+            # Place the new sign-ups, re-optimizing the schedule if it is due
+            Rows = Feed.Read()
+            (Drift, Reoptimized) = PlaceSignUps(Online, Rows, ReoptimizeEvery, ReoptimizeAfter, MaxDrift)
+
+            # Write the re-optimized schedule
+            if Reoptimized == True:
+                ExportSchedules(s.Schedule, Directory, s.Formats)
+
+            # Otherwise, write the schedule with the new sign-ups
+            elif len(Rows) > 0:
+                ExportSchedules(Online.Schedule(), Directory, s.Formats)
+
+            # Wait for more sign-ups
+            time.sleep(PollInterval)
+
+    except KeyboardInterrupt:
+        pass
+
+def ConfigureScheduler(s, Arguments):
+    # This function applies the command-line settings to a scheduler
+    # Inputs:
+    #   s = a Scheduler object
+    #   Arguments = the parsed command-line arguments (see main)
+
+    # Record the time taken by each step, if requested
+    if Arguments.report == True:
+        s.Report = RunReport()
+        s.Options.RecordLog = True
+
+    # Set the solver
+    s.Backend = Arguments.backend
+    s.ReduceSymmetry = not Arguments.no_symmetry_reduction
+    s.Decompose = not Arguments.no_decomposition
+    s.Processes = Arguments.processes
+
+    # Set the objective weights, penalizing churn against the previous schedule if requested
+    s.Weights['Keep the published assignments'] = Arguments.churn_penalty
+
+    # Set the solver options
+    s.Options.MaxTime = Arguments.max_time
+    s.Options.Workers = Arguments.workers
+    s.Options.RelativeGap = Arguments.relative_gap
+    s.Options.Seed = Arguments.seed
+    s.Options.Presolve = not Arguments.no_presolve
+
+    # Set the export formats, checking that they can be written before anything is solved
+    s.Formats = Arguments.formats
+    if 'parquet' in s.Formats:
+        ParquetSink('Shift-Focused Schedule.parquet')
+
+    # Set up the schedule cache, unless it is bypassed
+    if Arguments.no_cache == False:
+        s.Cache = ScheduleCache(Arguments.cache_dir, int(Arguments.cache_size * 2**20))
+
+def ReadInBatchManifest(CSV_Name, OutputDirectory='Batch Output'):
+    # This function reads the list of jobs of a batch run
+    # Inputs:
+    #   CSV_Name = the name of the manifest, a csv file with one row per job and the columns
+    #                "Site", "Week", "Individual Preferences", "Group Volunteers" = the job's name and sign-up sheets
+    #                "Shifts" = (optional) the JSON shift table of the job (see ReadInShiftConfig)
+    #                "Previous Schedule" = (optional) the job's previously published volunteer-focused schedule
+    #                "Output Directory" = (optional) where to write the job's schedules
+    #              Relative file names are relative to the manifest's directory.
+    #   OutputDirectory = the directory under which the schedules of job (site, week) are written to "site/week", by default
+    # Outputs:
+    #   Jobs = a list of dictionaries, one per job, with the above keys
+
+    # Import the os and pandas libraries
+    import os
+    import pandas as pd
+
+    # Read in the manifest, keeping blank cells as empty strings
+    Data = pd.read_csv(CSV_Name, dtype=str, keep_default_na=False)
+
+    # Check the columns
+    for Column in ['Site', 'Week', 'Individual Preferences', 'Group Volunteers']:
+        if not Column in Data.columns:
+            raise ValueError('The batch manifest "%s" has no "%s" column.' % (CSV_Name, Column))
+
+    # Resolve the file names relative to the manifest
+    Directory = os.path.dirname(os.path.abspath(CSV_Name))
+    def Resolve(FileName):
+        if FileName == '':
+            return None
+        return os.path.join(Directory, FileName)
+
+    # Build the jobs
+    Jobs = []
+    for Row in Data.to_dict('records'):
+        Jobs.append({
+            'Site' : Row['Site'],
+            'Week' : Row['Week'],
+            'Individual Preferences' : Resolve(Row['Individual Preferences']),
+            'Group Volunteers' : Resolve(Row['Group Volunteers']),
+            'Shifts' : Resolve(Row.get('Shifts', '')),
+            'Previous Schedule' : Resolve(Row.get('Previous Schedule', '')),
+            'Output Directory' : Resolve(Row.get('Output Directory', '')) or os.path.join(OutputDirectory, Row['Site'], Row['Week']),
+        })
+
+    # Return the jobs
+    return Jobs
+
+def RunBatchJob(Job):
+    # This function schedules one job of a batch run, in a worker process
+    # Inputs:
+    #   Job = a (manifest entry, parsed command-line arguments, search workers) tuple (see ReadInBatchManifest and main),
+    #         where the search workers of the CP solver apply unless --workers was given, and None keeps the solver's default
+    # Outputs:
+    #   Summary = a dictionary of the job's name, status, objective, summary statistics and run time, with an "Error"
+    #             message if the job failed
+    #   Schedule = the job's ShiftSchedule, or None if the job failed
+
+    # Import the os library
+    import os
+
+    # Unpack the job
+    (Entry, Arguments, Workers) = Job
+    Summary = {'Site' : Entry['Site'], 'Week' : Entry['Week'], 'Error' : ''}
+    Start = time.perf_counter()
+
+    # Run the job, recording its error instead of stopping the other jobs if it fails
+    try:
+
+        # Build the shift table, falling back on the one given on the command line
+        if Entry['Shifts'] != None:
+            Shifts = ReadInShiftConfig(Entry['Shifts'])
+        elif Arguments.shifts != None:
+            Shifts = ReadInShiftConfig(Arguments.shifts)
+        else:
+            Shifts = BuildShiftDictionary()
 
-                # Add the warning about under-staffing
-                Line.append('Warning: this shift is under-staffed.')
+        # Set up the scheduler, solving the components of the job one after the other since the jobs already run in parallel
+        s = Scheduler(Shifts)
+        ConfigureScheduler(s, Arguments)
+        s.Processes = 1
+        if s.Options.Workers == None:
+            s.Options.Workers = Workers
 
-            # Write out the line for the current shift
-            Writer.writerow(Line)
+        # Read in the volunteers and groups, and the previous schedule if there is one
+        s.Load(Entry['Individual Preferences'], Entry['Group Volunteers'])
+        if Entry['Previous Schedule'] != None:
+            s.LoadPreviousSchedule(Entry['Previous Schedule'])
 
-# Build the list of shifts
-Shifts = BuildShiftDictionary()
+        # Find the optimal shift assignment
+        s.Solve()
 
-# Read in the individual volunteer data
-IndividualVolunteers = ReadInIndividualVolunteerData()
+        # Write the schedules to the job's directory
+        os.makedirs(Entry['Output Directory'], exist_ok=True)
+        s.Export(Entry['Output Directory'])
 
-# Read in the volunteer group data
-GroupVolunteers = ReadInGroupVolunteerData()
+        # Summarize the job
+        Summary['Status'] = s.Store.Status
+        Summary['Objective'] = s.Store.Objective
+        Summary.update(CalcSummaryStatistics(s.Schedule))
+        Schedule = s.Schedule
 
-# Break the volunteer groups down into individuals
-DisaggregateVolunteerGroups(GroupVolunteers, IndividualVolunteers)
+    except Exception as e:
+        Summary['Error'] = '%s: %s' % (type(e).__name__, e)
+        Schedule = None
 
-# Calculate the number of preference points each volunteer associates with each shift
-for v in IndividualVolunteers:
-    v.CalculateShiftPreferencePoints(Shifts)
+    # Record the run time
+    Summary['Time [s]'] = time.perf_counter() - Start
 
-# Build the constraint programming model
-(model, Assignment) = BuildModel(IndividualVolunteers, Shifts)   # "Assignment" is a dictionary mapping (volunteer, shift) tuples to binary assignment decision variables
+    # Return the summary and the schedule
+    return (Summary, Schedule)
 
-# Create the solver and solve.
-solver = cp_model.CpSolver()
-solver.Solve(model)
-    
-# Print out the results
-PrintShiftAssignments(solver, Assignment, Shifts)
-PrintSummaryStatistics(solver, Assignment, Shifts)
+def CombineSchedules(Schedules, Names):
+    # This function combines several schedules into one, so that their statistics can be calculated together
+    # Inputs:
+    #   Schedules = a list of ShiftSchedule objects
+    #   Names = a list with a name for each schedule, which is prefixed to its shift names to keep them apart
+    # Outputs:
+    #   Combined = a ShiftSchedule object
 
-# Write the results to a CSV file
-ExportShiftFocusedSchedule(solver, Assignment, Shifts)
-ExportVolunteerFocusedSchedule(solver, Assignment, Shifts)
+    # Instantiate the combined schedule
+    Combined = ShiftSchedule()
 
+    # Add each schedule
+    for (Schedule, Name) in zip(Schedules, Names):
+        for s in Schedule.Shifts:
+            Combined.Shifts['%s: %s' % (Name, s)] = Schedule.Shifts[s]
+            Combined.Rosters['%s: %s' % (Name, s)] = Schedule.Rosters[s]
+        Combined.VolunteerAssignments += Schedule.VolunteerAssignments
+        Combined.Objective += Schedule.Objective
 
+    # Return the combined schedule
+    return Combined
 
+def RunBatch(Jobs, Arguments, MaxWorkers=None, FileName='Batch Summary.csv'):
+    # This function schedules the jobs of a batch run in parallel, and summarizes them
+    # Inputs:
+    #   Jobs = a list of manifest entries (see ReadInBatchManifest)
+    #   Arguments = the parsed command-line arguments, whose settings apply to every job (see main)
+    #   MaxWorkers = the number of jobs run at the same time; by default, one per core
+    #   FileName = the name of the CSV file the summary is written to
+    # Outputs:
+    #   Summaries = a list of dictionaries summarizing each job (see RunBatchJob)
+
+    # Import the process pool and the os library
+    import concurrent.futures
+    import os
+
+    # Set the number of workers
+    if MaxWorkers == None:
+        MaxWorkers = os.cpu_count()
+
+    # Run the jobs, sharing the cores between the CP solvers of the jobs which run at the same time
+    if MaxWorkers <= 1 or len(Jobs) <= 1:
+        Results = [RunBatchJob((Entry, Arguments, None)) for Entry in Jobs]
+    else:
+        Workers = max(1, os.cpu_count() // min(MaxWorkers, len(Jobs)))
+        with concurrent.futures.ProcessPoolExecutor(min(MaxWorkers, len(Jobs))) as Pool:
+            Results = list(Pool.map(RunBatchJob, [(Entry, Arguments, Workers) for Entry in Jobs]))
+    Summaries = [Summary for (Summary, _) in Results]
+
+    # Calculate the statistics of all of the successful jobs together
+    Solved = [(Summary, Schedule) for (Summary, Schedule) in Results if Schedule != None]
+    if len(Solved) > 0:
+        Combined = CombineSchedules([Schedule for (_, Schedule) in Solved], ['%s %s' % (Summary['Site'], Summary['Week']) for (Summary, _) in Solved])
+        Total = {'Site' : 'All jobs', 'Week' : '', 'Error' : '', 'Status' : CombineStatuses([Summary['Status'] for (Summary, _) in Solved]), 'Objective' : Combined.Objective}
+        Total.update(CalcSummaryStatistics(Combined))
+        Total['Time [s]'] = sum(Summary['Time [s]'] for Summary in Summaries)
+    else:
+        Total = None
+
+    # Build the summary table
+    Header = ['Site', 'Week', 'Status', 'Requirements covered', 'Shifts fully covered', 'Volunteers assigned', 'Preferred assigned', 'Objective', 'Time [s]', 'Error']
+    Rows = []
+    for Summary in Summaries + ([Total] if Total != None else []):
+        if Summary['Error'] != '':
+            Rows.append([Summary['Site'], Summary['Week'], 'ERROR', '', '', '', '', '', '%1.2f' % Summary['Time [s]'], Summary['Error']])
+        else:
+            Rows.append([
+                Summary['Site'],
+                Summary['Week'],
+                Summary['Status'],
+                '%1.1f%%' % (Summary['Staffing requirements covered'] * 100),
+                '%1.1f%%' % (Summary['Shifts fully covered'] * 100),
+                '%1.1f%%' % (Summary['Volunteers assigned to a shift'] * 100),
+                '%1.1f%%' % (Summary['Preferred volunteers assigned to a shift'] * 100),
+                '%d' % Summary['Objective'],
+                '%1.2f' % Summary['Time [s]'],
+                '',
+            ])
+
+    # Print the table and write it to the CSV file
+    PrintTable(Header, Rows, FileName)
+
+    # Return the summaries
+    return Summaries
+
+class ModelSnapshot():
+    # This class describes an anonymized problem, as exported by SaveModelSnapshot: the volunteers, groups and shifts
+    # keep their preferences, sizes and requirements, but are only known by their position ("Volunteer 17", "Shift 3").
+
+    Version = 1  # Stored in every snapshot, so that snapshots written in another format are recognized
+
+    def __init__(self):
+        self.Name = ''  # The name of the snapshot file
+        self.IndividualVolunteers = []
+        self.VolunteerGroups = []
+        self.Shifts = {}
+        self.Weights = dict(ObjectiveWeights)
+        self.Model = ''  # The CP model built by BuildModel, in the text format of its protocol buffer
+
+def SaveModelSnapshot(FileName, IndividualVolunteers, VolunteerGroups, Shifts, Weights=None):
+    # This function writes a problem, without any names, to a snapshot file which can be solved again elsewhere (see
+    # ReplaySnapshots)
+    # Inputs:
+    #   FileName = the name of the snapshot file, conventionally ending in ".npz"
+    #   IndividualVolunteers = a list of volunteer objects, whose shift preference points have been calculated
+    #   VolunteerGroups = a list of VolunteerGroup objects, whose shift preference points have been calculated
+    #   Shifts = a dictionary of shift objects, indexed by shift names
+    #   Weights = a dictionary of objective weights like ObjectiveWeights, which is used by default
+    #
+    # The snapshot holds the flat arrays of the assignment store (see AssignmentStore), the requirement of each shift
+    # by ID number, the conflicting sets of shifts by ID number, and the CP model built from them by BuildModel, in the
+    # text format of its protocol buffer. Names only appear as positions, and the previous schedule only as counts.
+
+    # Import the json, os and tempfile libraries
+    import json
+    import os
+    import tempfile
+
+    # Use the default weights
+    if Weights == None:
+        Weights = ObjectiveWeights
+
+    # Build the model, which also numbers the volunteers and groups, and their preferred shifts
+    (model, Store) = BuildModel(IndividualVolunteers, Shifts, VolunteerGroups, Weights=Weights)
+
+    # Flatten the conflicting sets of shifts
+    Cliques = ListShiftConflicts(Shifts)
+    CliqueOffsets = np.cumsum([0] + [len(c) for c in Cliques])
+    CliqueShifts = np.array([s for c in Cliques for s in c], dtype=np.int64)
+
+    # Write the snapshot to a temporary file, then move it into place, so that a corpus never holds a partial snapshot
+    (Handle, TemporaryName) = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(FileName)), suffix='.tmp')
+    with os.fdopen(Handle, 'wb') as f:
+        np.savez_compressed(
+            f,
+            Version=np.array(ModelSnapshot.Version),
+            IsGroup=np.array([isinstance(u, VolunteerGroup) for u in Store.Units], dtype=bool),
+            Offsets=Store.Offsets,
+            Headcounts=Store.Headcounts,
+            MaxShifts=Store.MaxShifts,
+            IsPreferred=Store.IsPreferred,
+            ShiftIDs=Store.ShiftIDs,
+            Points=Store.Points,
+            Previous=Store.Previous,
+            Required=ListRequiredVolunteers(Shifts),
+            CliqueOffsets=CliqueOffsets,
+            CliqueShifts=CliqueShifts,
+            Weights=np.array(json.dumps(Weights)),
+            Model=np.frombuffer(str(model.Proto()).encode(), dtype=np.uint8),  # str() gives the text format in every version of OR-Tools
+        )
+    os.replace(TemporaryName, FileName)
+
+def LoadModelSnapshot(FileName):
+    # This function reads a snapshot written by SaveModelSnapshot
+    # Inputs:
+    #   FileName = the name of the snapshot file
+    # Outputs:
+    #   Snapshot = a ModelSnapshot object, whose volunteers and groups have their shift preference points
+
+    # Import the json and os libraries
+    import json
+    import os
+
+    # Read the arrays
+    with np.load(FileName) as Data:
+        if Data['Version'].item() != ModelSnapshot.Version:
+            raise ValueError('The snapshot "%s" was written in format %d, not %d.' % (FileName, Data['Version'].item(), ModelSnapshot.Version))
+        Arrays = {Key: Data[Key] for Key in Data.files}
+
+    # Instantiate the snapshot
+    Snapshot = ModelSnapshot()
+    Snapshot.Name = os.path.basename(FileName)
+    Snapshot.Weights = json.loads(str(Arrays['Weights']))
+    Snapshot.Model = Arrays['Model'].tobytes().decode()
+
+    # Rebuild the shifts, numbered as they were, with their conflicting sets
+    for (ID_Number, Required) in enumerate(Arrays['Required'].tolist()):
+        AddShift(Snapshot.Shifts, 'Shift %d' % ID_Number, Required)
+    InternShifts(Snapshot.Shifts)
+    ShiftNames = ListShiftNames(Snapshot.Shifts)
+    CliqueOffsets = Arrays['CliqueOffsets'].tolist()
+    for c in range(len(CliqueOffsets) - 1):
+        for ShiftID in Arrays['CliqueShifts'][CliqueOffsets[c]:CliqueOffsets[c + 1]].tolist():
+            Snapshot.Shifts[ShiftNames[ShiftID]].Conflicts.append('Conflict %d' % c)
+
+    # Rebuild the volunteers and groups, in their original order
+    Offsets = Arrays['Offsets'].tolist()
+    (ShiftIDs, Points, Previous) = (Arrays['ShiftIDs'].tolist(), Arrays['Points'].tolist(), Arrays['Previous'].tolist())
+    for (k, IsGroup) in enumerate(Arrays['IsGroup'].tolist()):
+        Entries = slice(Offsets[k], Offsets[k + 1])
+        if IsGroup == True:
+            u = VolunteerGroup()
+            u.GroupName = 'Group %d' % len(Snapshot.VolunteerGroups)
+            u.Volunteers = int(Arrays['Headcounts'][k])
+            Snapshot.VolunteerGroups.append(u)
+        else:
+            u = Volunteer()
+            (u.FirstName, u.LastName) = ('Volunteer', '%d' % len(Snapshot.IndividualVolunteers))
+            u.MaxShifts = int(Arrays['MaxShifts'][k])
+            Snapshot.IndividualVolunteers.append(u)
+        u.ID_Number = k
+        u.IsPreferredVolunteer = bool(Arrays['IsPreferred'][k])
+        u.ShiftIDs = tuple(ShiftIDs[Entries])
+        u.Points = tuple(Points[Entries])
+        u.PreferredShifts = [ShiftNames[s] for s in u.ShiftIDs]
+        if IsGroup == True and len(u.PreferredShifts) > 0:
+            u.AssignedShift = u.PreferredShifts[0]
+        if any(Previous[Entries]):
+            u.PreviousCounts = tuple(Previous[Entries])
+
+    # Return the snapshot
+    return Snapshot
+
+def SolveSnapshotModel(Text, Options=None):
+    # This function solves the CP model stored in a snapshot exactly as it was built, without presolve or decomposition
+    # Inputs:
+    #   Text = the text format of the model (see SaveModelSnapshot)
+    #   Options = a SolverOptions object, or None for the solver's defaults
+    # Outputs:
+    #   (Status, Objective) = the name of the solver status, and the objective value of the best solution
+
+    # Import the OR-Tools library
+    from ortools.sat.python import cp_model
 
+    # Read the model, with the parser of this version of OR-Tools
+    model = cp_model.CpModel()
+    if hasattr(model.Proto(), 'parse_text_format'):
+        model.Proto().parse_text_format(Text)
+    else:
+        from google.protobuf import text_format
+        text_format.Parse(Text, model.Proto())
+
+    # Solve the model
+    solver = cp_model.CpSolver()
+    if Options != None:
+        Options.Configure(solver)
+    Status = solver.Solve(model)
+
+    # Return the status and objective
+    if Status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return (solver.StatusName(Status), solver.ObjectiveValue())
+    return (solver.StatusName(Status), 0)
+
+def ReplaySnapshots(Directory, Backends=('cpsat',), ReduceSymmetry=True, Decompose=True, Processes=None, Options=None, FileName='Replay Summary.csv'):
+    # This function solves every snapshot in a directory with each of the given backends, one after the other so that
+    # their times can be compared, and summarizes them
+    # Inputs:
+    #   Directory = a directory of snapshot files (see SaveModelSnapshot), e.g. a corpus of problems collected from real runs
+    #   Backends = the backends to solve each snapshot with: "cpsat" and "flow" solve it as a run would (see Solve),
+    #              and "model" solves the CP model exactly as it was stored (see SolveSnapshotModel)
+    #   ReduceSymmetry, Decompose, Processes = the settings of Solve
+    #   Options = a SolverOptions object, which applies to every solve
+    #   FileName = the name of the CSV file the summary is written to
+    # Outputs:
+    #   Summaries = a list of dictionaries with the snapshot, backend, size, status, objective, time and error of each solve
+
+    # Import the os library
+    import os
+
+    # Loop over the snapshots, in order of name
+    Summaries = []
+    for Name in sorted(os.listdir(Directory)):
+        if not Name.endswith('.npz'):
+            continue
+        Snapshot = LoadModelSnapshot(os.path.join(Directory, Name))
+        Store = AssignmentStore(Snapshot.IndividualVolunteers + Snapshot.VolunteerGroups)
+
+        # Solve the snapshot with each backend, recording the error instead of stopping the replay if a solve fails
+        for Backend in Backends:
+            Summary = {'Snapshot' : Name, 'Backend' : Backend, 'Volunteers' : int(Store.Headcounts.sum()), 'Entries' : len(Store.ShiftIDs), 'Error' : ''}
+            Start = time.perf_counter()
+            try:
+                if Backend == 'model':
+                    (Summary['Status'], Summary['Objective']) = SolveSnapshotModel(Snapshot.Model, Options)
+                else:
+                    Solved = Solve(Snapshot.IndividualVolunteers, Snapshot.Shifts, Snapshot.VolunteerGroups, Backend, ReduceSymmetry, Decompose, Processes, Snapshot.Weights, Options)
+                    (Summary['Status'], Summary['Objective']) = (Solved.Status, Solved.Objective)
+            except Exception as e:
+                Summary['Error'] = '%s: %s' % (type(e).__name__, e)
+            Summary['Time [s]'] = time.perf_counter() - Start
+            Summaries.append(Summary)
+
+    # Print the table and write it to the CSV file
+    Header = ['Snapshot', 'Backend', 'Volunteers', 'Entries', 'Status', 'Objective', 'Time [s]', 'Error']
+    Rows = [
+        [
+            Summary['Snapshot'],
+            Summary['Backend'],
+            Summary['Volunteers'],
+            Summary['Entries'],
+            'ERROR' if Summary['Error'] != '' else Summary['Status'],
+            '' if Summary['Error'] != '' else '%d' % Summary['Objective'],
+            '%1.2f' % Summary['Time [s]'],
+            Summary['Error'],
+        ]
+        for Summary in Summaries
+    ]
+    PrintTable(Header, Rows, FileName)
+
+    # Return the summaries
+    return Summaries
+
+def PrintTable(Header, Rows, FileName=None):
+    # This function prints out a table with aligned columns, and writes it to a CSV file
+    # Inputs:
+    #   Header = the list of column names
+    #   Rows = a list of rows, each a list of cells
+    #   FileName = the name of the CSV file, or None to only print the table
+
+    # Import the csv library
+    import csv
+
+    # Print the table, with each column as wide as its widest cell
+    Widths = [max(len(str(Row[i])) for Row in [Header] + Rows) for i in range(len(Header))]
+    for Row in [Header] + Rows:
+        print('  '.join(str(Cell).rjust(Width) for (Cell, Width) in zip(Row, Widths)).rstrip())
 
+    # Write the table to the CSV file
+    if FileName != None:
+        with open(FileName, mode='w', newline='') as f:
+            Writer = csv.writer(f)
+            Writer.writerow(Header)
+            Writer.writerows(Rows)
 
+def main(Arguments=None):
+    # This function is the command-line entry point
+    # Inputs:
+    #   Arguments = a list of command-line arguments; by default, they are read from sys.argv
+
+    # Parse the command line arguments
+    Parser = argparse.ArgumentParser(description='Assign volunteers to shifts at Y2Y.')
+    Parser.add_argument('--shifts', default=None, help='a JSON file defining the shift table (default: every period of every day of the week)')
+    Parser.add_argument('--backend', choices=['cpsat', 'flow'], default='cpsat', help='the solver used to find the optimal assignment')
+    Parser.add_argument('--no-symmetry-reduction', action='store_true', help='solve over individual volunteers instead of classes of volunteers with identical preferences')
+    Parser.add_argument('--no-decomposition', action='store_true', help='solve the whole problem at once instead of its independent components')
+    Parser.add_argument('--processes', type=int, default=None, help='number of worker processes used to solve independent components (default: one per core)')
+    Parser.add_argument('--previous-schedule', default=None, help='a previously published volunteer-focused schedule, used to warm start the solver')
+    Parser.add_argument('--churn-penalty', type=int, default=0, help='preference points lost for each volunteer moved off their previous shift')
+    Parser.add_argument('--max-time', type=float, default=None, help='time limit of the constraint programming solver, in seconds')
+    Parser.add_argument('--workers', type=int, default=None, help='number of parallel search workers of the constraint programming solver')
+    Parser.add_argument('--relative-gap', type=float, default=None, help='stop the constraint programming solver once the schedule is within this fraction of optimal')
+    Parser.add_argument('--seed', type=int, default=None, help='random seed of the constraint programming solver')
+    Parser.add_argument('--no-presolve', action='store_true', help='hand the whole problem to the constraint programming solver, without first fixing uncontested assignments and trying a greedy schedule')
+    Parser.add_argument('--preview', type=float, nargs='?', const=1.0, default=None, metavar='SECONDS', help='print a quick schedule, found without a solver in about this many seconds (default: 1), with a bound on how far it is from optimal; nothing is written')
+    Parser.add_argument('--follow', nargs='?', const='Individual Preferences.csv', default=None, metavar='FILE', help='keep the schedule up to date as sign-ups are appended to this csv or JSON lines file (default: "Individual Preferences.csv"), until interrupted')
+    Parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds between reads of the followed file')
+    Parser.add_argument('--reoptimize-every', type=int, default=500, help='re-optimize the followed schedule after this many new sign-ups')
+    Parser.add_argument('--reoptimize-after', type=float, default=600, help='re-optimize the followed schedule after this many seconds with new sign-ups')
+    Parser.add_argument('--max-drift', type=float, default=0.02, help='re-optimize the followed schedule once it may be more than this fraction below optimal')
+    Parser.add_argument('--formats', choices=sorted(ExportFormats), nargs='+', default=['csv'], help='the formats the two schedules are written in (default: csv); parquet needs the pyarrow library')
+    Parser.add_argument('--sensitivity', type=int, nargs='?', const=5, default=None, metavar='N', help='after solving, list up to N (default: 5) volunteers or chains of moves which would fill each under-staffed shift, and the value of one more place or volunteer on each shift, to "Shift Sensitivity.csv" and "Sensitivity Candidates.csv"')
+    Parser.add_argument('--stream', action='store_true', help='write each improving schedule to the CSV files as soon as it is found')
+    Parser.add_argument('--validate', action='store_true', help='only check the sign-up data for problems, without scheduling')
+    Parser.add_argument('--no-cache', action='store_true', help='always solve, instead of reusing the schedule of an earlier run on the same inputs and settings')
+    Parser.add_argument('--cache-dir', default='.schedule_cache', help='directory of the schedule cache')
+    Parser.add_argument('--cache-size', type=float, default=100, help='maximum size of the schedule cache, in megabytes')
+    Parser.add_argument('--sweep-coverage', type=int, nargs='+', default=None, help='coverage weights to compare, instead of scheduling (default: %d)' % ObjectiveWeights['Maximize the shift coverage'])
+    Parser.add_argument('--sweep-preference', type=int, nargs='+', default=None, help='preference weights to compare, instead of scheduling (default: %d)' % ObjectiveWeights['Respect the volunteer preferences'])
+    Parser.add_argument('--sweep-multiplier', type=int, nargs='+', default=None, help='preferred volunteer multipliers to compare, instead of scheduling (default: %d)' % ObjectiveWeights['Preferred volunteer multiplier'])
+    Parser.add_argument('--batch', default=None, help='a csv manifest of (site, week, sign-up sheets) jobs to schedule, instead of the files in this directory')
+    Parser.add_argument('--batch-output', default='Batch Output', help='directory under which the schedules of each batch job are written to "site/week"')
+    Parser.add_argument('--jobs', type=int, default=None, help='number of batch jobs scheduled at the same time (default: one per core)')
+    Parser.add_argument('--export-snapshot', default=None, metavar='FILE', help='also write the problem, with anonymized volunteers and shifts, to this snapshot file (.npz), e.g. to share a slow problem')
+    Parser.add_argument('--replay', default=None, metavar='DIRECTORY', help='solve every snapshot in this directory and report the status, objective and time of each, instead of scheduling')
+    Parser.add_argument('--replay-backends', choices=['cpsat', 'flow', 'model'], nargs='+', default=None, help='the backends each snapshot is solved with ("model" solves the stored CP model as is; default: --backend)')
+    Parser.add_argument('--report', action='store_true', help='write the time, memory and solver statistics of each step to "Run Report.json" and "Run Report.csv"')
+    Parser.add_argument('--profile', default=None, help='write a cProfile dump of the run to this file (worker processes are not profiled; use --processes 1)')
+    Arguments = Parser.parse_args(Arguments)
+
+    # Run, under the profiler if requested
+    if Arguments.profile != None:
+        import cProfile
+        Profiler = cProfile.Profile()
+        try:
+            Profiler.runcall(Run, Arguments)
+        finally:
+            Profiler.dump_stats(Arguments.profile)
+    else:
+        Run(Arguments)
+
+def Run(Arguments):
+    # This function runs the program with parsed command-line arguments (see main)
+
+    # Import the os library
+    import os
+
+    # Build the shift table
+    if Arguments.shifts != None:
+        Shifts = ReadInShiftConfig(Arguments.shifts)
+    else:
+        Shifts = BuildShiftDictionary()
+
+    # Schedule the jobs of a batch run, if requested
+    if Arguments.batch != None:
+        RunBatch(ReadInBatchManifest(Arguments.batch, Arguments.batch_output), Arguments, Arguments.jobs, os.path.join(Arguments.batch_output, 'Batch Summary.csv'))
+        return
+
+    # Set up the scheduler
+    s = Scheduler(Shifts)
+    ConfigureScheduler(s, Arguments)
+
+    # Solve a corpus of snapshots, if requested, with the solver settings of the command line
+    if Arguments.replay != None:
+        ReplaySnapshots(Arguments.replay, Arguments.replay_backends or [Arguments.backend], s.ReduceSymmetry, s.Decompose, s.Processes, s.Options)
+        return
+
+    # Read in the volunteers and groups
+    s.Load()
+
+    # Check the sign-up data, if requested
+    if Arguments.validate == True:
+        Problems = s.Validate()
+        for Problem in Problems:
+            print(Problem)
+        print('%d volunteers and %d volunteer groups read, with %d problems.' % (len(s.IndividualVolunteers), len(s.VolunteerGroups), len(Problems)))
+        return
+
+    # Match the volunteers against the previous schedule, if there is one
+    if Arguments.previous_schedule != None:
+        Delta = s.LoadPreviousSchedule(Arguments.previous_schedule)
+        print('Changes since the previous schedule: %d unchanged, %d added, %d removed, %d changed preferences.\n' % (Delta['Unchanged'], Delta['Added'], Delta['Removed'], Delta['Changed']))
+
+    # Write an anonymized snapshot of the problem, if requested
+    if Arguments.export_snapshot != None:
+        s.ExportSnapshot(Arguments.export_snapshot)
+        print('Anonymized snapshot of the problem written to "%s".\n' % Arguments.export_snapshot)
+
+    # Compare several sets of objective weights, if requested
+    if Arguments.sweep_coverage != None or Arguments.sweep_preference != None or Arguments.sweep_multiplier != None:
+        WeightSets = ParseWeightSweep(
+            Arguments.sweep_coverage or [ObjectiveWeights['Maximize the shift coverage']],
+            Arguments.sweep_preference or [ObjectiveWeights['Respect the volunteer preferences']],
+            Arguments.sweep_multiplier or [ObjectiveWeights['Preferred volunteer multiplier']],
+            Arguments.churn_penalty,
+        )
+        PrintWeightSweep(WeightSets, s.Sweep(WeightSets))
+        return
+
+    # Preview a schedule, without solving the problem to optimality, if requested
+    if Arguments.preview != None:
+        s.Preview(Arguments.preview)
+        s.Print()
+        Statistics = s.Store.Statistics[0]
+        print('Preview: objective %d, at most %.2f%% below the optimal objective (upper bound %d), found in %.2f seconds without a solver.' % (
+            Statistics['Objective'],
+            100 * Statistics['Gap'],
+            Statistics['Bound'],
+            Statistics['Preview [s]'],
+        ))
+        if s.Report != None:
+            s.Report.Save()
+        return
+
+    # Keep the schedule up to date as sign-ups arrive, if requested, skipping the sign-ups which were just read
+    if Arguments.follow != None:
+        if os.path.abspath(Arguments.follow) == os.path.abspath('Individual Preferences.csv'):
+            Skip = len(s.IndividualVolunteers)
+        else:
+            Skip = 0
+        FollowSignUps(s, Arguments.follow, Skip, Arguments.poll_interval, Arguments.reoptimize_every, Arguments.reoptimize_after, Arguments.max_drift)
+        return
+
+    # Find the optimal shift assignment, writing each improving schedule to the CSV files as it is found if requested
+    if Arguments.stream == True:
+        s.Solve(OnSolution=lambda Schedule: StreamSchedule(Schedule, Formats=s.Formats))
+    else:
+        s.Solve()
+
+    # Print out the results
+    if s.CacheHit == True:
+        print('Reusing the schedule of an earlier run on the same inputs and settings (use --no-cache to solve again).\n')
+    s.Print()
+    if Arguments.previous_schedule != None:
+        print('Previous assignments kept: %d of %d.' % s.Store.CountKeptAssignments())
+
+    # Report what the presolve removed, if a report was requested
+    Statistics = s.Store.Statistics
+    Unassignable = sum(1 for v in list(s.IndividualVolunteers) + list(s.VolunteerGroups) if len(v.ShiftIDs) == 0)
+    if Arguments.report == True and any('Fixed volunteers' in x for x in Statistics):
+        print('Presolve: %d volunteers and groups without a valid preference dropped, %d volunteers fixed to uncontested shifts, %d of %d parts of the problem solved without the solver.' % (
+            Unassignable,
+            sum(x.get('Fixed volunteers', 0) for x in Statistics),
+            sum(1 for x in Statistics if x.get('Solver skipped') == True),
+            len(Statistics),
+        ))
+
+    # Warn if the solver stopped before proving the schedule optimal
+    if s.Store.Status == 'FEASIBLE':
+        print('Warning: the solver stopped before proving that the schedule is optimal.')
+    elif s.Store.Status != 'OPTIMAL':
+        print('Warning: the solver stopped with status %s before scheduling every part of the problem.' % s.Store.Status)
+
+    # Warn if the objective is rounded
+    Message = DescribeObjectiveRounding(s.Shifts)
+    if Message != None:
+        print('Warning: ' + Message)
+
+    # Analyze how the under-staffed shifts could be filled, if requested
+    if Arguments.sensitivity != None:
+        Result = s.Analyze(Arguments.sensitivity)
+        print('')
+        ExportTables([
+            (Result.Shifts, [CSVSink('Shift Sensitivity.csv'), ConsoleSink(Skip=(), Labels=True)]),
+            (Result.Candidates, [CSVSink('Sensitivity Candidates.csv')]),
+        ])
+        print('%d ways to fill the under-staffed shifts written to "Sensitivity Candidates.csv".' % len(Result.Candidates[1]))
+
+    # Write the results to a CSV file
+    s.Export()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+# Import the standard libraries
+import os
+import random
+import sys
+
+# Import the numpy library
+import numpy as np
+
+# Import the pytest library
+import pytest
+
+# Import the scheduling code from the repository root
+Root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, Root)
+import ScheduleShifts
+
+def LoadSampleData(Shifts):
+    # This function reads in the sample sign-up sheets of the repository
+    # Outputs:
+    #   (IndividualVolunteers, VolunteerGroups) = the volunteers and groups, with their preference points calculated
+
+    # Read in the volunteers and groups
+    IndividualVolunteers = ScheduleShifts.ReadInIndividualVolunteerData(Shifts, os.path.join(Root, 'Individual Preferences.csv'))
+    VolunteerGroups = ScheduleShifts.ReadInGroupVolunteerData(os.path.join(Root, 'Group Volunteers.csv'))
+    ScheduleShifts.CapVolunteerGroups(VolunteerGroups, Shifts)
+    for g in VolunteerGroups:
+        g.CalculateShiftPreferencePoints(Shifts)
+
+    # Return them
+    return (IndividualVolunteers, VolunteerGroups)
+
+def GenerateRandomInstance(Seed, Shifts, NumberOfVolunteers=40, NumberOfGroups=3, MaxShifts=(1,)):
+    # This function generates a small random instance, with volunteers who rank up to five shifts and a few groups
+    # Inputs:
+    #   MaxShifts = the numbers of shifts the volunteers can take, one of which is picked for each volunteer
+    # Outputs:
+    #   (IndividualVolunteers, VolunteerGroups) = the volunteers and groups, with their preference points calculated
+
+    # Instantiate the random number generator
+    Generator = random.Random(Seed)
+    ShiftNames = list(Shifts)
+
+    # Generate the individual volunteers
+    IndividualVolunteers = []
+    for i in range(NumberOfVolunteers):
+        v = ScheduleShifts.Volunteer()
+        v.ID_Number = i
+        (v.FirstName, v.LastName) = ('Volunteer', str(i))
+        v.IsPreferredVolunteer = Generator.random() < 0.25
+        v.MaxShifts = Generator.choice(MaxShifts)
+        v.PreferredShifts = Generator.sample(ShiftNames, Generator.randint(1, 5))
+        v.CalculateShiftPreferencePoints(Shifts)
+        IndividualVolunteers.append(v)
+
+    # Generate the groups
+    VolunteerGroups = []
+    for i in range(NumberOfGroups):
+        g = ScheduleShifts.VolunteerGroup()
+        g.ID_Number = i
+        g.GroupName = 'Group %d' % i
+        g.AssignedShift = Generator.choice(ShiftNames)
+        g.Volunteers = Generator.randint(2, 5)
+        VolunteerGroups.append(g)
+    ScheduleShifts.CapVolunteerGroups(VolunteerGroups, Shifts)
+    for g in VolunteerGroups:
+        g.CalculateShiftPreferencePoints(Shifts)
+
+    # Return the instance
+    return (IndividualVolunteers, VolunteerGroups)
+
+def CheckObjective(Store, Shifts, Weights=None):
+    # This function checks that the objective of a solved store is the sum of the values of its assignments
+    Values = ScheduleShifts.CalcAssignmentValues(Store, Shifts, ScheduleShifts.CalcObjectiveScalar(Shifts), Weights)
+    assert int((Values * Store.Values).sum()) == int(round(Store.Objective))
+
+def SolveWithBothBackends(IndividualVolunteers, Shifts, VolunteerGroups, **Settings):
+    # This function solves an instance with both backends, checks their objectives agree, and returns them
+    # Outputs:
+    #   Stores = a dictionary of the solved stores, indexed by backend name
+    Stores = {}
+    for Backend in ['cpsat', 'flow']:
+        Stores[Backend] = ScheduleShifts.Solve(IndividualVolunteers, Shifts, VolunteerGroups, Backend=Backend, Processes=1, **Settings)
+        assert Stores[Backend].Status == 'OPTIMAL'
+        CheckObjective(Stores[Backend], Shifts, Settings.get('Weights'))
+    assert int(round(Stores['cpsat'].Objective)) == int(round(Stores['flow'].Objective))
+    return Stores
+
+@pytest.mark.parametrize('ReduceSymmetry', [True, False])
+@pytest.mark.parametrize('Decompose', [True, False])
+def test_backends_agree_on_sample_data(ReduceSymmetry, Decompose):
+    Shifts = ScheduleShifts.BuildShiftDictionary()
+    (IndividualVolunteers, VolunteerGroups) = LoadSampleData(Shifts)
+    SolveWithBothBackends(IndividualVolunteers, Shifts, VolunteerGroups, ReduceSymmetry=ReduceSymmetry, Decompose=Decompose)
+
+@pytest.mark.parametrize('Seed', range(5))
+def test_backends_agree_on_random_instances(Seed):
+    Shifts = ScheduleShifts.BuildShiftDictionary()
+    (IndividualVolunteers, VolunteerGroups) = GenerateRandomInstance(Seed, Shifts)
+    SolveWithBothBackends(IndividualVolunteers, Shifts, VolunteerGroups)
+
+def test_requirements_up_to_20_are_scaled_exactly():
+    # Build a week whose requirements include 17 and 19, whose least common multiple exceeds that of 1 to 16
+    Config = {'Weekdays' : [], 'Shifts' : []}
+    for (i, ShiftName) in enumerate(ScheduleShifts.BuildShiftDictionary()):
+        Config['Shifts'].append({'Name' : ShiftName, 'RequiredVolunteers' : [16, 17, 19, 5, 9, 7, 4][i % 7]})
+    Shifts = ScheduleShifts.BuildShiftDictionary(Config)
+
+    # Check that every coverage coefficient is exact, and that the backends agree
+    Scalar = ScheduleShifts.CalcObjectiveScalar(Shifts)
+    Required = ScheduleShifts.ListRequiredVolunteers(Shifts)
+    assert (Scalar % Required == 0).all() and ScheduleShifts.DescribeObjectiveRounding(Shifts) == None
+    (IndividualVolunteers, VolunteerGroups) = GenerateRandomInstance(0, Shifts, NumberOfVolunteers=150)
+    SolveWithBothBackends(IndividualVolunteers, Shifts, VolunteerGroups)
+
+    # Check that requirements beyond the cap are reported as rounded
+    for (i, Requirement) in enumerate([23, 11, 13]):
+        Config['Shifts'][i]['RequiredVolunteers'] = Requirement
+    Message = ScheduleShifts.DescribeObjectiveRounding(ScheduleShifts.BuildShiftDictionary(Config))
+    assert Message != None and 'approximate' in Message
+    assert Message in ScheduleShifts.ValidateInputs([], [], ScheduleShifts.BuildShiftDictionary(Config))
+
+@pytest.mark.parametrize('Backend', ['cpsat', 'flow'])
+def test_churn_bonus_counts_only_kept_members(Backend):
+    Shifts = ScheduleShifts.BuildShiftDictionary()
+    (IndividualVolunteers, VolunteerGroups) = GenerateRandomInstance(0, Shifts, NumberOfGroups=0)
+
+    # Add a group of four, two of whom held the group's shift in the previous schedule
+    g = ScheduleShifts.VolunteerGroup()
+    (g.GroupName, g.AssignedShift, g.Volunteers) = ('Group', 'Monday Dinner', 4)
+    g.CalculateShiftPreferencePoints(Shifts)
+    VolunteerGroups = [g]
+    Previous = {'Group Volunteer 1' : ['Monday Dinner'], 'Group Volunteer 3' : ['Monday Dinner']}
+    ScheduleShifts.ApplyPreviousSchedule(IndividualVolunteers, VolunteerGroups, Previous, Shifts)
+    assert sorted(Part.Volunteers for Part in VolunteerGroups) == [2, 2]
+
+    # Check that the bonus is earned once per kept member
+    Weights = dict(ScheduleShifts.ObjectiveWeights, **{'Keep the published assignments' : 3})
+    Store = ScheduleShifts.Solve(IndividualVolunteers, Shifts, VolunteerGroups, Backend=Backend, Processes=1, Weights=Weights)
+    CheckObjective(Store, Shifts, Weights)
+    Scalar = ScheduleShifts.CalcObjectiveScalar(Shifts)
+    WithoutBonus = int((ScheduleShifts.CalcAssignmentValues(Store, Shifts, Scalar) * Store.Values).sum())
+    assert int(round(Store.Objective)) - WithoutBonus == 3 * Scalar * Store.CountKeptAssignments()[0]
+
+    # Check that the members keep their names
+    Schedule = ScheduleShifts.ExtractSchedule(Store, Shifts)
+    assert sorted(v.LastName for (v, s) in Schedule.VolunteerAssignments if v.FirstName == 'Group') == ['Volunteer %d' % i for i in range(1, 5)]
+
+def test_presolve_keeps_the_optimum():
+    Shifts = ScheduleShifts.BuildShiftDictionary()
+    (IndividualVolunteers, VolunteerGroups) = LoadSampleData(Shifts)
+    Objectives = []
+    for Presolve in [True, False]:
+        Options = ScheduleShifts.SolverOptions()
+        Options.Presolve = Presolve
+        Store = ScheduleShifts.Solve(IndividualVolunteers, Shifts, VolunteerGroups, Processes=1, Options=Options)
+        assert Store.Status == 'OPTIMAL'
+        CheckObjective(Store, Shifts)
+        Objectives.append(int(round(Store.Objective)))
+    assert Objectives[0] == Objectives[1]
+
+def test_presolve_keeps_the_greedy_schedule_when_the_solver_finds_none():
+    Shifts = ScheduleShifts.BuildShiftDictionary()
+    (IndividualVolunteers, VolunteerGroups) = LoadSampleData(Shifts)
+    Options = ScheduleShifts.SolverOptions()
+    Options.MaxTime = 0.0
+    Store = ScheduleShifts.Solve(IndividualVolunteers, Shifts, VolunteerGroups, Processes=1, Options=Options)
+    CheckObjective(Store, Shifts)
+    assert Store.Status == 'FEASIBLE'
+    assert Store.Objective >= Store.Statistics[0]['Greedy objective'] > 0
+
+def CheckSchedule(Store, Shifts):
+    # This function checks that no volunteer takes more shifts than they can, or two conflicting shifts, and that no
+    # shift is overstaffed
+    Schedule = ScheduleShifts.ExtractSchedule(Store, Shifts)
+    ShiftsByVolunteer = {}
+    for (v, s) in Schedule.VolunteerAssignments:
+        if s != None:
+            ShiftsByVolunteer.setdefault(id(v), (v, []))[1].append(Shifts[s].ID_Number)
+    for (v, ShiftIDs) in ShiftsByVolunteer.values():
+        assert len(ShiftIDs) <= v.MaxShifts and len(set(ShiftIDs)) == len(ShiftIDs)
+        for Clique in ScheduleShifts.ListShiftConflicts(Shifts):
+            assert len(set(Clique) & set(ShiftIDs)) <= 1
+    for s in Shifts:
+        assert len(Schedule.Rosters[s]) <= Shifts[s].RequiredVolunteers
+
+@pytest.mark.parametrize('Seed', range(3))
+def test_multi_shift_volunteers_keep_conflicting_shifts_apart(Seed):
+    Shifts = ScheduleShifts.BuildShiftDictionary()
+    (IndividualVolunteers, VolunteerGroups) = GenerateRandomInstance(Seed, Shifts, NumberOfVolunteers=30, MaxShifts=(1, 2, 3))
+    Objectives = set()
+    for ReduceSymmetry in [True, False]:
+        for Presolve in [True, False]:
+            Options = ScheduleShifts.SolverOptions()
+            Options.Presolve = Presolve
+            Store = ScheduleShifts.Solve(IndividualVolunteers, Shifts, VolunteerGroups, ReduceSymmetry=ReduceSymmetry, Processes=1, Options=Options)
+            assert Store.Status == 'OPTIMAL'
+            CheckObjective(Store, Shifts)
+            CheckSchedule(Store, Shifts)
+            Objectives.add(int(round(Store.Objective)))
+    assert len(Objectives) == 1
+
+    # The flow backend cannot keep conflicting shifts apart, so it refuses the problem
+    with pytest.raises(ValueError):
+        ScheduleShifts.Solve(IndividualVolunteers, Shifts, VolunteerGroups, Backend='flow', Processes=1)
+
+@pytest.mark.parametrize('Seed', range(3))
+def test_backends_agree_on_multi_shift_volunteers_without_conflicts(Seed):
+    Shifts = ScheduleShifts.BuildShiftDictionary(dict(ScheduleShifts.DefaultShiftConfig, Conflicts=[]))
+    (IndividualVolunteers, VolunteerGroups) = GenerateRandomInstance(Seed, Shifts, NumberOfVolunteers=30, MaxShifts=(1, 2, 3))
+    Stores = SolveWithBothBackends(IndividualVolunteers, Shifts, VolunteerGroups)
+    CheckSchedule(Stores['cpsat'], Shifts)
+    CheckSchedule(Stores['flow'], Shifts)
+
+@pytest.mark.parametrize(('Seed', 'NumberOfVolunteers', 'CheckedShifts'), [(0, 120, 3), (1, 60, 3), (7, 120, 1)])
+def test_sensitivity_analysis_matches_the_schedule(Seed, NumberOfVolunteers, CheckedShifts):
+    Shifts = ScheduleShifts.BuildShiftDictionary()
+    (IndividualVolunteers, VolunteerGroups) = GenerateRandomInstance(Seed, Shifts, NumberOfVolunteers=NumberOfVolunteers)
+    Store = ScheduleShifts.Solve(IndividualVolunteers, Shifts, VolunteerGroups, Backend='flow', Processes=1)
+    Result = ScheduleShifts.AnalyzeSensitivity(Store, Shifts)
+    Scalar = ScheduleShifts.CalcObjectiveScalar(Shifts)
+    Values = ScheduleShifts.CalcAssignmentValues(Store, Shifts, Scalar)
+    Required = ScheduleShifts.ListRequiredVolunteers(Shifts)
+    Units = Store.UnitOfEachEntry()
+
+    # Apply each chain of moves, and check that it keeps the schedule feasible and changes the objective as reported
+    Positions = {}
+    for (k, u) in enumerate(Store.Units):
+        Positions[u.GroupName if isinstance(u, ScheduleShifts.VolunteerGroup) else '%s %s' % (u.FirstName, u.LastName)] = k
+    Chains = [Row for Row in Result.Candidates[1] if Row[2] == 'Chain']
+    assert len(Chains) > 0
+    for Row in Chains:
+        Assigned = Store.Values.copy()
+        for Move in Row[4].split('; '):
+            (Name, Shift) = Move.split(': ')
+            (From, To) = Shift.split(' -> ')
+            k = Positions[Name]
+            Entries = np.arange(Store.Offsets[k], Store.Offsets[k + 1])
+            if From != 'Unassigned':
+                Assigned[Entries[Store.ShiftIDs[Entries] == Shifts[From].ID_Number]] -= 1
+            Assigned[Entries[Store.ShiftIDs[Entries] == Shifts[To].ID_Number]] += 1
+        assert (Assigned >= 0).all() and (Assigned <= Store.Headcounts[Units]).all()
+        assert (np.bincount(Units, weights=Assigned, minlength=len(Store.Units)) <= Store.Headcounts * Store.MaxShifts).all()
+        assert (np.bincount(Store.ShiftIDs, weights=Assigned, minlength=len(Required)) <= Required).all()
+        assert int((Values * (Assigned - Store.Values)).sum()) == Row[5]
+
+    # Check the value of one more place on a few full shifts against a solve with that place added
+    Options = ScheduleShifts.SolverOptions()
+    Options.Presolve = False
+    for Row in [Row for Row in Result.Shifts[1] if Row[1] == Row[2]][:CheckedShifts]:
+        Capacities = Required.copy()
+        Capacities[Shifts[Row[0]].ID_Number] += 1
+        Enlarged = ScheduleShifts.SolveSubproblem(IndividualVolunteers, Shifts, VolunteerGroups, 'cpsat', Scalar, None, Options, None, Capacities)
+        assert int(round(Enlarged.Objective - Store.Objective)) == Row[3]
@@ -0,0 +1,82 @@
+# Import the standard libraries
+import os
+import sys
+
+# Import the pytest library
+import pytest
+
+# Import the scheduling code from the repository root, and the sample data of the backend tests
+Root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, Root)
+import ScheduleShifts
+from test_backends import LoadSampleData
+
+# Define the files written by ExportSchedules in the csv and jsonl formats
+ScheduleFiles = ['%s Schedule.%s' % (Name, Extension) for Name in ['Shift-Focused', 'Volunteer-Focused'] for Extension in ['csv', 'jsonl']]
+
+def SolveSampleData(NumberOfVolunteers=None):
+    # This function schedules the sample sign-ups, or only the first few volunteers
+    Shifts = ScheduleShifts.BuildShiftDictionary()
+    (IndividualVolunteers, VolunteerGroups) = LoadSampleData(Shifts)
+    IndividualVolunteers = IndividualVolunteers[:NumberOfVolunteers]
+    Store = ScheduleShifts.Solve(IndividualVolunteers, Shifts, VolunteerGroups, Backend='flow', Processes=1)
+    return ScheduleShifts.ExtractSchedule(Store, Shifts)
+
+def ReadFiles(Directory):
+    # This function reads every file of a directory
+    Files = {}
+    for FileName in os.listdir(Directory):
+        with open(os.path.join(Directory, FileName), 'rb') as f:
+            Files[FileName] = f.read()
+    return Files
+
+def FailAfter(Rows, Count):
+    # This function yields the first rows of a table, and then fails
+    for (i, Row) in enumerate(Rows):
+        if i == Count:
+            raise RuntimeError('Interrupted')
+        yield Row
+
+@pytest.fixture
+def Exported(tmp_path):
+    # Export the schedule of the first volunteers, which the tests try to replace with the schedule of all of them
+    ScheduleShifts.ExportSchedules(SolveSampleData(20), tmp_path, ['csv', 'jsonl'])
+    Previous = ReadFiles(tmp_path)
+    assert sorted(Previous) == sorted(ScheduleFiles)
+    return (tmp_path, Previous)
+
+def test_export_replaces_both_tables(Exported):
+    (Directory, Previous) = Exported
+    ScheduleShifts.ExportSchedules(SolveSampleData(), Directory, ['csv', 'jsonl'])
+    Files = ReadFiles(Directory)
+    assert sorted(Files) == sorted(ScheduleFiles)
+    assert all(Files[FileName] != Previous[FileName] for FileName in ScheduleFiles)
+
+def test_export_failing_in_the_second_table_leaves_both_tables(Exported, monkeypatch):
+    # Fail while the rows of the volunteer-focused table are written, after the shift-focused table is complete
+    (Directory, Previous) = Exported
+    ListVolunteerFocusedRows = ScheduleShifts.ListVolunteerFocusedRows
+    def FailingRows(Schedule):
+        (Columns, Rows) = ListVolunteerFocusedRows(Schedule)
+        return (Columns, FailAfter(Rows, 10))
+    monkeypatch.setattr(ScheduleShifts, 'ListVolunteerFocusedRows', FailingRows)
+    with pytest.raises(RuntimeError):
+        ScheduleShifts.ExportSchedules(SolveSampleData(), Directory, ['csv', 'jsonl'])
+
+    # Check that the previous files are unchanged, and that no temporary file is left behind
+    assert ReadFiles(Directory) == Previous
+
+def test_export_failing_to_finish_a_sink_leaves_every_file(Exported, monkeypatch):
+    # Fail while completing the last file, once every row has been written
+    (Directory, Previous) = Exported
+    Finish = ScheduleShifts.JSONLinesSink.Finish
+    def FailingFinish(self):
+        Finish(self)
+        if self.FileName.endswith('Volunteer-Focused Schedule.jsonl'):
+            raise OSError('Disk full')
+    monkeypatch.setattr(ScheduleShifts.JSONLinesSink, 'Finish', FailingFinish)
+    with pytest.raises(OSError):
+        ScheduleShifts.ExportSchedules(SolveSampleData(), Directory, ['csv', 'jsonl'])
+
+    # Check that the previous files are unchanged, and that no temporary file is left behind
+    assert ReadFiles(Directory) == Previous
@@ -0,0 +1,66 @@
+# Import the standard libraries
+import csv
+import os
+import random
+import sys
+
+# Import the pytest library
+import pytest
+
+# Import the scheduling code from the repository root, and the checks of the backend tests
+Root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, Root)
+import ScheduleShifts
+from test_backends import CheckObjective, CheckSchedule, GenerateRandomInstance
+
+def AppendSignUps(FileName, Generator, ShiftNames, Count, Start):
+    # This function appends random sign-ups to a file in the format of "Individual Preferences.csv"
+    with open(FileName, 'a', newline='') as f:
+        Writer = csv.writer(f)
+        for i in range(Start, Start + Count):
+            Preferences = Generator.sample(ShiftNames, Generator.randint(1, 5))
+            Writer.writerow(
+                ['TRUE' if Generator.random() < 0.25 else '', 'Newcomer', str(i), Generator.choice([1, 1, 1, 2])] +
+                Preferences + [''] * (len(ScheduleShifts.PreferenceColumns) - len(Preferences))
+            )
+
+@pytest.mark.parametrize('Seed', range(3))
+def test_streamed_sign_ups_keep_the_schedule_feasible(tmp_path, Seed):
+    # Schedule the first sign-ups, with the flow backend, which needs shifts without conflicts for volunteers who can
+    # take several of them
+    Shifts = ScheduleShifts.BuildShiftDictionary(dict(ScheduleShifts.DefaultShiftConfig, Conflicts=[]))
+    s = ScheduleShifts.Scheduler(Shifts)
+    (s.IndividualVolunteers, s.VolunteerGroups) = GenerateRandomInstance(Seed, Shifts, NumberOfVolunteers=60)
+    (s.Backend, s.Processes) = ('flow', 1)
+    Online = ScheduleShifts.OnlineScheduler(s)
+    Online.Reoptimize()
+
+    # Start the file of new sign-ups
+    FileName = os.path.join(tmp_path, 'Individual Preferences.csv')
+    with open(FileName, 'w', newline='') as f:
+        csv.writer(f).writerow(['Preferred Applicants', 'First Name', 'Last Name', 'Max Shifts'] + ScheduleShifts.PreferenceColumns)
+    Feed = ScheduleShifts.SignUpFeed(FileName)
+
+    # Stream the new sign-ups in batches, re-optimizing only when the drift bound calls for it
+    Generator = random.Random(Seed)
+    MaxDrift = 0.01
+    Reoptimizations = 0
+    for Batch in range(20):
+        AppendSignUps(FileName, Generator, list(Shifts), 5, 5 * Batch)
+        (Drift, Reoptimized) = ScheduleShifts.PlaceSignUps(Online, Feed.Read(), ReoptimizeEvery=10**6, ReoptimizeAfter=10**6, MaxDrift=MaxDrift)
+        assert Reoptimized == (Drift > MaxDrift)
+        Reoptimizations += Reoptimized
+
+        # Check that the schedule is feasible, and that its objective is the one of its assignments
+        Store = Online.Assignments()
+        CheckSchedule(Store, Shifts)
+        CheckObjective(Store, Shifts, s.Weights)
+        assert Store.Status == ('OPTIMAL' if Reoptimized else 'FEASIBLE')
+
+        # Check that the drift bounds how far the schedule is from optimal
+        Optimum = ScheduleShifts.Solve(s.IndividualVolunteers, Shifts, s.VolunteerGroups, 'flow', Processes=1, Weights=s.Weights).Objective
+        assert Store.Objective <= Optimum <= Online.Bound + 1e-6
+
+    # Check that the schedule was re-optimized some of the time, but not after every batch
+    assert len(s.IndividualVolunteers) == 160
+    assert 0 < Reoptimizations < 20
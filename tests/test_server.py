@@ -0,0 +1,187 @@
+# Import the standard libraries
+import asyncio
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+# Import the pytest library
+import pytest
+
+# Import the service from the repository root
+Root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, Root)
+import ScheduleServer
+
+# Define the boundary of the multipart uploads
+Boundary = 'ScheduleServerTestBoundary'
+
+class RunningService():
+    # This class runs a ScheduleService in a thread of its own, on a free port, for the length of a test
+
+    def __init__(self, Directory, **Settings):
+        self.Service = ScheduleServer.ScheduleService(str(Directory), **Settings)
+        self.Task = None
+        self.Thread = threading.Thread(target=self.Run, daemon=True)
+
+    def Run(self):
+        # This function runs the service until it is stopped
+        async def Main():
+            self.Task = asyncio.current_task()
+            await self.Service.Serve(0)
+        try:
+            asyncio.run(Main())
+        except asyncio.CancelledError:
+            pass
+
+    def __enter__(self):
+        # Start the service, and wait for it to listen
+        self.Thread.start()
+        Start = time.time()
+        while self.Service.Port == None:
+            assert time.time() - Start < 30, 'The service did not start.'
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *Exception):
+        # Stop the service
+        self.Service.Loop.call_soon_threadsafe(self.Task.cancel)
+        self.Thread.join(30)
+
+    def Call(self, Function, *Arguments):
+        # This function runs a function in the service's event loop, and returns its result
+        async def Wrapper():
+            return Function(*Arguments)
+        return asyncio.run_coroutine_threadsafe(Wrapper(), self.Service.Loop).result(30)
+
+    def Request(self, Method, Path, Body=None, Headers=None):
+        # This function sends a request to the service
+        # Outputs:
+        #   (Status, Content) = the status code, and the body (decoded from JSON when it is JSON)
+        Connection = http.client.HTTPConnection('127.0.0.1', self.Service.Port, timeout=60)
+        try:
+            Connection.request(Method, Path, Body, Headers or {})
+            Response = Connection.getresponse()
+            Content = Response.read()
+            if Response.getheader('Content-Type') == 'application/json':
+                Content = json.loads(Content)
+            return (Response.status, Content)
+        finally:
+            Connection.close()
+
+    def Submit(self, Parts, Query='backend=flow'):
+        # This function uploads sign-up sheets as a new job
+        # Inputs:
+        #   Parts = a dictionary of the contents of the uploaded files, indexed by part name
+        Body = b''
+        for (Name, Content) in Parts.items():
+            Body += ('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s.csv"\r\nContent-Type: text/csv\r\n\r\n' % (Boundary, Name, Name)).encode() + Content + b'\r\n'
+        Body += ('--%s--\r\n' % Boundary).encode()
+        return self.Request('POST', '/jobs?' + Query, Body, {'Content-Type' : 'multipart/form-data; boundary=%s' % Boundary})
+
+    def WaitForJob(self, ID_Number, Timeout=120):
+        # This function polls a job until it is finished, and returns its description
+        Start = time.time()
+        while True:
+            (Status, Job) = self.Request('GET', '/jobs/%d' % ID_Number)
+            assert Status == 200
+            if Job['Finished'] != None:
+                return Job
+            assert time.time() - Start < Timeout, 'The job did not finish.'
+            time.sleep(0.1)
+
+def ReadSampleSheets():
+    # This function reads the sample sign-up sheets of the repository, as upload parts
+    Parts = {}
+    for (Name, FileName) in [('individual', 'Individual Preferences.csv'), ('groups', 'Group Volunteers.csv')]:
+        with open(os.path.join(Root, FileName), 'rb') as f:
+            Parts[Name] = f.read()
+    return Parts
+
+def test_submit_poll_and_download(tmp_path):
+    with RunningService(tmp_path) as s:
+
+        # Submit the sample sign-up sheets, and wait for the schedule
+        (Status, Job) = s.Submit(ReadSampleSheets())
+        assert Status == 202 and Job['Status'] == 'queued'
+        Job = s.WaitForJob(Job['Job'])
+        assert Job['Status'] == 'done' and Job['Objective'] > 0
+
+        # Follow the events, which end with the job
+        (Status, Events) = s.Request('GET', '/jobs/%d/events' % Job['Job'])
+        Events = [json.loads(Line) for Line in Events.decode().splitlines()]
+        assert [Event['Event'] for Event in Events][:2] == ['queued', 'running'] and Events[-1]['Event'] == 'done'
+
+        # Download the schedules
+        for (Name, FileName) in ScheduleServer.DownloadFiles.items():
+            (Status, Content) = s.Request('GET', '/jobs/%d/%s' % (Job['Job'], Name))
+            assert Status == 200
+            with open(os.path.join(tmp_path, str(Job['Job']), FileName), 'rb') as f:
+                assert Content == f.read()
+
+def test_malformed_uploads_are_refused(tmp_path):
+    with RunningService(tmp_path) as s:
+
+        # Refuse sheets which are missing columns, and uploads which are not multipart
+        (Status, Content) = s.Submit({'individual' : b'First Name,Last Name\nA,B\n'})
+        assert Status == 400 and 'missing the columns' in Content['Error']
+        (Status, Content) = s.Request('POST', '/jobs', b'individual', {'Content-Type' : 'text/csv'})
+        assert Status == 400
+
+        # Refuse malformed Content-Length headers
+        for Length in [b'abc', b'-5']:
+            with socket.create_connection(('127.0.0.1', s.Service.Port), timeout=30) as Connection:
+                Connection.sendall(b'POST /jobs HTTP/1.1\r\nHost: localhost\r\nContent-Length: ' + Length + b'\r\n\r\n')
+                Reply = b''
+                while True:
+                    Data = Connection.recv(4096)
+                    if Data == b'':
+                        break
+                    Reply += Data
+            assert Reply.startswith(b'HTTP/1.1 400 ')
+
+        # Refused uploads do not become jobs
+        assert s.Request('GET', '/jobs') == (200, [])
+
+def test_queue_limit(tmp_path):
+    with RunningService(tmp_path, Processes=1, MaxQueuedJobs=2) as s:
+
+        # Hold the only worker slot, so that the jobs stay queued
+        asyncio.run_coroutine_threadsafe(s.Service.Slots.acquire(), s.Service.Loop).result(30)
+
+        # Submit several jobs at the same time: only as many as the queue holds are accepted, even though their uploads
+        # are still being saved when the others arrive
+        Sheets = ReadSampleSheets()
+        Replies = []
+        Threads = [threading.Thread(target=lambda: Replies.append(s.Submit(Sheets))) for i in range(6)]
+        for t in Threads:
+            t.start()
+        for t in Threads:
+            t.join()
+        assert sorted(Status for (Status, Content) in Replies) == [202, 202, 503, 503, 503, 503]
+
+        # Once the slot is free, the queued jobs are solved, and new jobs are accepted again
+        s.Call(s.Service.Slots.release)
+        for (Status, Job) in Replies:
+            if Status == 202:
+                assert s.WaitForJob(Job['Job'])['Status'] == 'done'
+        assert s.Submit(Sheets)[0] == 202
+        s.WaitForJob(s.Service.JobCount)
+
+def test_overrunning_job_is_killed(tmp_path):
+    with RunningService(tmp_path) as s:
+
+        # Give the job no time at all, so that its worker is still reading the sheets when it is due
+        s.Service.GracePeriod = 0
+        (Status, Job) = s.Submit(ReadSampleSheets(), 'backend=cpsat&max_time=0')
+        assert Status == 202
+        Job = s.WaitForJob(Job['Job'], 30)
+        assert Job['Status'] == 'failed' and 'did not finish within its time limit' in Job['Error']
+
+        # The slot is freed for the next job
+        s.Service.GracePeriod = 60
+        (Status, Job) = s.Submit(ReadSampleSheets())
+        assert s.WaitForJob(Job['Job'])['Status'] == 'done'